@@ -1,5 +1,5 @@
 import re
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 from collections import Counter
 import math
 
@@ -32,8 +32,7 @@ class AccuratePlagiarismDetector:
     
     def _calculate_similarity(self, text1, text2):
         # Sequence matching for exact/near-exact plagiarism
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        sequence_ratio = matcher.ratio()
+        sequence_ratio = sequence_similarity(text1.lower(), text2.lower())
         
         # N-gram similarity
         ngram_ratio = self._ngram_similarity(text1, text2)
@@ -1,7 +1,7 @@
 import re
 from collections import Counter
 import math
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 
 class AdvancedPlagiarismDetector:
     def detect_plagiarism(self, text, documents=None, threshold=0.3):
@@ -141,5 +141,4 @@ class AdvancedPlagiarismDetector:
         return min(score, 1.0)
     
     def _compare_texts(self, text1, text2):
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        return matcher.ratio()
+        return sequence_similarity(text1.lower(), text2.lower())
@@ -1,8 +1,13 @@
-import re
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 import hashlib
-from collections import Counter
-import math
+from .minhash_lsh import MinHashLSH
+from .text_features import TextFeatures, with_features
+from .ai_markers import MarkerEngine, TextAnalysis, CONCLUSION_MARKERS
+
+HYBRID_MARKERS = ('formal_transitions', 'repetitive_structure', 'passive_voice', 'hedging_language',
+                  'complexity', 'vocabulary_diversity', 'conclusion_markers')
+# This detector's conclusion lexicon has always listed 'in summary' twice, so it counts double
+HYBRID_MARKER_ENGINE = MarkerEngine(conclusions=CONCLUSION_MARKERS + ['in summary'])
 
 class AdvancedHybridDetector:
     """Hybrid detector combining plagiarism and AI detection"""
@@ -11,9 +16,14 @@ class AdvancedHybridDetector:
         self.plagiarism_threshold = 0.25
         self.ai_threshold = 0.45
         self.min_text_length = 10
+        self.lsh = MinHashLSH()
     
     def detect_all(self, text, documents=None):
         """Detect both plagiarism and AI content"""
+        if documents is not None and self.lsh is not None:
+            documents = self.lsh.prefilter(text, documents)
+        documents = with_features(documents)
+        
         plagiarism_score = self._detect_plagiarism(text, documents)
         ai_score = self._detect_ai_content(text)
         
@@ -37,22 +47,28 @@ class AdvancedHybridDetector:
         if not documents:
             return 0.0
         
+        query = TextFeatures.from_text(text)
         max_similarity = 0.0
-        for doc in documents:
+        for doc in with_features(documents):
             if not doc.content or len(doc.content.strip()) < self.min_text_length:
                 continue
             
-            similarity = self._calculate_similarity(text, doc.content)
-            max_similarity = max(max_similarity, similarity)
+            scores = self._score_features(text, doc.content, query, TextFeatures.for_document(doc))
+            max_similarity = max(max_similarity, self._weighted_score(scores))
         
         return max_similarity
     
     def _detect_ai_content(self, text):
         """Detect AI-generated content using linguistic markers"""
+        return self.score_analysis(TextAnalysis(text))
+    
+    def score_analysis(self, analysis):
+        """AI score of a shared TextAnalysis"""
+        text = analysis.text
         if not text or len(text.strip()) < self.min_text_length:
             return 0.0
         
-        markers = self._analyze_ai_markers(text)
+        markers = HYBRID_MARKER_ENGINE.markers(analysis)
         
         # Calculate weighted AI score
         weights = {
@@ -70,144 +86,63 @@ class AdvancedHybridDetector:
     
     def _analyze_ai_markers(self, text):
         """Analyze linguistic markers of AI content"""
-        text_lower = text.lower()
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        markers = {}
-        
-        # 1. Formal transitions (AI uses more formal connectors)
-        formal_transitions = ['furthermore', 'moreover', 'in addition', 'consequently', 
-                            'therefore', 'thus', 'hence', 'additionally', 'notably',
-                            'significantly', 'importantly', 'ultimately', 'essentially']
-        transition_count = sum(text_lower.count(t) for t in formal_transitions)
-        markers['formal_transitions'] = min(transition_count / max(len(sentences), 1) * 0.5, 1.0)
-        
-        # 2. Repetitive structure (AI tends to repeat patterns)
-        if len(sentences) > 3:
-            sentence_starts = [s.split()[0] if s.split() else '' for s in sentences]
-            start_counter = Counter(sentence_starts)
-            repetition = max(start_counter.values()) / len(sentences) if sentences else 0
-            markers['repetitive_structure'] = min(repetition * 0.8, 1.0)
-        else:
-            markers['repetitive_structure'] = 0.0
-        
-        # 3. Passive voice (AI uses more passive voice)
-        passive_pattern = r'\b(is|are|was|were|be|been|being)\s+\w+ed\b'
-        passive_count = len(re.findall(passive_pattern, text_lower))
-        markers['passive_voice'] = min(passive_count / max(len(sentences), 1) * 0.6, 1.0)
-        
-        # 4. Hedging language (AI uses more hedging)
-        hedging_words = ['may', 'might', 'could', 'possibly', 'arguably', 'somewhat',
-                        'relatively', 'rather', 'quite', 'seems', 'appears', 'tends']
-        hedging_count = sum(len(re.findall(r'\b' + word + r'\b', text_lower)) for word in hedging_words)
-        markers['hedging_language'] = min(hedging_count / max(len(sentences), 1) * 0.4, 1.0)
-        
-        # 5. Complexity (AI tends to use more complex structures)
-        avg_word_length = sum(len(word) for word in text.split()) / max(len(text.split()), 1)
-        avg_sentence_length = len(text.split()) / max(len(sentences), 1)
-        complexity = (avg_word_length / 6.0) * 0.5 + (avg_sentence_length / 20.0) * 0.5
-        markers['complexity'] = min(complexity, 1.0)
-        
-        # 6. Vocabulary diversity (AI uses more diverse vocabulary)
-        words = re.findall(r'\b\w+\b', text_lower)
-        unique_words = len(set(words))
-        diversity = unique_words / max(len(words), 1)
-        markers['vocabulary_diversity'] = min(diversity * 1.5, 1.0)
-        
-        # 7. Conclusion markers (AI often uses explicit conclusions)
-        conclusion_markers = ['in conclusion', 'to conclude', 'in summary', 'to summarize',
-                            'in summary', 'ultimately', 'in essence', 'in short']
-        conclusion_count = sum(text_lower.count(m) for m in conclusion_markers)
-        markers['conclusion_markers'] = min(conclusion_count * 0.3, 1.0)
-        
-        return markers
+        markers = HYBRID_MARKER_ENGINE.analyze(text)
+        return {name: markers[name] for name in HYBRID_MARKERS}
     
     def _calculate_similarity(self, text1, text2):
         """Calculate weighted similarity score"""
-        seq = self._sequence_match(text1, text2)
-        ngram = self._ngram_similarity(text1, text2)
-        word = self._word_overlap(text1, text2)
-        semantic = self._semantic_similarity(text1, text2)
-        
-        return (seq * 0.35) + (ngram * 0.30) + (word * 0.20) + (semantic * 0.15)
+        return self._weighted_score(self._score_features(
+            text1, text2, TextFeatures.from_text(text1), TextFeatures.from_text(text2)))
+    
+    def _score_features(self, text1, text2, features1, features2):
+        """Per-method scores from the cached features of both texts"""
+        return {
+            'sequence': self._sequence_match(text1, text2),
+            'ngram': features1.ngram_similarity(features2, 4),
+            'word_overlap': features1.word_overlap(features2),
+            'semantic': features1.cosine_similarity(features2)
+        }
+    
+    def _weighted_score(self, scores):
+        return ((scores['sequence'] * 0.35) + (scores['ngram'] * 0.30) +
+                (scores['word_overlap'] * 0.20) + (scores['semantic'] * 0.15))
     
     def _sequence_match(self, text1, text2):
         """Sequence matching for exact/near-exact plagiarism"""
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        return matcher.ratio()
+        return sequence_similarity(text1.lower(), text2.lower())
     
     def _ngram_similarity(self, text1, text2, n=4):
         """N-gram analysis for phrase-level plagiarism"""
-        def get_ngrams(text):
-            words = text.lower().split()
-            return set(' '.join(words[i:i+n]) for i in range(max(0, len(words)-n+1)))
-        
-        ngrams1 = get_ngrams(text1)
-        ngrams2 = get_ngrams(text2)
-        
-        if not ngrams1 or not ngrams2:
-            return 0.0
-        
-        intersection = len(ngrams1 & ngrams2)
-        union = len(ngrams1 | ngrams2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).ngram_similarity(TextFeatures.from_text(text2), n)
     
     def _word_overlap(self, text1, text2):
         """Word-level overlap detection"""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).word_overlap(TextFeatures.from_text(text2))
     
     def _semantic_similarity(self, text1, text2):
         """Semantic similarity using word frequency"""
-        def get_word_freq(text):
-            words = re.findall(r'\b\w+\b', text.lower())
-            return Counter(words)
-        
-        freq1 = get_word_freq(text1)
-        freq2 = get_word_freq(text2)
-        
-        if not freq1 or not freq2:
-            return 0.0
-        
-        common_words = set(freq1.keys()) & set(freq2.keys())
-        if not common_words:
-            return 0.0
-        
-        dot_product = sum(freq1[w] * freq2[w] for w in common_words)
-        magnitude1 = math.sqrt(sum(v**2 for v in freq1.values()))
-        magnitude2 = math.sqrt(sum(v**2 for v in freq2.values()))
-        
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
+        return TextFeatures.from_text(text1).cosine_similarity(TextFeatures.from_text(text2))
     
     def _get_plagiarism_details(self, text, documents):
         """Get detailed plagiarism analysis"""
         if not documents:
             return {'status': 'no_documents', 'matches': []}
         
+        query = TextFeatures.from_text(text)
         results = []
-        for doc in documents:
+        for doc in with_features(documents):
             if not doc.content or len(doc.content.strip()) < self.min_text_length:
                 continue
             
-            similarity = self._calculate_similarity(text, doc.content)
+            scores = self._score_features(text, doc.content, query, TextFeatures.for_document(doc))
+            similarity = self._weighted_score(scores)
             if similarity >= self.plagiarism_threshold:
                 results.append({
                     'title': doc.title,
                     'similarity': similarity,
-                    'sequence': self._sequence_match(text, doc.content),
-                    'ngram': self._ngram_similarity(text, doc.content),
-                    'word_overlap': self._word_overlap(text, doc.content)
+                    'sequence': scores['sequence'],
+                    'ngram': scores['ngram'],
+                    'word_overlap': scores['word_overlap']
                 })
         
         return {
@@ -1,34 +1,45 @@
 import re
-from collections import Counter
-import math
+from .ai_markers import PatternCounter, TextAnalysis
+
+TRANSITION_PATTERN = r'\b(furthermore|moreover|additionally|consequently|nevertheless|notwithstanding|in addition|on the other hand)\b'
+ACADEMIC_PATTERN = r'\b(it is important to note|it should be noted|it is worth noting|can be seen|it is evident|it is clear|one might argue|it can be argued)\b'
+CONCLUSION_PATTERN = r'\b(in conclusion|to summarize|in summary|to conclude|in closing|finally|ultimately)\b'
+PASSIVE_PATTERN = r'\b(is|are|was|were)\s+\w+ed\b'
+HEDGING_PATTERN = r'\b(may|might|could|appears|seems|suggests|indicates|tends|arguably)\b'
+COMPLEX_PATTERN = r',.*,'
+PATTERNS = [TRANSITION_PATTERN, ACADEMIC_PATTERN, CONCLUSION_PATTERN, PASSIVE_PATTERN, HEDGING_PATTERN, COMPLEX_PATTERN]
+PATTERN_COUNTER = PatternCounter(PATTERNS)
 
 class AccurateAIDetector:
     def detect_ai_content(self, text):
+        return self.score_analysis(TextAnalysis(text, PATTERN_COUNTER))
+    
+    def score_analysis(self, analysis):
+        """AI score of a shared TextAnalysis"""
         score = 0.0
         
         # 1. Formal transition words (20%)
-        formal_transitions = len(re.findall(r'\b(furthermore|moreover|additionally|consequently|nevertheless|notwithstanding|in addition|on the other hand)\b', text, re.I))
+        formal_transitions = analysis.count(TRANSITION_PATTERN)
         score += min(formal_transitions * 0.02, 0.2)
         
         # 2. Academic phrases (20%)
-        academic = len(re.findall(r'\b(it is important to note|it should be noted|it is worth noting|can be seen|it is evident|it is clear|one might argue|it can be argued)\b', text, re.I))
+        academic = analysis.count(ACADEMIC_PATTERN)
         score += min(academic * 0.025, 0.2)
         
         # 3. Conclusion markers (15%)
-        conclusions = len(re.findall(r'\b(in conclusion|to summarize|in summary|to conclude|in closing|finally|ultimately)\b', text, re.I))
+        conclusions = analysis.count(CONCLUSION_PATTERN)
         score += min(conclusions * 0.025, 0.15)
         
         # 4. Passive voice overuse (15%)
-        passive = len(re.findall(r'\b(is|are|was|were)\s+\w+ed\b', text, re.I))
-        total_words = len(text.split())
+        passive = analysis.count(PASSIVE_PATTERN)
+        total_words = len(analysis.tokens)
         if total_words > 0:
             passive_ratio = passive / (total_words / 100)
             score += min(passive_ratio * 0.01, 0.15)
         
         # 5. Repetitive sentence structure (15%)
-        sentences = re.split(r'[.!?]+', text)
-        if len(sentences) > 3:
-            sentence_lengths = [len(s.split()) for s in sentences if s.strip()]
+        if len(analysis.split_sentences) > 3:
+            sentence_lengths = [len(words) for words in analysis.sentence_words]
             if sentence_lengths:
                 avg_length = sum(sentence_lengths) / len(sentence_lengths)
                 variance = sum((x - avg_length) ** 2 for x in sentence_lengths) / len(sentence_lengths)
@@ -36,11 +47,11 @@ class AccurateAIDetector:
                     score += 0.15
         
         # 6. Hedging language (10%)
-        hedging = len(re.findall(r'\b(may|might|could|appears|seems|suggests|indicates|tends|arguably)\b', text, re.I))
+        hedging = analysis.count(HEDGING_PATTERN)
         score += min(hedging * 0.01, 0.1)
         
         # 7. Complex sentence structures (5%)
-        complex_sentences = len(re.findall(r',.*,', text))
+        complex_sentences = analysis.count(COMPLEX_PATTERN)
         score += min(complex_sentences * 0.005, 0.05)
         
         return min(score, 1.0)
@@ -1,33 +1,44 @@
-import re
+from .ai_markers import PatternCounter, TextAnalysis
+
+AI_PATTERNS = {
+    r'\b(furthermore|moreover|additionally|consequently|nevertheless)\b': 0.08,
+    r'\b(it is important to note|it should be noted|it is worth noting)\b': 0.12,
+    r'\b(in conclusion|to summarize|in summary|to conclude)\b': 0.08,
+    r'\b(various|numerous|several|multiple)\b.*\b(aspects|factors|elements|considerations)\b': 0.1,
+    r'\b(the purpose of this|the aim of this|the objective of this)\b': 0.08,
+    r'\b(can be seen|it can be argued|it is evident that)\b': 0.08,
+    r'\b(in today\'s world|in modern society|in contemporary times)\b': 0.08,
+    r'\b(plays a crucial role|plays an important role|is essential)\b': 0.08,
+    r'\b(has been shown|research shows|studies indicate)\b': 0.08,
+    r'\b(on the other hand|conversely|in contrast)\b': 0.06,
+    r'\b(therefore|thus|hence)\b': 0.05,
+    r'\b(in addition|furthermore|additionally)\b': 0.05,
+    r'\b(it is clear that|it is obvious that)\b': 0.08,
+    r'\b(one can see|one might argue)\b': 0.08,
+    r'\b(as mentioned|as stated|as discussed)\b': 0.06,
+    r'\b(in fact|indeed|in reality)\b': 0.05,
+    r'\b(ultimately|finally|in the end)\b': 0.06,
+}
+AI_PATTERN_COUNTER = PatternCounter(AI_PATTERNS)
 
 class ImprovedAIDetector:
     def __init__(self):
-        self.ai_patterns = {
-            r'\b(furthermore|moreover|additionally|consequently|nevertheless)\b': 0.08,
-            r'\b(it is important to note|it should be noted|it is worth noting)\b': 0.12,
-            r'\b(in conclusion|to summarize|in summary|to conclude)\b': 0.08,
-            r'\b(various|numerous|several|multiple)\b.*\b(aspects|factors|elements|considerations)\b': 0.1,
-            r'\b(the purpose of this|the aim of this|the objective of this)\b': 0.08,
-            r'\b(can be seen|it can be argued|it is evident that)\b': 0.08,
-            r'\b(in today\'s world|in modern society|in contemporary times)\b': 0.08,
-            r'\b(plays a crucial role|plays an important role|is essential)\b': 0.08,
-            r'\b(has been shown|research shows|studies indicate)\b': 0.08,
-            r'\b(on the other hand|conversely|in contrast)\b': 0.06,
-            r'\b(therefore|thus|hence)\b': 0.05,
-            r'\b(in addition|furthermore|additionally)\b': 0.05,
-            r'\b(it is clear that|it is obvious that)\b': 0.08,
-            r'\b(one can see|one might argue)\b': 0.08,
-            r'\b(as mentioned|as stated|as discussed)\b': 0.06,
-            r'\b(in fact|indeed|in reality)\b': 0.05,
-            r'\b(ultimately|finally|in the end)\b': 0.06,
-        }
+        self.ai_patterns = AI_PATTERNS
+        self.pattern_counter = AI_PATTERN_COUNTER
     
     def detect_ai_content(self, text):
+        return self.detect_analysis(TextAnalysis(text, self.pattern_counter))
+    
+    def score_analysis(self, analysis):
+        """AI score of a shared TextAnalysis"""
+        return self.detect_analysis(analysis)['ai_probability']
+    
+    def detect_analysis(self, analysis):
         score = 0
         matches_found = {}
         
         for pattern, weight in self.ai_patterns.items():
-            matches = len(re.findall(pattern, text, re.IGNORECASE))
+            matches = analysis.count(pattern)
             if matches > 0:
                 matches_found[pattern] = matches
                 score += matches * weight
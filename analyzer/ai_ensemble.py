@@ -0,0 +1,74 @@
+from .ai_markers import PatternCounter, TextAnalysis, marker_engine
+from . import ai_detector_accurate, ai_detector_improved, modern_detector, professional_ai_detector, services, ultra_detector
+from .advanced_hybrid_detector import AdvancedHybridDetector
+from .ai_detector_accurate import AccurateAIDetector
+from .ai_detector_improved import ImprovedAIDetector
+from .modern_detector import ModernPlagiarismDetector
+from .professional_ai_detector import ProfessionalAIDetector
+from .services import AIDetector
+from .ultimate_detector import UltimatePlagiarismDetector
+from .ultra_detector import UltraAccuratePlagiarismDetector
+
+# Every regex any detector counts, so one PatternCounter scan serves them all
+ENSEMBLE_PATTERNS = list(dict.fromkeys(
+    list(ai_detector_improved.AI_PATTERNS) + list(modern_detector.AI_PATTERNS) + professional_ai_detector.PATTERNS
+    + ai_detector_accurate.PATTERNS + services.HEURISTIC_PATTERNS + ultra_detector.PATTERNS
+))
+ENSEMBLE_PATTERN_COUNTER = PatternCounter(ENSEMBLE_PATTERNS)
+# The score at which each detector calls a text AI-generated on its own
+DETECTOR_THRESHOLDS = {
+    'ultimate': 0.45,
+    'advanced_hybrid': 0.45,
+    'professional': 0.5,
+    'accurate': 0.5,
+    'improved': 0.25,
+    'heuristic': 0.5,
+    'modern': 0.25,
+    'ultra': 0.5,
+}
+
+
+class AIEnsemble:
+    """All of the project's AI detectors run off one TextAnalysis
+    
+    The text is segmented and tokenized once, and every regex of every
+    detector is counted in one combined scan. Each detector then computes
+    its own score from the shared analysis exactly as it does on its own.
+    The combined score is the weighted mean of the detector scores (equal
+    weights by default). `votes` counts the detectors past their own cut-off.
+    """
+    
+    def __init__(self, weights=None, threshold=0.45):
+        self.threshold = threshold
+        self.patterns = ENSEMBLE_PATTERN_COUNTER
+        # AIDetector and ModernPlagiarismDetector load models when built; their scorers are static
+        self.detectors = {
+            'ultimate': UltimatePlagiarismDetector().score_analysis,
+            'advanced_hybrid': AdvancedHybridDetector().score_analysis,
+            'professional': ProfessionalAIDetector().score_analysis,
+            'accurate': AccurateAIDetector().score_analysis,
+            'improved': ImprovedAIDetector().score_analysis,
+            'heuristic': AIDetector.score_analysis,
+            'modern': ModernPlagiarismDetector.score_analysis,
+            'ultra': UltraAccuratePlagiarismDetector().score_analysis,
+        }
+        self.weights = weights or {name: 1.0 for name in self.detectors}
+    
+    def analyze(self, text):
+        return TextAnalysis(text, self.patterns)
+    
+    def detect(self, text):
+        """Combined and per-detector AI scores of a text"""
+        analysis = self.analyze(text)
+        scores = {name: scorer(analysis) for name, scorer in self.detectors.items()}
+        total_weight = sum(self.weights.get(name, 0.0) for name in scores) or 1.0
+        ai_score = sum(score * self.weights.get(name, 0.0) for name, score in scores.items()) / total_weight
+        detectors = {name: {'score': score, 'is_ai_generated': score >= DETECTOR_THRESHOLDS.get(name, 0.5)}
+                     for name, score in scores.items()}
+        return {
+            'ai_score': ai_score,
+            'is_ai_generated': ai_score >= self.threshold,
+            'votes': sum(detector['is_ai_generated'] for detector in detectors.values()),
+            'detectors': detectors,
+            'markers': marker_engine.markers(analysis)
+        }
@@ -0,0 +1,293 @@
+import re
+import math
+from collections import Counter, defaultdict
+from functools import cached_property
+
+PASSIVE_PATTERN = re.compile(r'\b(is|are|was|were|be|been|being)\s+\w+ed\b')
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+WORD_PATTERN = re.compile(r'\b\w+\b')
+PUNCTUATION_PATTERN = re.compile(r'[,;:]')
+# A regex lexicon the combined scan can take over: \b(phrase|phrase|...)\b with literal phrases
+ALTERNATION_PATTERN = re.compile(r'^\\b\(([^()\[\]{}*+?.^$]*)\)\\b$')
+
+FORMAL_TRANSITIONS = ['furthermore', 'moreover', 'in addition', 'consequently',
+                      'therefore', 'thus', 'hence', 'additionally', 'notably',
+                      'significantly', 'importantly', 'ultimately', 'essentially']
+HEDGING_WORDS = ['may', 'might', 'could', 'possibly', 'arguably', 'somewhat',
+                 'relatively', 'rather', 'quite', 'seems', 'appears', 'tends']
+CONCLUSION_MARKERS = ['in conclusion', 'to conclude', 'in summary', 'to summarize',
+                      'ultimately', 'in essence', 'in short']
+RARE_WORDS = ['aforementioned', 'notwithstanding', 'heretofore', 'henceforth',
+              'erstwhile', 'perchance', 'betwixt', 'thenceforth']
+# How much each marker contributes to the AI score of a text
+AI_MARKER_WEIGHTS = {
+    'formal_transitions': 0.15,
+    'repetitive_structure': 0.15,
+    'passive_voice': 0.12,
+    'hedging_language': 0.12,
+    'complexity': 0.12,
+    'vocabulary_diversity': 0.10,
+    'conclusion_markers': 0.08,
+    'sentence_length_variance': 0.08,
+    'punctuation_patterns': 0.05,
+    'rare_word_usage': 0.03
+}
+
+
+class _PhraseScan:
+    """One regex pass that reports every (position, phrase) occurrence of whole-word phrases
+    
+    The phrases form a single alternation, longest first, which consumes the
+    text match by match. Any other occurrence starting inside a match must
+    lie within it or begin with its tail; those candidates are precomputed
+    per phrase and checked in place, so overlapping phrases are not lost.
+    """
+    
+    def __init__(self, phrases):
+        ordered = sorted(set(phrases), key=lambda p: (-len(p), p))
+        alternation = '|'.join(re.escape(p) for p in ordered)
+        self.pattern = re.compile(r'\b(?:' + alternation + r')\b')
+        self.inner = {p: sorted((k, q) for k in range(len(p)) for q in ordered
+                                if (k, q) != (0, p) and (p.startswith(q, k) or q.startswith(p[k:])))
+                      for p in ordered}
+    
+    def occurrences(self, text):
+        """(start, phrase) pairs in order of start"""
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            phrase = match.group()
+            yield start, phrase
+            for offset, other in self.inner[phrase]:
+                position = start + offset
+                if (text.startswith(other, position) and self._boundary(text, position - 1)
+                        and self._boundary(text, position + len(other))):
+                    yield position, other
+    
+    @staticmethod
+    def _boundary(text, position):
+        """True when the character at position is not a word character (or is outside the text)"""
+        return position < 0 or position >= len(text) or not (text[position].isalnum() or text[position] == '_')
+
+
+class SubstringCounter:
+    """Sum of text.count(phrase) over each lexicon, for several lexicons
+    
+    Each distinct phrase is counted once with str.count, one scan of the
+    text per phrase, and its count added wherever it is listed (a phrase in
+    several lexicons, or twice in one). str.count runs in C, which measured
+    4-7x faster than a combined regex scan for lexicons of this size.
+    """
+    
+    def __init__(self, lexicons):
+        self.lexicons = lexicons
+        self.owners = defaultdict(Counter)
+        for name, phrases in lexicons.items():
+            for phrase in phrases:
+                self.owners[phrase][name] += 1
+    
+    def phrase_counts(self, text, phrase_count=None):
+        """Occurrences of each distinct phrase; `phrase_count` (e.g. TextAnalysis.phrase_count) replaces text.count"""
+        phrase_count = phrase_count or text.count
+        return {phrase: phrase_count(phrase) for phrase in self.owners}
+    
+    def count(self, text, phrase_count=None):
+        counts = Counter({name: 0 for name in self.lexicons})
+        for phrase, occurrences in self.phrase_counts(text, phrase_count).items():
+            for name, multiplicity in self.owners[phrase].items():
+                counts[name] += occurrences * multiplicity
+        return counts
+
+
+class PatternCounter:
+    """len(re.findall(pattern, text, re.IGNORECASE)) for every pattern of a weighted dict
+    
+    Patterns of the form \\b(a|b|c)\\b are answered from one combined scan of
+    the lowercased text, honouring findall's rule that matches of the same
+    pattern do not overlap. Anything else is compiled once and run on its own.
+    """
+    
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.alternatives = {}
+        self.compiled = {}
+        owners = defaultdict(list)
+        for pattern in self.patterns:
+            match = ALTERNATION_PATTERN.match(pattern)
+            literal = match and not re.search(r'\\\w', match.group(1))
+            phrases = [re.sub(r'\\(.)', r'\1', p) for p in match.group(1).split('|')] if literal else []
+            if phrases and all(p and p == p.lower() and p[0].isalnum() and p[-1].isalnum() for p in phrases):
+                self.alternatives[pattern] = phrases
+                for index, phrase in enumerate(phrases):
+                    if phrase in phrases[:index]:
+                        continue
+                    # re takes the first listed alternative that matches; only one sharing a prefix can precede this one
+                    rivals = [p for p in phrases[:index] if p.startswith(phrase) or phrase.startswith(p)]
+                    owners[phrase].append((pattern, None if rivals else len(phrase)))
+            else:
+                self.compiled[pattern] = re.compile(pattern, re.IGNORECASE)
+        self.owners = owners
+        self.scan = _PhraseScan(owners) if owners else None
+    
+    def count(self, text):
+        counts = {pattern: 0 for pattern in self.patterns}
+        if self.scan:
+            lower = text.lower()
+            last_end = {}
+            for start, phrase in self.scan.occurrences(lower):
+                for pattern, length in self.owners[phrase]:
+                    if start < last_end.get(pattern, 0):
+                        continue
+                    counts[pattern] += 1
+                    last_end[pattern] = start + (length or self._findall_length(pattern, lower, start))
+        for pattern, compiled in self.compiled.items():
+            counts[pattern] = len(compiled.findall(text))
+        return counts
+    
+    def _findall_length(self, pattern, lower, start):
+        """Length of the alternative re would pick at start: the first listed one that matches"""
+        for phrase in self.alternatives[pattern]:
+            if lower.startswith(phrase, start) and _PhraseScan._boundary(lower, start + len(phrase)):
+                return len(phrase)
+        return 0
+
+
+class TextAnalysis:
+    """A text split into sentences, tokens and words once, shared by every AI detector
+    
+    Each view of the text is computed on first use and kept. count() and
+    phrase_count() memoise regex and substring counts; regex counts are read
+    from `patterns` (a PatternCounter covering every detector's patterns) when
+    it holds them, so all detectors together cost one combined scan.
+    """
+    
+    def __init__(self, text, patterns=None):
+        self.text = text
+        self.patterns = patterns
+        self._counts = {}
+        self._phrase_counts = {}
+    
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+    
+    @cached_property
+    def split_sentences(self):
+        """re.split(r'[.!?]+', text), empty pieces included"""
+        return SENTENCE_SPLIT.split(self.text)
+    
+    @cached_property
+    def sentences(self):
+        return [s.strip() for s in self.split_sentences if s.strip()]
+    
+    @cached_property
+    def sentence_words(self):
+        """Whitespace tokens of each sentence"""
+        return [s.split() for s in self.sentences]
+    
+    @cached_property
+    def tokens(self):
+        return self.text.split()
+    
+    @cached_property
+    def lower_tokens(self):
+        return self.lower.split()
+    
+    @cached_property
+    def words(self):
+        """Counts of \\b\\w+\\b words of the lowercased text"""
+        return Counter(WORD_PATTERN.findall(self.lower))
+    
+    def count(self, pattern, lower=False):
+        """len(re.findall(pattern, text, re.IGNORECASE)), or of the pattern in the lowercased text when lower"""
+        key = (pattern, lower)
+        if key not in self._counts:
+            if lower:
+                self._counts[key] = len(re.findall(pattern, self.lower))
+            elif self.patterns is not None and pattern in self.patterns.patterns:
+                self._counts.update(((p, False), n) for p, n in self.patterns.count(self.text).items())
+            else:
+                self._counts[key] = len(re.findall(pattern, self.text, re.IGNORECASE))
+        return self._counts[key]
+    
+    def phrase_count(self, phrase):
+        """Non-overlapping occurrences of a lowercase phrase in the lowercased text"""
+        if phrase not in self._phrase_counts:
+            self._phrase_counts[phrase] = self.lower.count(phrase)
+        return self._phrase_counts[phrase]
+
+
+class MarkerEngine:
+    """The ten stylometric AI markers of a TextAnalysis
+    
+    This is not a single pass over the text. The analysis splits it into
+    sentences, tokens and words once. The three lexicons are counted by a
+    SubstringCounter, one str.count per distinct phrase, memoised in the
+    analysis so other detectors scoring it reuse the counts. Passive voice
+    and punctuation take one regex scan each. Hedging words are looked up in
+    the word counts that vocabulary diversity needs anyway. Results match the
+    former per-call regex implementation exactly.
+    """
+    
+    def __init__(self, transitions=FORMAL_TRANSITIONS, hedging=HEDGING_WORDS,
+                 conclusions=CONCLUSION_MARKERS, rare_words=RARE_WORDS):
+        self.transitions = list(transitions)
+        self.hedging = list(hedging)
+        self.conclusions = list(conclusions)
+        self.rare_words = list(rare_words)
+        self.substrings = SubstringCounter({
+            'formal_transitions': transitions,
+            'conclusion_markers': conclusions,
+            'rare_word_usage': rare_words
+        })
+    
+    def analyze(self, text):
+        return self.markers(TextAnalysis(text))
+    
+    def markers(self, analysis):
+        """The ten markers of a TextAnalysis"""
+        sentences = analysis.sentences
+        sentence_count = max(len(sentences), 1)
+        tokens = analysis.tokens
+        words = analysis.words
+        word_total = sum(words.values())
+        
+        lexicons = self.substrings.count(analysis.lower, analysis.phrase_count)
+        markers = {}
+        markers['formal_transitions'] = min(lexicons['formal_transitions'] / sentence_count * 0.5, 1.0)
+        
+        if len(sentences) > 3:
+            sentence_starts = [s[0] for s in analysis.sentence_words]
+            repetition = max(Counter(sentence_starts).values()) / len(sentences)
+            markers['repetitive_structure'] = min(repetition * 0.8, 1.0)
+        else:
+            markers['repetitive_structure'] = 0.0
+        
+        passive_count = analysis.count(PASSIVE_PATTERN.pattern, lower=True)
+        markers['passive_voice'] = min(passive_count / sentence_count * 0.6, 1.0)
+        
+        hedging_count = sum(words[word] for word in self.hedging)
+        markers['hedging_language'] = min(hedging_count / sentence_count * 0.4, 1.0)
+        
+        avg_word_length = sum(len(token) for token in tokens) / max(len(tokens), 1)
+        avg_sentence_length = len(tokens) / sentence_count
+        complexity = (avg_word_length / 6.0) * 0.5 + (avg_sentence_length / 20.0) * 0.5
+        markers['complexity'] = min(complexity, 1.0)
+        
+        markers['vocabulary_diversity'] = min(len(words) / max(word_total, 1) * 1.5, 1.0)
+        markers['conclusion_markers'] = min(lexicons['conclusion_markers'] * 0.3, 1.0)
+        
+        if len(sentences) > 1:
+            sentence_lengths = [len(s) for s in analysis.sentence_words]
+            avg_length = sum(sentence_lengths) / len(sentence_lengths)
+            variance = sum((l - avg_length) ** 2 for l in sentence_lengths) / len(sentence_lengths)
+            markers['sentence_length_variance'] = min(math.sqrt(variance) / 10.0, 1.0)
+        else:
+            markers['sentence_length_variance'] = 0.0
+        
+        punctuation_count = analysis.count(PUNCTUATION_PATTERN.pattern, lower=True)
+        markers['punctuation_patterns'] = min(punctuation_count / sentence_count * 0.3, 1.0)
+        markers['rare_word_usage'] = min(lexicons['rare_word_usage'] * 0.2, 1.0)
+        return markers
+
+
+marker_engine = MarkerEngine()
@@ -0,0 +1,143 @@
+import re
+import time
+from difflib import SequenceMatcher
+
+
+class SeedExtendAligner:
+    """Bounded-cost replacement for SequenceMatcher.ratio() on long texts
+    
+    Small pairs still go through SequenceMatcher so their scores are unchanged,
+    but under the same budget: its matching blocks are found one
+    find_longest_match call at a time, and once half of time_budget has
+    passed the pair is aligned by seed-and-extend in the time left. Larger
+    pairs are aligned by seed-and-extend over whitespace tokens: every
+    k-token seed of the second text is hashed once, the first text is scanned
+    left to right, and each seed hit is extended as far as the tokens agree.
+    The cost is near-linear in the number of tokens and the scan stops once
+    time_budget seconds have passed, returning what it matched so far.
+    
+    The two measures agree on identical texts but not in between, so a pair's
+    score jumps when len(text1) * len(text2) crosses exact_limit.
+    SequenceMatcher counts matching character blocks, and its autojunk
+    heuristic loses most of an edited copy longer than 200 characters;
+    seed-and-extend counts only runs of at least seed_size equal tokens, so
+    lightly edited copies score higher and texts sharing only common words
+    score near 0. Compare scores from the same side of the limit.
+    """
+    
+    def __init__(self, seed_size=3, time_budget=1.0, exact_limit=25_000_000):
+        self.seed_size = seed_size
+        self.time_budget = time_budget
+        self.exact_limit = exact_limit
+        self.max_seed_hits = 8
+        self.check_interval = 1024
+    
+    def similarity(self, text1, text2):
+        """Similarity in [0, 1] with the same contract as SequenceMatcher.ratio()"""
+        return self.align(text1, text2)['similarity']
+    
+    def align(self, text1, text2):
+        """Similarity plus the matched spans as character offsets in both texts"""
+        total = len(text1) + len(text2)
+        if not total:
+            return {'similarity': 1.0, 'spans': [], 'complete': True}
+        
+        started = time.monotonic()
+        if len(text1) * len(text2) <= self.exact_limit:
+            result = self._exact(text1, text2, started + self.time_budget / 2)
+            if result is not None:
+                return result
+        return self._seed_and_extend(text1, text2, started + self.time_budget)
+    
+    def _exact(self, text1, text2, deadline):
+        """SequenceMatcher's matching blocks and ratio, or None if the deadline passes first
+        
+        Follows SequenceMatcher.get_matching_blocks, checking the deadline
+        between find_longest_match calls; the result equals ratio() exactly.
+        """
+        matcher = SequenceMatcher(None, text1, text2)
+        queue = [(0, len(text1), 0, len(text2))]
+        blocks = []
+        while queue:
+            if time.monotonic() > deadline:
+                return None
+            alo, ahi, blo, bhi = queue.pop()
+            i, j, size = matcher.find_longest_match(alo, ahi, blo, bhi)
+            if size:
+                blocks.append((i, j, size))
+                if alo < i and blo < j:
+                    queue.append((alo, i, blo, j))
+                if i + size < ahi and j + size < bhi:
+                    queue.append((i + size, ahi, j + size, bhi))
+        blocks.sort()
+        
+        spans = []
+        for a, b, size in blocks:
+            last = spans[-1] if spans else None
+            # Adjacent blocks are one span, as get_matching_blocks merges them
+            if last and last['end'] == a and last['source_end'] == b:
+                last['end'] += size
+                last['source_end'] += size
+            else:
+                spans.append({'start': a, 'end': a + size, 'source_start': b, 'source_end': b + size})
+        matched = sum(size for _, _, size in blocks)
+        return {'similarity': 2.0 * matched / (len(text1) + len(text2)), 'spans': spans, 'complete': True}
+    
+    def _seed_and_extend(self, text1, text2, deadline):
+        k = self.seed_size
+        tokens1 = [(m.group(), m.start(), m.end()) for m in re.finditer(r'\S+', text1)]
+        tokens2 = [(m.group(), m.start(), m.end()) for m in re.finditer(r'\S+', text2)]
+        words1 = [t[0] for t in tokens1]
+        words2 = [t[0] for t in tokens2]
+        
+        seeds = {}
+        for j in range(len(words2) - k + 1):
+            hits = seeds.setdefault(tuple(words2[j:j+k]), [])
+            if len(hits) < self.max_seed_hits:
+                hits.append(j)
+        
+        used = bytearray(len(words2))
+        spans = []
+        matched = 0
+        complete = True
+        steps = 0
+        i = 0
+        while i <= len(words1) - k:
+            steps += 1
+            if steps % self.check_interval == 0 and time.monotonic() > deadline:
+                complete = False
+                break
+            
+            best_length = 0
+            best_j = 0
+            for j in seeds.get(tuple(words1[i:i+k]), ()):
+                if used[j]:
+                    continue
+                length = 0
+                while (i + length < len(words1) and j + length < len(words2) and
+                       not used[j + length] and words1[i + length] == words2[j + length]):
+                    length += 1
+                if length > best_length:
+                    best_length, best_j = length, j
+            
+            if best_length < k:
+                i += 1
+                continue
+            
+            start, end = tokens1[i][1], tokens1[i + best_length - 1][2]
+            source_start, source_end = tokens2[best_j][1], tokens2[best_j + best_length - 1][2]
+            spans.append({'start': start, 'end': end, 'source_start': source_start, 'source_end': source_end})
+            matched += min(end - start, source_end - source_start)
+            used[best_j:best_j + best_length] = b'\x01' * best_length
+            i += best_length
+        
+        similarity = 2.0 * matched / (len(text1) + len(text2))
+        return {'similarity': min(similarity, 1.0), 'spans': spans, 'complete': complete}
+
+
+default_aligner = SeedExtendAligner()
+
+
+def sequence_similarity(text1, text2):
+    """Drop-in for SequenceMatcher(None, text1, text2).ratio() with bounded cost"""
+    return default_aligner.similarity(text1, text2)
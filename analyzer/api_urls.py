@@ -3,9 +3,15 @@ from . import api_views
 
 urlpatterns = [
     path('plagiarism-check/', api_views.plagiarism_check_api, name='api_plagiarism_check'),
+    path('plagiarism-check/batch/', api_views.plagiarism_check_batch_api, name='api_plagiarism_check_batch'),
+    path('plagiarism-check/passages/', api_views.plagiarism_passages_api, name='api_plagiarism_passages'),
+    path('plagiarism-check/<uuid:check_id>/', api_views.plagiarism_check_status_api, name='api_plagiarism_check_status'),
     path('plagiarism-removal/', api_views.plagiarism_removal_api, name='api_plagiarism_removal'),
     path('ai-detection/', api_views.ai_detection_api, name='api_ai_detection'),
+    path('ai-detection/ensemble/', api_views.ai_ensemble_api, name='api_ai_ensemble'),
+    path('ai-detection/heatmap/', api_views.ai_heatmap_api, name='api_ai_heatmap'),
     path('shorten-url/', api_views.shorten_url_api, name='api_shorten_url'),
     path('generate-qr/', api_views.generate_qr_api, name='api_generate_qr'),
     path('add-document/', api_views.add_document_api, name='api_add_document'),
+    path('models/', api_views.models_status_api, name='api_models_status'),
 ]
\ No newline at end of file
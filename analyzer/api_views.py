@@ -1,13 +1,52 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
 from .models import Document, PlagiarismCheck, AIDetection, URLShortener, QRCode, PlagiarismRemoval
 from .services import PlagiarismDetector, AIDetector, URLShortenerService, QRCodeGenerator, PlagiarismRemover
+from .shingle_index import ShingleIndex
+from .tasks import enqueue_plagiarism_check, wait_for_check
+from .batch_check import BatchPlagiarismChecker
+from .passages import PassageDetector
+from .streaming_ai import StreamingAIDetector
+from .ai_ensemble import AIEnsemble
+from .model_registry import registry
+
+# Longest a request thread blocks on a check, well under gunicorn's 30 s worker timeout;
+# unfinished checks answer 202 with a status_url to poll
+MAX_WAIT_SECONDS = 10
+
+def _check_payload(check):
+    payload = {
+        'id': str(check.id),
+        'status': check.status,
+        'progress': check.progress,
+        'threshold': check.threshold
+    }
+    if check.status == 'completed':
+        payload.update({
+            'similarity_score': check.similarity_score,
+            'is_plagiarized': check.is_plagiarized,
+            'matches': check.matches
+        })
+    elif check.status == 'failed':
+        payload['error'] = check.error
+    return payload
+
+def _ndjson_lines(results):
+    """One JSON line per result; a failure mid-stream ends the body with an {"error": ...} line"""
+    try:
+        for result in results:
+            yield json.dumps(result) + '\n'
+    except Exception as e:
+        yield json.dumps({'error': str(e)}) + '\n'
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def plagiarism_check_api(request):
+    """Queue a check; waits for the result unless "async" is set (then poll the status URL)"""
     try:
         data = json.loads(request.body)
         text = data.get('text', '')
@@ -16,25 +55,81 @@ def plagiarism_check_api(request):
         if not text:
             return JsonResponse({'error': 'Text is required'}, status=400)
         
-        detector = PlagiarismDetector()
-        documents = Document.objects.all()
-        results = detector.detect_plagiarism(text, documents, threshold)
+        check = PlagiarismCheck.objects.create(text=text, threshold=threshold, status='pending', progress=0)
+        enqueue_plagiarism_check(check, engine='services')
         
-        similarity_score = max([r['similarity'] for r in results]) if results else 0.0
+        if data.get('async'):
+            check.refresh_from_db()
+        else:
+            check = wait_for_check(check.id, MAX_WAIT_SECONDS)
         
-        check = PlagiarismCheck.objects.create(
-            text=text,
-            similarity_score=similarity_score,
-            is_plagiarized=similarity_score > threshold,
-            matches=results
-        )
+        payload = _check_payload(check)
+        payload['status_url'] = reverse('api_plagiarism_check_status', args=[check.id])
+        if check.status == 'failed':
+            return JsonResponse(payload, status=500)
+        return JsonResponse(payload, status=200 if check.status == 'completed' else 202)
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def plagiarism_check_status_api(request, check_id):
+    """Status and progress of a check; ?wait=N long-polls up to N seconds for it to finish"""
+    check = get_object_or_404(PlagiarismCheck, id=check_id)
+    try:
+        wait = min(float(request.GET.get('wait', 0)), MAX_WAIT_SECONDS)
+    except ValueError:
+        return JsonResponse({'error': 'wait must be a number of seconds'}, status=400)
+    
+    if wait > 0:
+        check = wait_for_check(check.id, wait)
+    return JsonResponse(_check_payload(check))
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def plagiarism_check_batch_api(request):
+    """Check a list of texts; streams one NDJSON line per text as results are ready
+    
+    "cross_compare": true adds a last line clustering submissions that copy each other.
+    """
+    try:
+        data = json.loads(request.body)
+        texts = data.get('texts')
+        threshold = float(data.get('threshold', 0.7))
+        cross_threshold = data.get('cross_threshold')
+        cross_threshold = float(cross_threshold) if cross_threshold is not None else None
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if not isinstance(texts, list) or not texts:
+        return JsonResponse({'error': 'texts must be a non-empty list'}, status=400)
+    
+    checker = BatchPlagiarismChecker(threshold)
+    if len(texts) > checker.max_batch_size:
+        return JsonResponse({'error': f'At most {checker.max_batch_size} texts per batch'}, status=400)
+    
+    results = checker.check(texts, bool(data.get('cross_compare')), cross_threshold)
+    return StreamingHttpResponse(_ndjson_lines(results), content_type='application/x-ndjson')
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def plagiarism_passages_api(request):
+    """Passage-level check: copied spans with offsets in the text and in each source"""
+    try:
+        data = json.loads(request.body)
+        text = data.get('text', '')
+        
+        if not text:
+            return JsonResponse({'error': 'Text is required'}, status=400)
+        
+        detector = PassageDetector()
+        if 'min_similarity' in data:
+            detector.min_similarity = float(data['min_similarity'])
+        matches = detector.detect(text)
         
         return JsonResponse({
-            'id': str(check.id),
-            'similarity_score': similarity_score,
-            'is_plagiarized': check.is_plagiarized,
-            'matches': results,
-            'threshold': threshold
+            'coverage': max([m['coverage'] for m in matches]) if matches else 0.0,
+            'matches': matches
         })
         
     except Exception as e:
@@ -53,7 +148,7 @@ def plagiarism_removal_api(request):
         
         # Check original similarity
         detector = PlagiarismDetector()
-        documents = Document.objects.all()
+        documents = ShingleIndex().candidate_documents(text)
         original_results = detector.detect_plagiarism(text, documents, 0.1)
         original_similarity = max([r['similarity'] for r in original_results]) if original_results else 0.0
         
@@ -113,12 +208,55 @@ def ai_detection_api(request):
             'ai_probability': result['ai_probability'],
             'is_ai_generated': result['is_ai_generated'],
             'humanized_text': humanized,
-            'confidence': result.get('confidence', result['ai_probability'])
+            'confidence': result.get('confidence', result['ai_probability']),
+            'windows': result.get('windows', [])
         })
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def ai_ensemble_api(request):
+    """Every AI detector's score of a text, and their combined score"""
+    try:
+        data = json.loads(request.body)
+        text = data.get('text', '')
+        
+        if not text:
+            return JsonResponse({'error': 'Text is required'}, status=400)
+        
+        return JsonResponse(AIEnsemble().detect(text))
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def ai_heatmap_api(request):
+    """Marker-based AI score of a text or uploaded document, per window of sentences"""
+    try:
+        document = request.FILES.get('document')
+        data = request.POST if document else json.loads(request.body)
+        detector = StreamingAIDetector()
+        if data.get('window_sentences'):
+            detector.window_sentences = max(1, int(data['window_sentences']))
+        
+        if document:
+            result = detector.check_file(document)
+        elif data.get('text'):
+            result = detector.check([data['text']])
+        else:
+            return JsonResponse({'error': 'Text or document is required'}, status=400)
+        
+        result.pop('text')
+        return JsonResponse(result)
+        
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def shorten_url_api(request):
@@ -214,4 +352,11 @@ def add_document_api(request):
         })
         
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def models_status_api(request):
+    """Models loaded in this worker process and the memory they hold (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    return JsonResponse(registry.resident())
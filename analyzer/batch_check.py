@@ -0,0 +1,124 @@
+from django.db import DatabaseError
+from .models import Document, PlagiarismCheck
+from .services import PlagiarismDetector
+from .shingle_index import ShingleIndex
+from .text_features import TextFeatures, with_features
+from .parallel_compare import ParallelComparer
+from .cross_compare import CrossComparer
+
+
+def _check_text(detector, text, threshold, candidates):
+    """Score one batch item against its (id, title, packed features, content) candidates
+    
+    Returns (results, None), or (None, error message) when scoring raised,
+    so one bad item does not end the batch.
+    """
+    try:
+        items = ((doc_id, title, TextFeatures.from_fields(fields), content)
+                 for doc_id, title, fields, content in candidates)
+        results = detector._compare(TextFeatures.from_text(text), text, items, threshold)
+    except Exception as e:
+        return None, str(e)
+    return sorted(results, key=lambda x: x['similarity'], reverse=True), None
+
+
+class BatchPlagiarismChecker:
+    """Checks many texts per call against the corpus
+    
+    The shingle index is probed once per group of `probe_size` texts and
+    each group's candidate documents are loaded once, so memory is bounded
+    by a group's postings and candidates, not the whole batch's. The texts are
+    scored across the process pool and the PlagiarismCheck rows are written
+    with bulk_create. An item that fails to score or save gets an error
+    record and the batch goes on.
+    """
+    
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.max_batch_size = 500
+        self.chunk_size = 25
+        # Texts whose shingle postings and candidate documents are held in memory at once
+        self.probe_size = 50
+        # Smaller batches are scored in-process; the pool is not worth the pickling
+        self.parallel_min_texts = 8
+        self.detector = PlagiarismDetector()
+        self.comparer = ParallelComparer()
+    
+    def check(self, texts, cross_compare=False, cross_threshold=None):
+        """Yield one result dict per text, in input order
+        
+        With cross_compare, a final {'cross_comparison': ...} item reports the
+        submissions in the batch that copy each other.
+        """
+        if len(texts) > self.max_batch_size:
+            raise ValueError(f'At most {self.max_batch_size} texts per batch')
+        
+        valid = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+        if len(valid) >= self.parallel_min_texts:
+            scored = self.comparer.imap(_check_text, self._tasks(texts, valid))
+        else:
+            scored = (_check_text(*args) for args in self._tasks(texts, valid))
+        valid = set(valid)
+        
+        pending = []
+        for i, text in enumerate(texts):
+            if i not in valid:
+                pending.append((i, 'Text is required'))
+            else:
+                results, error = next(scored)
+                if error is None:
+                    similarity_score = max([r['similarity'] for r in results]) if results else 0.0
+                    pending.append((i, PlagiarismCheck(
+                        text=text,
+                        similarity_score=similarity_score,
+                        is_plagiarized=similarity_score > self.threshold,
+                        matches=results,
+                        threshold=self.threshold
+                    )))
+                else:
+                    pending.append((i, error))
+            if len(pending) >= self.chunk_size:
+                yield from self._flush(pending)
+                pending = []
+        yield from self._flush(pending)
+        
+        if cross_compare:
+            yield {'cross_comparison': CrossComparer(cross_threshold).compare(texts)}
+    
+    def _tasks(self, texts, valid):
+        """_check_text arguments of each valid text, probing the index a group of texts at a time"""
+        index = ShingleIndex()
+        for first in range(0, len(valid), self.probe_size):
+            group = valid[first:first + self.probe_size]
+            candidate_ids = index.candidate_ids_batch([texts[i] for i in group])
+            all_ids = {doc_id for ids in candidate_ids for doc_id in ids}
+            documents = {doc.id: doc for doc in with_features(Document.objects.filter(id__in=all_ids)).iterator()}
+            packed = {}
+            for i, ids in zip(group, candidate_ids):
+                docs = [documents[doc_id] for doc_id in ids if doc_id in documents]
+                if self.detector.lsh:
+                    docs = self.detector.lsh.prefilter(texts[i], docs)
+                for doc in docs:
+                    if doc.id not in packed:
+                        packed[doc.id] = (str(doc.id), doc.title, TextFeatures.fields_for_document(doc), doc.content)
+                yield (self.detector, texts[i], self.threshold, [packed[doc.id] for doc in docs])
+    
+    def _flush(self, pending):
+        """Save a chunk of checks and yield their records; a chunk that fails to save reports the error per item"""
+        checks = [check for _, check in pending if isinstance(check, PlagiarismCheck)]
+        try:
+            PlagiarismCheck.objects.bulk_create(checks)
+        except DatabaseError as e:
+            pending = [(index, str(e) if isinstance(check, PlagiarismCheck) else check) for index, check in pending]
+        for index, check in pending:
+            if not isinstance(check, PlagiarismCheck):
+                yield {'index': index, 'error': check}
+                continue
+            yield {
+                'index': index,
+                'id': str(check.id),
+                'similarity_score': check.similarity_score,
+                'is_plagiarized': check.is_plagiarized,
+                'matches': check.matches,
+                'threshold': check.threshold
+            }
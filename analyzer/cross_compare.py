@@ -0,0 +1,109 @@
+from collections import defaultdict
+from .minhash_lsh import MinHashLSH
+from .shingle_index import ShingleIndex
+from .text_features import TextFeatures
+from .ultimate_detector import UltimatePlagiarismDetector
+
+
+class CrossComparer:
+    """All-pairs near-duplicate search within one batch of submissions
+    
+    MinHash/LSH banding proposes candidate pairs, so most of the n*(n-1)/2
+    pairs are never scored. Each candidate pair goes through the
+    UltimatePlagiarismDetector cascade, and pairs at or above the threshold
+    are grouped into clusters with union-find. Items that are not text are
+    skipped and listed by index. Buckets too large to expand into pairs are
+    reported with their members rather than dropped unseen.
+    """
+    
+    def __init__(self, threshold=None):
+        self.detector = UltimatePlagiarismDetector()
+        if threshold is not None:
+            self.detector.plagiarism_threshold = threshold
+        self.lsh = MinHashLSH()
+        # Buckets shared by more submissions than this are boilerplate (a common prompt or template)
+        self.max_bucket_size = 200
+    
+    def compare(self, texts):
+        """Pairs of submissions that copy each other, grouped into clusters"""
+        shingler = ShingleIndex()
+        valid = [isinstance(text, str) and bool(text.strip()) for text in texts]
+        signatures = [self.lsh.signature(shingler.shingles(text)) if ok else None for text, ok in zip(texts, valid)]
+        pairs, oversized = self.candidate_pairs(signatures)
+        
+        features = {}
+        stats = self.detector._empty_stats()
+        matches = []
+        for a, b in sorted(pairs):
+            if not self._comparable(texts[a]) or not self._comparable(texts[b]):
+                continue
+            for i in (a, b):
+                if i not in features:
+                    features[i] = (TextFeatures.from_text(texts[i]), texts[i].lower())
+            stats['candidates'] += 1
+            metrics = self.detector._cascade_score(features[a][0], features[b][0], features[a][1], features[b][1],
+                                                   None, None, stats)
+            if metrics is None:
+                continue
+            stats['scored'] += 1
+            similarity = self.detector._weighted_score(metrics)
+            if similarity >= self.detector.plagiarism_threshold:
+                matches.append({'a': a, 'b': b, 'similarity': similarity, 'metrics': metrics})
+        
+        return {
+            'submissions': len(texts),
+            'skipped': [i for i, ok in enumerate(valid) if not ok],
+            'candidate_pairs': len(pairs),
+            'oversized_buckets': oversized,
+            'pairs': sorted(matches, key=lambda m: m['similarity'], reverse=True),
+            'clusters': self.clusters(matches),
+            'cascade': stats
+        }
+    
+    def candidate_pairs(self, signatures):
+        """Index pairs sharing at least one LSH bucket, and the members of buckets over max_bucket_size"""
+        buckets = defaultdict(list)
+        for i, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            for key in self.lsh.band_keys(signature):
+                buckets[key].append(i)
+        
+        pairs = set()
+        oversized = set()
+        for members in buckets.values():
+            if len(members) > self.max_bucket_size:
+                oversized.add(tuple(members))
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+        return pairs, [list(members) for members in sorted(oversized)]
+    
+    def clusters(self, matches):
+        """Connected components of the matched pairs, largest first"""
+        parent = {}
+        
+        def find(i):
+            parent.setdefault(i, i)
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        for match in matches:
+            root_a, root_b = find(match['a']), find(match['b'])
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        groups = defaultdict(lambda: {'members': set(), 'max_similarity': 0.0})
+        for match in matches:
+            group = groups[find(match['a'])]
+            group['members'].update((match['a'], match['b']))
+            group['max_similarity'] = max(group['max_similarity'], match['similarity'])
+        
+        clusters = [{'members': sorted(g['members']), 'max_similarity': g['max_similarity']} for g in groups.values()]
+        return sorted(clusters, key=lambda c: (-len(c['members']), c['members'][0]))
+    
+    def _comparable(self, text):
+        return isinstance(text, str) and len(text.strip()) >= self.detector.min_text_length
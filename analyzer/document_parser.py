@@ -1,6 +1,8 @@
 import os
+import codecs
 import subprocess
-import tempfile
+from django.conf import settings
+from .pdf_extraction import PDF_AVAILABLE, PdfExtractor
 
 try:
     import docx
@@ -8,29 +10,30 @@ try:
 except ImportError:
     DOCX_AVAILABLE = False
 
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from PIL import Image
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+from .ocr import OCR_AVAILABLE, OcrPipeline
 
 
 class DocumentParser:
+    # Plain-text uploads are decoded in blocks of about this many bytes
+    text_block_size = 1 << 20
+    
     @staticmethod
     def extract_text_from_file(file):
+        text = ''.join(DocumentParser.iter_text(file))
+        return text.strip()
+    
+    @staticmethod
+    def iter_text(file):
+        """Yield the text of an upload piece by piece (pages, paragraphs or blocks)
+        
+        Joining the pieces gives the full text, so callers that need bounded
+        memory can process one piece at a time instead of the whole document.
+        """
         file_extension = os.path.splitext(file.name)[1].lower()
         file.seek(0)
         
         if file_extension == '.txt':
-            content = file.read()
-            return content.decode('utf-8', errors='ignore').strip() if isinstance(content, bytes) else str(content).strip()
+            return DocumentParser._iter_txt(file)
         
         if file_extension == '.pdf':
             return DocumentParser._extract_from_pdf_fallback(file)
@@ -40,90 +43,85 @@ class DocumentParser:
                 raise ValueError("Word files not supported. Install: pip install python-docx")
             return DocumentParser._extract_from_docx(file)
         
-        if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
+        if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']:
             if not OCR_AVAILABLE:
                 raise ValueError("Images not supported. Install: pip install Pillow pytesseract")
             return DocumentParser._extract_from_image(file)
         
         raise ValueError(f"Unsupported file type: {file_extension}")
     
+    @staticmethod
+    def _iter_txt(file):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        while True:
+            block = file.read(DocumentParser.text_block_size)
+            if not block:
+                break
+            yield decoder.decode(block) if isinstance(block, bytes) else str(block)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+    
     @staticmethod
     def _extract_from_pdf_fallback(file):
         if PDF_AVAILABLE:
-            return DocumentParser._extract_from_pdf(file)
+            yield from DocumentParser._extract_from_pdf(file)
+            return
         
+        found = False
         try:
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
-                tmp.write(file.read())
-                tmp_path = tmp.name
-            
-            try:
-                result = subprocess.run(['pdftotext', tmp_path, '-'], capture_output=True, text=True, timeout=10)
-                if result.returncode == 0 and result.stdout.strip():
-                    return result.stdout.strip()
-            except:
-                pass
-            
+            for page in PdfExtractor(max_pages=settings.PDF_MAX_PAGES).pages(file):
+                if page.strip():
+                    found = True
+                    yield page + "\n"
+        except (OSError, subprocess.SubprocessError):
+            pass
+        
+        if not found:
             raise ValueError("PDF extraction failed. Install: pip install PyPDF2")
-        finally:
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
     
     @staticmethod
     def _extract_from_pdf(file):
-        text = ""
+        found = False
         try:
-            file.seek(0)
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            if len(pdf_reader.pages) == 0:
-                raise ValueError("PDF has no pages")
-            
-            for page in pdf_reader.pages:
-                try:
-                    extracted = page.extract_text()
-                    if extracted and extracted.strip():
-                        text += extracted + "\n"
-                except:
-                    continue
+            for extracted in PdfExtractor(max_pages=settings.PDF_MAX_PAGES).pages(file):
+                if extracted and extracted.strip():
+                    found = True
+                    yield extracted + "\n"
         except Exception as e:
             raise ValueError(f"PDF extraction failed: {str(e)}")
         
-        if not text.strip():
+        if not found:
             raise ValueError("No readable text found in PDF")
-        
-        return text.strip()
     
     @staticmethod
     def _extract_from_docx(file):
+        found = False
         try:
             file.seek(0)
             doc = docx.Document(file)
-            text = ""
             
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
-                    text += paragraph.text + "\n"
-            
-            if not text.strip():
-                raise ValueError("No text found in document")
-            
-            return text.strip()
+                    found = True
+                    yield paragraph.text + "\n"
         except Exception as e:
             raise ValueError(f"DOCX extraction failed: {str(e)}")
+        
+        if not found:
+            raise ValueError("DOCX extraction failed: No text found in document")
     
     @staticmethod
     def _extract_from_image(file):
+        found = False
         try:
             file.seek(0)
-            image = Image.open(file)
-            text = pytesseract.image_to_string(image)
+            for text in OcrPipeline().pages(file):
+                if text.strip():
+                    found = True
+                    yield text + "\n"
         except Exception as e:
             raise ValueError(f"Image extraction failed: {str(e)}")
         
-        if not text.strip():
+        if not found:
             raise ValueError("No text found in image")
-        
-        return text.strip()
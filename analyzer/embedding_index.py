@@ -0,0 +1,319 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class EmbeddingIndex:
+    """Document embeddings in a float32 memory-mapped matrix with an IVF search index
+    
+    Rows are keyed by document id and tagged with the document fingerprint so
+    edited documents can be re-embedded. Vectors are stored L2-normalised, so a
+    dot product is the cosine similarity. Below `min_train` rows search is an
+    exact scan; above it, rows are bucketed under k-means centroids and only the
+    `nprobe` closest buckets are scanned.
+    
+    Writers hold an exclusive lock on the store (a shared one for searches) and
+    reload it first when another process has saved since. Vectors are written
+    before meta.json, which is replaced atomically and is the commit point:
+    bytes appended past the rows it lists are overwritten by the next append,
+    and compaction writes a new vector file that meta.json then switches to.
+    """
+    
+    def __init__(self, path, nprobe=8, min_train=1000, kmeans_iterations=10, train_sample=20000):
+        self.path = path
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.kmeans_iterations = kmeans_iterations
+        self.train_sample = train_sample
+        self._held = threading.local()
+        self._reset()
+        self.load()
+    
+    def _reset(self):
+        self.keys = []
+        self.fingerprints = []
+        self.rows = {}
+        self.dim = None
+        self.vector_file = 'vectors.f32'
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._vectors = None
+        self._lists = None
+        self._stamp = None
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def __contains__(self, key):
+        return str(key) in self.rows
+    
+    def is_current(self, key, fingerprint):
+        row = self.rows.get(str(key))
+        return row is not None and self.fingerprints[row] == fingerprint
+    
+    def load(self):
+        stamp = self._meta_stamp()
+        if stamp is None:
+            return False
+        with open(self._meta_path()) as f:
+            meta = json.load(f)
+        self._reset()
+        self._stamp = stamp
+        self.dim = meta['dim']
+        self.keys = meta['keys']
+        self.fingerprints = meta['fingerprints']
+        self.vector_file = meta.get('vector_file', 'vectors.f32')
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        ivf_path = os.path.join(self.path, 'ivf.npz')
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            # Lists saved out of step with meta.json (an interrupted write) are retrained
+            if len(ivf['centroids']) and len(ivf['assignments']) == len(self.keys):
+                self.centroids = ivf['centroids']
+                self.assignments = ivf['assignments']
+        return True
+    
+    def vectors(self):
+        """Memory-mapped (rows, dim) float32 matrix"""
+        if not self.keys:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._vectors is None or len(self._vectors) != len(self.keys):
+            self._vectors = np.memmap(self._vector_path(), dtype=np.float32, mode='r',
+                                      shape=(len(self.keys), self.dim))
+        return self._vectors
+    
+    def add(self, key, fingerprint, vector):
+        """Add or replace the embedding of one document"""
+        self.add_many([(key, fingerprint, vector)])
+    
+    def add_many(self, items):
+        """Add or replace embeddings given (key, fingerprint, vector) tuples"""
+        items = [(str(key), fingerprint, self._normalize(vector)) for key, fingerprint, vector in items]
+        if not items:
+            return
+        with self._locked():
+            self._add_many(items)
+    
+    def _add_many(self, items):
+        if self.dim is None:
+            self.dim = len(items[0][2])
+        os.makedirs(self.path, exist_ok=True)
+        
+        replaced = [(self.rows[key], fingerprint, vector) for key, fingerprint, vector in items if key in self.rows]
+        if replaced:
+            self._vectors = None
+            matrix = np.memmap(self._vector_path(), dtype=np.float32, mode='r+', shape=(len(self.keys), self.dim))
+            for row, fingerprint, vector in replaced:
+                matrix[row] = vector
+                self.fingerprints[row] = fingerprint
+            matrix.flush()
+            del matrix
+        
+        committed = len(self.keys)
+        added = []
+        for key, fingerprint, vector in items:
+            if key in self.rows:
+                continue
+            self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            self.fingerprints.append(fingerprint)
+            added.append(vector)
+        if added:
+            # Overwrite anything an interrupted append left past the committed rows
+            with open(self._vector_path(), 'r+b' if os.path.exists(self._vector_path()) else 'wb') as f:
+                f.seek(committed * self.dim * 4)
+                f.write(np.asarray(added, dtype=np.float32).tobytes())
+                f.truncate()
+        
+        if self.centroids is not None:
+            rows = [self.rows[key] for key, _, _ in items]
+            if len(self.assignments) < len(self.keys):
+                self.assignments = np.concatenate(
+                    [self.assignments, np.zeros(len(self.keys) - len(self.assignments), dtype=np.int32)])
+            vectors = np.asarray([vector for _, _, vector in items], dtype=np.float32)
+            self.assignments[rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+            self._lists = None
+        self.save()
+    
+    def remove(self, keys):
+        """Drop the embeddings of the given keys; returns how many were stored"""
+        with self._locked():
+            dropped = {self.rows[str(key)] for key in keys if str(key) in self.rows}
+            if not dropped:
+                return 0
+            keep = np.array([row for row in range(len(self.keys)) if row not in dropped], dtype=np.int64)
+            vectors = self.vectors()
+            old_path = self._vector_path()
+            self.vector_file = 'vectors.f32' if self.vector_file != 'vectors.f32' else 'vectors-1.f32'
+            with open(self._vector_path(), 'wb') as f:
+                for first in range(0, len(keep), 10000):
+                    f.write(np.asarray(vectors[keep[first:first + 10000]], dtype=np.float32).tobytes())
+            del vectors
+            self._vectors = None
+            
+            self.keys = [self.keys[row] for row in keep]
+            self.fingerprints = [self.fingerprints[row] for row in keep]
+            self.rows = {key: row for row, key in enumerate(self.keys)}
+            if self.centroids is not None:
+                self.assignments = self.assignments[keep]
+            self._lists = None
+            self.save()
+            os.remove(old_path)
+            return len(dropped)
+    
+    def train(self, seed=1):
+        """Cluster the stored vectors into about sqrt(n) lists (spherical k-means)"""
+        with self._locked():
+            return self._train(seed)
+    
+    def _train(self, seed):
+        vectors = self.vectors()
+        if len(vectors) < self.min_train:
+            self.centroids = None
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self._lists = None
+            self.save()
+            return 0
+        
+        rng = np.random.default_rng(seed)
+        nlist = int(np.sqrt(len(vectors)))
+        sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), self.train_sample), replace=False))]
+        sample = np.asarray(sample)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = self._normalize(members.sum(axis=0))
+        
+        self.centroids = centroids
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for first in range(0, len(vectors), 10000):
+            block = np.asarray(vectors[first:first + 10000])
+            assignments[first:first + 10000] = np.argmax(block @ centroids.T, axis=1)
+        self.assignments = assignments
+        self._lists = None
+        self.save()
+        return nlist
+    
+    def train_if_needed(self):
+        """Train the IVF lists once the store outgrows exact search"""
+        if self.centroids is None and len(self) >= self.min_train:
+            return self.train()
+        return 0
+    
+    def search(self, vector, k=10, keys=None):
+        """Top-k (key, similarity) pairs, optionally restricted to the given keys"""
+        with self._locked(shared=True):
+            return self._search(vector, k, keys)
+    
+    def _search(self, vector, k, keys):
+        vectors = self.vectors()
+        if not len(vectors):
+            return []
+        query = self._normalize(vector)
+        
+        if keys is not None:
+            rows = np.array(sorted(self.rows[str(key)] for key in keys if str(key) in self.rows), dtype=np.int64)
+        elif self.centroids is not None:
+            probes = np.argsort(self.centroids @ query)[-self.nprobe:]
+            lists = self._inverted_lists()
+            rows = np.sort(np.concatenate([lists.get(int(c), np.zeros(0, dtype=np.int64)) for c in probes]))
+        else:
+            rows = None
+        
+        if rows is None:
+            scores = np.asarray(vectors @ query)
+            rows = np.arange(len(scores))
+        elif not len(rows):
+            return []
+        else:
+            scores = np.asarray(vectors[rows] @ query)
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.keys[rows[i]], float(scores[i])) for i in top]
+    
+    def save(self):
+        with self._locked():
+            centroids = self.centroids if self.centroids is not None else np.zeros((0, self.dim or 0), dtype=np.float32)
+            ivf_path = os.path.join(self.path, 'ivf.npz')
+            with open(ivf_path + '.tmp', 'wb') as f:
+                np.savez(f, centroids=centroids, assignments=self.assignments)
+            os.replace(ivf_path + '.tmp', ivf_path)
+            
+            meta = {'dim': self.dim, 'keys': self.keys, 'fingerprints': self.fingerprints,
+                    'vector_file': self.vector_file}
+            with open(self._meta_path() + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(self._meta_path() + '.tmp', self._meta_path())
+            self._stamp = self._meta_stamp()
+    
+    def clear(self):
+        """Drop every stored embedding"""
+        with self._locked():
+            for name in ('meta.json', 'ivf.npz', 'vectors.f32', 'vectors-1.f32'):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+            self._reset()
+    
+    @contextmanager
+    def _locked(self, shared=False):
+        """Hold the store's lock file, reloading the store if another process saved it since"""
+        if getattr(self._held, 'depth', 0):
+            self._held.depth += 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+        if shared and not os.path.isdir(self.path):
+            yield
+            return
+        
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._held.depth = 1
+            try:
+                if self._stamp != self._meta_stamp():
+                    if not self.load():
+                        self._reset()
+                yield
+            finally:
+                self._held.depth = 0
+    
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+    
+    def _meta_stamp(self):
+        try:
+            stat = os.stat(self._meta_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind='stable')
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = {c: order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))}
+        return self._lists
+    
+    def _vector_path(self):
+        return os.path.join(self.path, self.vector_file)
+    
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
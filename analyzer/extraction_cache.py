@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+import threading
+from collections import Counter
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .document_parser import DocumentParser
+from .models import ExtractedText
+
+try:
+    from langdetect import detect as langdetect_detect
+    LANGDETECT_AVAILABLE = True
+except ImportError:
+    LANGDETECT_AVAILABLE = False
+
+# Fallback language guess when langdetect is not installed: most frequent stop-word family
+LANGUAGE_STOP_WORDS = {
+    'en': {'the', 'and', 'of', 'to', 'is', 'that', 'with', 'for', 'this', 'are'},
+    'es': {'el', 'la', 'de', 'que', 'y', 'los', 'las', 'por', 'una', 'con'},
+    'fr': {'le', 'la', 'les', 'de', 'et', 'des', 'est', 'une', 'pour', 'dans'},
+    'de': {'der', 'die', 'und', 'das', 'ist', 'nicht', 'mit', 'ein', 'eine', 'auf'},
+    'pt': {'o', 'a', 'de', 'que', 'e', 'os', 'as', 'um', 'uma', 'para'},
+    'it': {'il', 'di', 'che', 'e', 'la', 'per', 'un', 'una', 'sono', 'gli'},
+}
+
+
+def detect_language(text):
+    """ISO 639-1 code of the text's language, '' when unknown"""
+    sample = text[:5000]
+    if LANGDETECT_AVAILABLE:
+        try:
+            return langdetect_detect(sample)
+        except Exception:
+            return ''
+    
+    words = Counter(re.findall(r'[^\W\d_]+', sample.lower()))
+    scores = {lang: sum(words[w] for w in stop_words) for lang, stop_words in LANGUAGE_STOP_WORDS.items()}
+    language, score = max(scores.items(), key=lambda item: item[1])
+    return language if score >= 3 else ''
+
+
+# Stored text size as last summed or tracked by this process, and the evict() calls since the sum
+_stored = {'bytes': None, 'calls': 0}
+_stored_lock = threading.Lock()
+
+
+class ExtractionCache:
+    """Extracted text of uploaded files, keyed by the SHA-256 of their bytes
+    
+    Re-uploading a file (to run another tool on it) skips parsing and OCR.
+    Entries keep the text, the page or paragraph offsets and the detected
+    language. PDFs are keyed by PDF_MAX_PAGES as well, since it changes the
+    text. When the stored text exceeds `max_bytes`, the least recently used
+    entries are deleted.
+    """
+    
+    def __init__(self, max_bytes=None):
+        self.max_bytes = settings.EXTRACTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.block_size = 1 << 20
+        # The stored size is summed from the table every this many misses; in between it is tracked
+        self.recount_every = 100
+    
+    def digest(self, file):
+        file.seek(0)
+        sha = hashlib.sha256()
+        for block in iter(lambda: file.read(self.block_size), b''):
+            sha.update(block if isinstance(block, bytes) else str(block).encode('utf-8'))
+        file.seek(0)
+        return sha.hexdigest()
+    
+    def extract_text(self, file):
+        """Same result as DocumentParser.extract_text_from_file, served from the cache when possible"""
+        return self.extract(file).text
+    
+    def extract(self, file):
+        """The ExtractedText entry for an upload, parsing it on a miss"""
+        sha256 = self.digest(file)
+        file_type = os.path.splitext(file.name)[1].lower()
+        max_pages = (settings.PDF_MAX_PAGES or 0) if file_type == '.pdf' else 0
+        entry = ExtractedText.objects.filter(sha256=sha256, file_type=file_type, max_pages=max_pages).first()
+        if entry:
+            ExtractedText.objects.filter(pk=entry.pk).update(last_used=timezone.now(), hits=F('hits') + 1)
+            return entry
+        
+        entry = self._parse(file, sha256, file_type)
+        entry.max_pages = max_pages
+        if entry.size <= self.max_bytes:
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except IntegrityError:
+                # Another request cached the same upload first
+                return entry
+            self.evict(added=entry.size)
+        return entry
+    
+    def evict(self, added=None):
+        """Delete least recently used entries until the cache fits max_bytes; returns how many
+        
+        `added` is the size of an entry this process just stored. The total
+        is then tracked rather than summed, except every `recount_every`
+        calls, so writes from other processes are noticed within that many
+        misses. Without `added` the total is always summed.
+        """
+        with _stored_lock:
+            _stored['calls'] += 1
+            if added is None or _stored['bytes'] is None or _stored['calls'] >= self.recount_every:
+                _stored['bytes'] = ExtractedText.objects.aggregate(total=Sum('size'))['total'] or 0
+                _stored['calls'] = 0
+            else:
+                _stored['bytes'] += added
+            total = _stored['bytes']
+        if total <= self.max_bytes:
+            return 0
+        
+        stale = []
+        for pk, size in ExtractedText.objects.order_by('last_used').values_list('pk', 'size').iterator():
+            if total <= self.max_bytes:
+                break
+            stale.append(pk)
+            total -= size
+        ExtractedText.objects.filter(pk__in=stale).delete()
+        with _stored_lock:
+            _stored['bytes'] = total
+        return len(stale)
+    
+    def _parse(self, file, sha256, file_type):
+        pieces = list(DocumentParser.iter_text(file))
+        raw = ''.join(pieces)
+        text = raw.strip()
+        lead = len(raw) - len(raw.lstrip())
+        
+        pages = [0]
+        if file_type in ('.pdf', '.doc', '.docx'):
+            pages = []
+            offset = 0
+            for piece in pieces:
+                pages.append(min(max(offset - lead, 0), len(text)))
+                offset += len(piece)
+        
+        return ExtractedText(
+            sha256=sha256,
+            file_type=file_type,
+            text=text,
+            pages=pages,
+            language=detect_language(text),
+            size=len(text.encode('utf-8'))
+        )
@@ -1,8 +1,7 @@
-import re
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 import hashlib
-from collections import Counter
-import math
+from .minhash_lsh import MinHashLSH
+from .text_features import TextFeatures, with_features
 
 class HybridPlagiarismDetector:
     """Professional plagiarism detection using hybrid algorithms"""
@@ -10,6 +9,7 @@ class HybridPlagiarismDetector:
     def __init__(self):
         self.threshold = 0.25
         self.min_text_length = 10
+        self.lsh = MinHashLSH()
     
     def detect_plagiarism(self, text, documents=None, threshold=None):
         """Detect plagiarism with comprehensive analysis"""
@@ -21,96 +21,62 @@ class HybridPlagiarismDetector:
         
         results = []
         
-        if documents:
-            for doc in documents:
+        if documents is not None and self.lsh is not None:
+            documents = self.lsh.prefilter(text, documents)
+        
+        if documents is not None:
+            query = TextFeatures.from_text(text)
+            for doc in with_features(documents):
                 if not doc.content or len(doc.content.strip()) < self.min_text_length:
                     continue
                 
-                similarity = self._calculate_similarity(text, doc.content)
+                details = self._score_features(text, doc.content, query, TextFeatures.for_document(doc))
+                similarity = self._weighted_score(details)
                 
                 if similarity >= threshold:
                     results.append({
                         'document_id': str(doc.id),
                         'title': doc.title,
                         'similarity': similarity,
-                        'details': {
-                            'sequence_match': self._sequence_match(text, doc.content),
-                            'ngram_match': self._ngram_similarity(text, doc.content),
-                            'word_overlap': self._word_overlap(text, doc.content),
-                            'semantic_similarity': self._semantic_similarity(text, doc.content)
-                        }
+                        'details': details
                     })
         
         return sorted(results, key=lambda x: x['similarity'], reverse=True)
     
     def _calculate_similarity(self, text1, text2):
         """Calculate weighted similarity score"""
-        seq = self._sequence_match(text1, text2)
-        ngram = self._ngram_similarity(text1, text2)
-        word = self._word_overlap(text1, text2)
-        semantic = self._semantic_similarity(text1, text2)
-        
+        return self._weighted_score(self._score_features(
+            text1, text2, TextFeatures.from_text(text1), TextFeatures.from_text(text2)))
+    
+    def _score_features(self, text1, text2, features1, features2):
+        """Per-method scores from the cached features of both texts"""
+        return {
+            'sequence_match': self._sequence_match(text1, text2),
+            'ngram_match': features1.ngram_similarity(features2, 4),
+            'word_overlap': features1.word_overlap(features2),
+            'semantic_similarity': features1.cosine_similarity(features2)
+        }
+    
+    def _weighted_score(self, details):
         # Weighted average: sequence(35%), ngram(30%), word(20%), semantic(15%)
-        return (seq * 0.35) + (ngram * 0.30) + (word * 0.20) + (semantic * 0.15)
+        return ((details['sequence_match'] * 0.35) + (details['ngram_match'] * 0.30) +
+                (details['word_overlap'] * 0.20) + (details['semantic_similarity'] * 0.15))
     
     def _sequence_match(self, text1, text2):
         """Sequence matching for exact/near-exact plagiarism"""
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        return matcher.ratio()
+        return sequence_similarity(text1.lower(), text2.lower())
     
     def _ngram_similarity(self, text1, text2, n=4):
         """N-gram analysis for phrase-level plagiarism"""
-        def get_ngrams(text):
-            words = text.lower().split()
-            return set(' '.join(words[i:i+n]) for i in range(max(0, len(words)-n+1)))
-        
-        ngrams1 = get_ngrams(text1)
-        ngrams2 = get_ngrams(text2)
-        
-        if not ngrams1 or not ngrams2:
-            return 0.0
-        
-        intersection = len(ngrams1 & ngrams2)
-        union = len(ngrams1 | ngrams2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).ngram_similarity(TextFeatures.from_text(text2), n)
     
     def _word_overlap(self, text1, text2):
         """Word-level overlap detection"""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).word_overlap(TextFeatures.from_text(text2))
     
     def _semantic_similarity(self, text1, text2):
         """Semantic similarity using word frequency"""
-        def get_word_freq(text):
-            words = re.findall(r'\b\w+\b', text.lower())
-            return Counter(words)
-        
-        freq1 = get_word_freq(text1)
-        freq2 = get_word_freq(text2)
-        
-        if not freq1 or not freq2:
-            return 0.0
-        
-        # Calculate cosine similarity
-        common_words = set(freq1.keys()) & set(freq2.keys())
-        if not common_words:
-            return 0.0
-        
-        dot_product = sum(freq1[w] * freq2[w] for w in common_words)
-        magnitude1 = math.sqrt(sum(v**2 for v in freq1.values()))
-        magnitude2 = math.sqrt(sum(v**2 for v in freq2.values()))
-        
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
+        return TextFeatures.from_text(text1).cosine_similarity(TextFeatures.from_text(text2))
     
     def get_fingerprint(self, text):
         """Generate document fingerprint for fast comparison"""
@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from django.conf import settings
+from .model_registry import get_model
+
+
+class MicroBatcher:
+    """Runs concurrent calls to one model as batched forward passes
+    
+    Callers put (input, kwargs) on a queue and wait on a Future. A single
+    worker thread takes the first waiting call and collects whatever else
+    arrives within `max_latency` seconds, up to `max_batch_size` calls. Calls
+    with the same keyword arguments are then passed to the pipeline together
+    as one padded batch. Each result goes back to its caller's Future in the
+    shape a single call would have returned. When a batch fails, its calls
+    are run again one by one, so an exception only reaches the caller whose
+    input raised it.
+    """
+    
+    def __init__(self, name, max_batch_size=None, max_latency=None, timeout=None):
+        self.name = name
+        self.max_batch_size = max_batch_size or settings.INFERENCE_MAX_BATCH
+        self.max_latency = (settings.INFERENCE_MAX_LATENCY_MS / 1000.0) if max_latency is None else max_latency
+        # Seconds a caller waits for its result before TimeoutError
+        self.timeout = settings.INFERENCE_TIMEOUT_SECONDS if timeout is None else timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def __call__(self, value, **kwargs):
+        future = self.submit(value, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Still queued: the worker skips it. Already running: its result is discarded
+            future.cancel()
+            raise
+    
+    def submit(self, value, **kwargs):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((value, kwargs, future))
+        return future
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'batcher-{self.name}', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            groups = {}
+            for value, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                groups.setdefault(repr(sorted(kwargs.items())), (kwargs, []))[1].append((value, future))
+            for kwargs, calls in groups.values():
+                self._forward(kwargs, calls)
+    
+    def _forward(self, kwargs, calls):
+        model = get_model(self.name)
+        if model is None:
+            error = RuntimeError(f'Model {self.name} is not available')
+            for _, future in calls:
+                future.set_exception(error)
+            return
+        
+        try:
+            outputs = model([value for value, _ in calls], batch_size=len(calls), **kwargs)
+            if len(outputs) != len(calls):
+                raise RuntimeError(f'Model {self.name} returned {len(outputs)} outputs for {len(calls)} inputs')
+        except Exception as e:
+            if len(calls) > 1:
+                # One bad input fails the whole batch; find it by running each call alone
+                for call in calls:
+                    self._forward(kwargs, [call])
+            else:
+                calls[0][1].set_exception(e)
+            return
+        
+        for (_, future), output in zip(calls, outputs):
+            # A batched pipeline returns one item per input where a single call returns a list
+            future.set_result(output if isinstance(output, list) else [output])
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def batcher(name):
+    """The process-wide MicroBatcher of a registered model"""
+    with _batchers_lock:
+        if name not in _batchers:
+            _batchers[name] = MicroBatcher(name)
+        return _batchers[name]
+
+
+def infer(name, value, **kwargs):
+    """Run one input through a model, batched with concurrent calls to the same model"""
+    return batcher(name)(value, **kwargs)
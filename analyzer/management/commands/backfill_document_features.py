@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from analyzer.text_features import TextFeatures
+
+class Command(BaseCommand):
+    help = 'Compute the cached comparison features of existing documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute features that are already up to date')
+
+    def handle(self, *args, **options):
+        documents = TextFeatures.rebuild(only_missing=not options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Computed features for {documents} documents'))
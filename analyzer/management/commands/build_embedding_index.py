@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from analyzer.models import Document
+from analyzer.modern_detector import ModernPlagiarismDetector
+
+class Command(BaseCommand):
+    help = 'Re-embed every document and rebuild the semantic ANN index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true',
+                            help='Only drop deleted documents and embed new or changed ones')
+
+    def handle(self, *args, **options):
+        detector = ModernPlagiarismDetector()
+        if options['sync']:
+            dropped = detector.prune_embeddings(Document.objects.all())
+            if not detector.model:
+                self.stdout.write(self.style.WARNING(f'Dropped {dropped} deleted documents; '
+                                                     'sentence-transformers is not available to embed'))
+                return
+            titles = detector.sync_embeddings(Document.objects.all())
+            self.stdout.write(self.style.SUCCESS(f'Dropped {dropped} deleted documents; {len(titles)} documents up to date'))
+            return
+        if not detector.model:
+            raise CommandError('sentence-transformers is not available')
+        documents, lists = detector.rebuild_embeddings(Document.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Embedded {documents} documents ({lists} IVF lists)'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from analyzer.shingle_index import ShingleIndex
+
+class Command(BaseCommand):
+    help = 'Rebuild the shingle inverted index used for plagiarism candidate retrieval'
+
+    def handle(self, *args, **options):
+        documents, postings = ShingleIndex().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {documents} documents ({postings} postings)'))
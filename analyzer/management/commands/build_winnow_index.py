@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from analyzer.winnowing import Winnower
+
+class Command(BaseCommand):
+    help = 'Rebuild the winnowing fingerprints used to locate copied passages'
+
+    def handle(self, *args, **options):
+        documents, fingerprints = Winnower().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Fingerprinted {documents} documents ({fingerprints} fingerprints)'))
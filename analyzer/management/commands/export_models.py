@@ -0,0 +1,25 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from analyzer.optimized_models import BACKEND_FILES, EXPORTABLE_MODELS, export_model
+
+class Command(BaseCommand):
+    help = 'Export the AI detector and sentiment models for the ONNX or int8 CPU backends'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help=f'Models to export: {", ".join(EXPORTABLE_MODELS)} (default: all of them)')
+        parser.add_argument('--backend', choices=sorted(BACKEND_FILES),
+                            help='Backend to export for (default: settings.MODEL_BACKEND)')
+    
+    def handle(self, *args, **options):
+        backend = options['backend'] or settings.MODEL_BACKEND
+        if backend not in BACKEND_FILES:
+            raise CommandError(f'The {backend} backend has no artifacts; pass --backend')
+        for name in options['models'] or EXPORTABLE_MODELS:
+            try:
+                path = export_model(name, backend)
+            except (ValueError, RuntimeError) as e:
+                raise CommandError(str(e))
+            size = os.path.getsize(path) / 2 ** 20
+            self.stdout.write(self.style.SUCCESS(f'Exported {name} for {backend}: {path} ({size:.1f} MB)'))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-17 01:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShinglePosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shingle', models.BigIntegerField(db_index=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shingle_postings', to='analyzer.document')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 02:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_shingleposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='minhash',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='LSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField(db_index=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='analyzer.document')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-17 02:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0009_minhash_lsh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WinnowFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField(db_index=True)),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='winnow_fingerprints', to='analyzer.document')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 02:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0010_winnowfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentFeatures',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='analyzer.document')),
+                ('version', models.PositiveSmallIntegerField(default=1)),
+                ('tokens', models.BinaryField()),
+                ('ngrams', models.BinaryField()),
+                ('terms', models.BinaryField()),
+                ('norm', models.FloatField(default=0.0)),
+                ('head', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0011_documentfeatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plagiarismcheck',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='plagiarismcheck',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='plagiarismcheck',
+            name='report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='plagiarismcheck',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='plagiarismcheck',
+            name='threshold',
+            field=models.FloatField(default=0.7),
+        ),
+        migrations.AlterField(
+            model_name='plagiarismcheck',
+            name='similarity_score',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 02:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0012_plagiarismcheck_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('file_type', models.CharField(max_length=10)),
+                ('text', models.TextField()),
+                ('pages', models.JSONField(default=list)),
+                ('language', models.CharField(blank=True, max_length=10)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('sha256', 'file_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0013_extractedtext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aidetection',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='aidetection',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='aidetection',
+            name='report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='aidetection',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='aidetection',
+            name='ai_probability',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
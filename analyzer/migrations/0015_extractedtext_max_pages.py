@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0014_aidetection_status'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='extractedtext',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='extractedtext',
+            name='max_pages',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='extractedtext',
+            unique_together={('sha256', 'file_type', 'max_pages')},
+        ),
+    ]
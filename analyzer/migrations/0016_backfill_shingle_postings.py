@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill_shingle_postings(apps, schema_editor):
+    """Index the documents saved before 0008, which ShingleIndex.candidate_documents would never return"""
+    from analyzer.shingle_index import ShingleIndex
+
+    Document = apps.get_model('analyzer', 'Document')
+    ShinglePosting = apps.get_model('analyzer', 'ShinglePosting')
+    index = ShingleIndex()
+    missing = list(Document.objects.filter(shingle_postings__isnull=True).values_list('id', flat=True))
+    for start in range(0, len(missing), index.chunk_size):
+        chunk = missing[start:start + index.chunk_size]
+        for doc_id, content in Document.objects.filter(id__in=chunk).values_list('id', 'content'):
+            postings = [ShinglePosting(shingle=h, document_id=doc_id) for h in index.shingles(content or '')]
+            ShinglePosting.objects.bulk_create(postings, batch_size=index.batch_size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0015_extractedtext_max_pages'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_shingle_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+import random
+import hashlib
+from django.db import transaction
+from django.db.models import Q
+from .models import Document, LSHBucket
+from .shingle_index import ShingleIndex
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Mersenne prime 2^31 - 1: a * h + b stays below 2^63 for 32-bit shingle hashes
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """MinHash signatures with an LSH banding index over Document shingles"""
+    
+    def __init__(self, num_perm=128, bands=64, threshold=0.2, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.batch_size = 1000
+        
+        # Fixed seed: stored signatures must stay comparable across processes
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+    
+    def signature(self, shingles):
+        """MinHash signature of a set of 64-bit shingle hashes"""
+        if not shingles:
+            return None
+        
+        values = [h & 0xFFFFFFFF for h in shingles]
+        if NUMPY_AVAILABLE:
+            values = np.array(values, dtype=np.uint64)
+            return [int(((np.uint64(a) * values + np.uint64(b)) % np.uint64(MERSENNE_PRIME)).min())
+                    for a, b in self.permutations]
+        
+        return [min((a * h + b) % MERSENNE_PRIME for h in values) for a, b in self.permutations]
+    
+    def signature_for_text(self, text):
+        return self.signature(ShingleIndex().shingles(text))
+    
+    def band_keys(self, signature):
+        """One bucket key per band; the band number is hashed in so keys never collide across bands"""
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            payload = f"{band}:" + ','.join(str(v) for v in rows)
+            digest = hashlib.blake2b(payload.encode(), digest_size=8).digest()
+            keys.append((band, int.from_bytes(digest, 'big', signed=True)))
+        return keys
+    
+    def estimated_similarity(self, signature1, signature2):
+        """Fraction of agreeing MinHash values, an unbiased Jaccard estimate"""
+        if not signature1 or not signature2:
+            return 0.0
+        agree = sum(1 for v1, v2 in zip(signature1, signature2) if v1 == v2)
+        return agree / self.num_perm
+    
+    def estimated_recall(self, similarity=None):
+        """Probability that a pair with the given Jaccard similarity shares a bucket"""
+        if similarity is None:
+            similarity = self.threshold
+        return 1 - (1 - similarity ** self.rows) ** self.bands
+    
+    def index_document(self, document):
+        """(Re)build the LSH buckets of one document from its stored signature"""
+        buckets = []
+        if document.minhash:
+            buckets = [LSHBucket(band=band, bucket=key, document_id=document.pk)
+                       for band, key in self.band_keys(document.minhash)]
+        with transaction.atomic():
+            LSHBucket.objects.filter(document_id=document.pk).delete()
+            LSHBucket.objects.bulk_create(buckets, batch_size=self.batch_size)
+        return len(buckets)
+    
+    def rebuild(self):
+        """Recompute every signature and bucket; returns (documents, buckets)"""
+        documents = 0
+        buckets = 0
+        for document in Document.objects.only('id', 'content').iterator():
+            document.minhash = self.signature_for_text(document.content or '')
+            Document.objects.filter(pk=document.pk).update(minhash=document.minhash)
+            buckets += self.index_document(document)
+            documents += 1
+        return documents, buckets
+    
+    def candidate_ids(self, text):
+        """Ids of documents sharing at least one LSH bucket with the text"""
+        signature = self.signature_for_text(text)
+        if not signature:
+            return set()
+        keys = [key for _, key in self.band_keys(signature)]
+        return set(LSHBucket.objects.filter(bucket__in=keys).values_list('document_id', flat=True).distinct())
+    
+    def prefilter(self, text, documents):
+        """Narrow documents to LSH candidates; documents without a signature always pass"""
+        if documents is None:
+            return documents
+        
+        if hasattr(documents, 'filter'):
+            return documents.filter(Q(id__in=self.candidate_ids(text)) | Q(minhash__isnull=True))
+        
+        documents = list(documents)
+        if not any(getattr(doc, 'minhash', None) for doc in documents):
+            return documents
+        candidates = self.candidate_ids(text)
+        return [doc for doc in documents if not getattr(doc, 'minhash', None) or doc.pk in candidates]
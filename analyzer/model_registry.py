@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+
+
+def _text_pipeline(task, model=None):
+    def load():
+        from transformers import pipeline
+        return pipeline(task, model=model) if model else pipeline(task)
+    return load
+
+
+def _classifier(name, task, model=None):
+    """A text-classification pipeline, or its exported settings.MODEL_BACKEND artifact when there is one"""
+    fallback = _text_pipeline(task, model)
+    def load():
+        from .optimized_models import load_optimized
+        return load_optimized(name) or fallback()
+    return load
+
+
+def _sentence_transformer(name):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name)
+    return load
+
+
+MODEL_LOADERS = {
+    'ai-detector': _classifier('ai-detector', 'text-classification', 'roberta-base-openai-detector'),
+    'summarizer': _text_pipeline('summarization', 'facebook/bart-large-cnn'),
+    'sentiment': _classifier('sentiment', 'sentiment-analysis'),
+    'sentence-embedder': _sentence_transformer('all-MiniLM-L6-v2'),
+}
+
+
+def model_memory(model):
+    """Bytes held by the parameters and buffers of a torch model (or a pipeline's model); 0 if unknown"""
+    module = getattr(model, 'model', model)
+    if hasattr(module, 'memory_bytes'):
+        # ONNX sessions have no parameters; they report their artifact size
+        return module.memory_bytes
+    if not hasattr(module, 'parameters'):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def process_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS where /proc is missing; ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class ModelRegistry:
+    """Loads each model once per process and shares it between requests
+    
+    get() loads on first use. A per-model lock makes concurrent first calls
+    wait for one load, while different models can load in parallel. A model
+    that fails to load (transformers missing, weights unavailable) gives
+    None, so callers fall back to their heuristics; the failure and its
+    error are kept for `retry_seconds`, after which the next get() tries
+    the load again. When the resident models exceed
+    `memory_budget` bytes, the least recently used ones are dropped.
+    """
+    
+    def __init__(self, loaders=None, memory_budget=None, retry_seconds=60):
+        self.loaders = dict(MODEL_LOADERS if loaders is None else loaders)
+        self.memory_budget = settings.MODEL_MEMORY_BUDGET if memory_budget is None else memory_budget
+        # A failed load is not retried by requests arriving within this many seconds of it
+        self.retry_seconds = retry_seconds
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = defaultdict(threading.Lock)
+    
+    def register(self, name, loader):
+        self.loaders[name] = loader
+    
+    def get(self, name):
+        """The loaded model, or None when it cannot be loaded"""
+        entry = self._touch(name)
+        if entry is not None:
+            return entry['model']
+        
+        with self._lock:
+            load_lock = self._load_locks[name]
+        with load_lock:
+            entry = self._touch(name)
+            if entry is not None:
+                return entry['model']
+            return self._load(name)
+    
+    def warm_up(self, names=None):
+        """Load the given models (default: settings.MODEL_WARMUP) ahead of the first request
+        
+        Returns the error of each model that failed to load, by name.
+        """
+        errors = {}
+        for name in (settings.MODEL_WARMUP if names is None else names):
+            if self.get(name) is None:
+                errors[name] = self.error(name)
+        return errors
+    
+    def error(self, name):
+        """Why the last load of a model failed; '' when it is loaded or was never tried"""
+        with self._lock:
+            entry = self._models.get(name)
+            return entry['error'] if entry is not None else ''
+    
+    def unload(self, name):
+        with self._lock:
+            return self._models.pop(name, None) is not None
+    
+    def resident(self):
+        """What each model costs this process, most recently used first"""
+        now = time.time()
+        with self._lock:
+            entries = list(reversed(self._models.items()))
+        return {
+            'pid': os.getpid(),
+            'rss_bytes': process_rss(),
+            'model_bytes': sum(entry['bytes'] for _, entry in entries),
+            'memory_budget': self.memory_budget,
+            'models': [{
+                'name': name,
+                'loaded': entry['model'] is not None,
+                'bytes': entry['bytes'],
+                'load_seconds': entry['load_seconds'],
+                'uses': entry['uses'],
+                'idle_seconds': now - entry['last_used'],
+                'error': entry['error']
+            } for name, entry in entries]
+        }
+    
+    def _touch(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and entry['model'] is None and time.time() - entry['failed_at'] >= self.retry_seconds:
+                # The failure has expired: forget it so the caller loads again
+                del self._models[name]
+                entry = None
+            if entry is not None:
+                self._models.move_to_end(name)
+                entry['last_used'] = time.time()
+                entry['uses'] += 1
+            return entry
+    
+    def _load(self, name):
+        if name not in self.loaders:
+            raise ValueError(f'Unknown model: {name}')
+        
+        started = time.time()
+        model, error = None, ''
+        try:
+            model = self.loaders[name]()
+        except Exception as e:
+            error = str(e)
+        
+        entry = {
+            'model': model,
+            'bytes': model_memory(model) if model is not None else 0,
+            'load_seconds': time.time() - started,
+            'last_used': time.time(),
+            'uses': 1,
+            'error': error,
+            'failed_at': time.time() if model is None else None
+        }
+        with self._lock:
+            self._models[name] = entry
+            self._evict(keep=name)
+        return model
+    
+    def _evict(self, keep):
+        """Drop least recently used models until the budget holds; caller holds the lock"""
+        if not self.memory_budget:
+            return
+        total = sum(entry['bytes'] for entry in self._models.values())
+        for name in list(self._models):
+            if total <= self.memory_budget:
+                break
+            if name == keep or self._models[name]['model'] is None:
+                continue
+            total -= self._models.pop(name)['bytes']
+
+
+registry = ModelRegistry()
+
+
+def get_model(name):
+    return registry.get(name)
@@ -50,26 +50,105 @@ class Document(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     fingerprint = models.CharField(max_length=64)
+    minhash = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        from .shingle_index import ShingleIndex
+        from .minhash_lsh import MinHashLSH
+        from .winnowing import Winnower
+        from .text_features import TextFeatures
+        
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or 'content' in update_fields
+        if reindex:
+            lsh = MinHashLSH()
+            self.minhash = lsh.signature_for_text(self.content or '')
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['minhash']
+        super().save(*args, **kwargs)
+        if reindex:
+            ShingleIndex().index_document(self)
+            lsh.index_document(self)
+            Winnower().index_document(self)
+            TextFeatures.index_document(self)
+
     def __str__(self):
         return self.title
 
+class DocumentFeatures(models.Model):
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    version = models.PositiveSmallIntegerField(default=1)
+    tokens = models.BinaryField()
+    ngrams = models.BinaryField()
+    terms = models.BinaryField()
+    norm = models.FloatField(default=0.0)
+    head = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class ShinglePosting(models.Model):
+    shingle = models.BigIntegerField(db_index=True)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='shingle_postings')
+
+class LSHBucket(models.Model):
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField(db_index=True)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='lsh_buckets')
+
+class WinnowFingerprint(models.Model):
+    hash = models.BigIntegerField(db_index=True)
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='winnow_fingerprints')
+
+class ExtractedText(models.Model):
+    sha256 = models.CharField(max_length=64)
+    file_type = models.CharField(max_length=10)
+    text = models.TextField()
+    # Start offset in text of every PDF page or Word paragraph
+    pages = models.JSONField(default=list)
+    language = models.CharField(max_length=10, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    # PDF_MAX_PAGES the text was extracted with, 0 for every page
+    max_pages = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        unique_together = ('sha256', 'file_type', 'max_pages')
+
 class PlagiarismCheck(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     text = models.TextField()
-    similarity_score = models.FloatField()
+    similarity_score = models.FloatField(default=0.0)
     is_plagiarized = models.BooleanField(default=False)
     matches = models.JSONField(default=list)
+    threshold = models.FloatField(default=0.7)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
+    progress = models.PositiveSmallIntegerField(default=100)
+    error = models.TextField(blank=True)
+    report = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 class AIDetection(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     text = models.TextField()
-    ai_probability = models.FloatField()
+    ai_probability = models.FloatField(default=0.0)
     is_ai_generated = models.BooleanField(default=False)
     humanized_text = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=PlagiarismCheck.STATUS_CHOICES, default='completed')
+    progress = models.PositiveSmallIntegerField(default=100)
+    error = models.TextField(blank=True)
+    report = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 class URLShortener(models.Model):
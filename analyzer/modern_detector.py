@@ -1,5 +1,3 @@
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import nltk
 from nltk.tokenize import sent_tokenize
 
@@ -9,16 +7,30 @@ try:
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
 
+from django.conf import settings
+from .embedding_index import EmbeddingIndex
+from .model_registry import get_model
+from .ai_markers import PatternCounter, TextAnalysis
+
+AI_PATTERNS = {
+    r'\b(furthermore|moreover|additionally|consequently|nevertheless)\b': 0.08,
+    r'\b(it is important to note|it should be noted|it is worth noting)\b': 0.12,
+    r'\b(in conclusion|to summarize|in summary|to conclude)\b': 0.08,
+    r'\b(various|numerous|several|multiple)\b.*\b(aspects|factors|elements)\b': 0.1,
+    r'\b(the purpose of this|the aim of this|the objective of this)\b': 0.08,
+    r'\b(can be seen|it can be argued|it is evident that)\b': 0.08,
+    r'\b(in today\'s world|in modern society|in contemporary times)\b': 0.08,
+    r'\b(plays a crucial role|plays an important role|is essential)\b': 0.08,
+    r'\b(has been shown|research shows|studies indicate)\b': 0.08,
+}
+AI_PATTERN_COUNTER = PatternCounter(AI_PATTERNS)
+
 class ModernPlagiarismDetector:
     def __init__(self):
         self._download_nltk_data()
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            except:
-                self.model = None
-        else:
-            self.model = None
+        self.model = get_model('sentence-embedder') if TRANSFORMERS_AVAILABLE else None
+        self.embeddings = EmbeddingIndex(settings.EMBEDDING_INDEX_DIR)
+        self.top_k = 50
     
     def _download_nltk_data(self):
         try:
@@ -41,39 +53,67 @@ class ModernPlagiarismDetector:
         
         # Semantic similarity check against documents
         if self.model and documents.exists():
+            titles = self.sync_embeddings(documents)
             text_embedding = self.model.encode(text, convert_to_tensor=False)
             
-            for doc in documents:
-                doc_embedding = self.model.encode(doc.content, convert_to_tensor=False)
-                similarity = float(cosine_similarity([text_embedding], [doc_embedding])[0][0])
-                
-                if similarity > threshold:
+            # A small candidate set is scanned exactly; the full corpus goes through the ANN index
+            if len(titles) * 2 < len(self.embeddings):
+                matches = self.embeddings.search(text_embedding, self.top_k, keys=titles.keys())
+            else:
+                matches = self.embeddings.search(text_embedding, self.top_k)
+            
+            for doc_id, similarity in matches:
+                if doc_id in titles and similarity > threshold:
                     results.append({
-                        'document_id': str(doc.id),
-                        'title': doc.title,
+                        'document_id': doc_id,
+                        'title': titles[doc_id],
                         'similarity': similarity,
                         'details': {'semantic_similarity': similarity}
                     })
         
         return sorted(results, key=lambda x: x['similarity'], reverse=True)
     
-    def _detect_ai_patterns(self, text):
-        patterns = {
-            r'\b(furthermore|moreover|additionally|consequently|nevertheless)\b': 0.08,
-            r'\b(it is important to note|it should be noted|it is worth noting)\b': 0.12,
-            r'\b(in conclusion|to summarize|in summary|to conclude)\b': 0.08,
-            r'\b(various|numerous|several|multiple)\b.*\b(aspects|factors|elements)\b': 0.1,
-            r'\b(the purpose of this|the aim of this|the objective of this)\b': 0.08,
-            r'\b(can be seen|it can be argued|it is evident that)\b': 0.08,
-            r'\b(in today\'s world|in modern society|in contemporary times)\b': 0.08,
-            r'\b(plays a crucial role|plays an important role|is essential)\b': 0.08,
-            r'\b(has been shown|research shows|studies indicate)\b': 0.08,
-        }
+    def sync_embeddings(self, documents):
+        """Embed the given documents where missing or stale in the store; returns {id: title}
+        
+        Only `documents` is read, so a check embeds just its candidates.
+        Embeddings of deleted documents stay until prune_embeddings() (the
+        build_embedding_index command); they never match, since results are
+        limited to the titles returned here.
+        """
+        titles = {}
+        stale = []
+        for doc_id, title, fingerprint in documents.values_list('id', 'title', 'fingerprint').iterator():
+            titles[str(doc_id)] = title
+            if not self.embeddings.is_current(doc_id, fingerprint):
+                stale.append(doc_id)
         
-        import re
-        score = 0
-        for pattern, weight in patterns.items():
-            matches = len(re.findall(pattern, text, re.IGNORECASE))
-            score += matches * weight
+        for first in range(0, len(stale), 256):
+            batch = list(documents.model.objects.filter(id__in=stale[first:first + 256])
+                         .values_list('id', 'fingerprint', 'content'))
+            vectors = self.model.encode([content for _, _, content in batch], convert_to_tensor=False)
+            self.embeddings.add_many(
+                (doc_id, fingerprint, vector) for (doc_id, fingerprint, _), vector in zip(batch, vectors))
         
+        self.embeddings.train_if_needed()
+        return titles
+    
+    def prune_embeddings(self, documents):
+        """Drop the embeddings of documents that no longer exist; returns how many were dropped"""
+        live = {str(doc_id) for doc_id in documents.values_list('id', flat=True).iterator()}
+        return self.embeddings.remove([key for key in self.embeddings.keys if key not in live])
+    
+    def rebuild_embeddings(self, documents):
+        """Re-embed every document and retrain the ANN index; returns (documents, lists)"""
+        self.embeddings.clear()
+        titles = self.sync_embeddings(documents)
+        return len(titles), self.embeddings.train()
+    
+    def _detect_ai_patterns(self, text):
+        return self.score_analysis(TextAnalysis(text, AI_PATTERN_COUNTER))
+    
+    @staticmethod
+    def score_analysis(analysis):
+        """AI pattern score of a shared TextAnalysis (static: the constructor loads the embedder)"""
+        score = sum(analysis.count(pattern) * weight for pattern, weight in AI_PATTERNS.items())
         return min(score, 1.0)
@@ -0,0 +1,103 @@
+import os
+from .parallel_compare import ParallelComparer
+
+try:
+    from PIL import Image, ImageOps, ImageSequence
+    import pytesseract
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+
+
+def _ocr_tile(tile, config):
+    return pytesseract.image_to_string(tile, config=config)
+
+
+def otsu_threshold(histogram):
+    """Grey level that best separates ink from paper in a 256-bin histogram"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    best_level, best_variance = 127, -1.0
+    background = 0
+    weighted_background = 0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+class OcrPipeline:
+    """Tiled OCR of scans and photos
+    
+    Each frame (multi-page TIFFs have several) is converted to greyscale,
+    downscaled so its longer side is at most `max_side` and binarised with
+    Otsu's threshold. The page is then cut into horizontal bands of about
+    `tile_height` rows. Each cut is moved to the emptiest row nearby, so it
+    falls between lines of text rather than through them. The bands are OCR'd
+    in the shared process pool, a bounded number at a time, and joined top
+    to bottom.
+    """
+    
+    def __init__(self, workers=None, max_side=2000, tile_height=600):
+        self.workers = workers
+        self.max_side = max_side
+        self.tile_height = tile_height
+        # Fraction of tile_height searched on either side of a cut for an empty row
+        self.cut_search = 0.25
+        # Page segmentation mode 6 for bands: each is read as one block of text. An untiled
+        # image keeps Tesseract's automatic segmentation, which handles columns and layout
+        self.band_config = '--psm 6'
+        self.config = ''
+        self.comparer = ParallelComparer(workers)
+    
+    def pages(self, file):
+        """Yield the OCR text of every frame of an image file"""
+        image = Image.open(file)
+        for frame in ImageSequence.Iterator(image):
+            yield self.recognize(frame.copy())
+    
+    def recognize(self, image):
+        tiles = self.tiles(self.preprocess(image))
+        if len(tiles) == 1:
+            texts = [_ocr_tile(tiles[0], self.config)]
+        elif (self.workers or os.cpu_count()) < 2:
+            texts = [_ocr_tile(tile, self.band_config) for tile in tiles]
+        else:
+            texts = self.comparer.imap(_ocr_tile, ((tile, self.band_config) for tile in tiles))
+        return '\n'.join(text.strip() for text in texts if text.strip())
+    
+    def preprocess(self, image):
+        """Greyscale, downscaled and binarised copy of an image"""
+        image = ImageOps.exif_transpose(image).convert('L')
+        scale = self.max_side / max(image.size)
+        if scale < 1:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.LANCZOS)
+        threshold = otsu_threshold(image.histogram())
+        return image.point(lambda level: 255 if level > threshold else 0)
+    
+    def tiles(self, image):
+        """Horizontal bands of a binarised image, cut between text lines"""
+        if image.height <= self.tile_height * (1 + self.cut_search):
+            return [image]
+        
+        # Mean grey level of each row: squeeze the image to one column
+        rows = list(image.resize((1, image.height), Image.BOX).getdata())
+        search = int(self.tile_height * self.cut_search)
+        cuts = [0]
+        while image.height - cuts[-1] > self.tile_height + search:
+            target = cuts[-1] + self.tile_height
+            window = range(target - search, target + search)
+            cuts.append(max(window, key=lambda row: (rows[row], -abs(row - target))))
+        cuts.append(image.height)
+        return [image.crop((0, top, image.width, bottom)) for top, bottom in zip(cuts, cuts[1:])]
@@ -0,0 +1,171 @@
+import os
+from types import SimpleNamespace
+from django.conf import settings
+
+try:
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+try:
+    import numpy as np
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Registry models with a CPU backend: (pipeline task, Hugging Face model); the sentiment
+# model is the one pipeline('sentiment-analysis') picks when given none
+EXPORTABLE_MODELS = {
+    'ai-detector': ('text-classification', 'roberta-base-openai-detector'),
+    'sentiment': ('sentiment-analysis', 'distilbert-base-uncased-finetuned-sst-2-english'),
+}
+# Artifact of each backend in the model's directory; 'pytorch' has none and is the plain pipeline
+BACKEND_FILES = {
+    'onnx': 'model.onnx',
+    'onnx-int8': 'model.int8.onnx',
+    'torch-int8': 'model.int8.pt',
+}
+
+
+def artifact_dir(name):
+    return os.path.join(settings.MODEL_ARTIFACT_DIR, name)
+
+
+def artifact_path(name, backend):
+    return os.path.join(artifact_dir(name), BACKEND_FILES[backend])
+
+
+def export_model(name, backend, source=None):
+    """Write a model's artifact for a backend next to its tokenizer and config; returns its path
+    
+    'onnx' traces the full-precision model to ONNX with dynamic batch and
+    sequence axes. 'onnx-int8' quantizes the weights of that graph to int8
+    with onnxruntime (exporting it first if needed), and 'torch-int8' stores
+    the state of the model after torch dynamic quantization of its Linear
+    layers. Files are written under a temporary name and moved into place,
+    so a loader never sees half an artifact. `source` is a Hugging Face id or
+    a local directory to export in place of the model in EXPORTABLE_MODELS.
+    """
+    if name not in EXPORTABLE_MODELS:
+        raise ValueError(f'Model {name} cannot be exported')
+    if backend not in BACKEND_FILES:
+        raise ValueError(f'Unknown backend: {backend}')
+    if not TRANSFORMERS_AVAILABLE:
+        raise RuntimeError('transformers and torch are required to export models')
+    if backend.startswith('onnx') and not ONNX_AVAILABLE:
+        raise RuntimeError('onnxruntime is required for the ONNX backends')
+    
+    source = source or EXPORTABLE_MODELS[name][1]
+    directory = artifact_dir(name)
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    tokenizer.save_pretrained(directory)
+    model.config.save_pretrained(directory)
+    
+    path = artifact_path(name, backend)
+    temporary = path + '.tmp'
+    if backend == 'torch-int8':
+        torch.save(_quantize(model).state_dict(), temporary)
+    else:
+        onnx_path = artifact_path(name, 'onnx')
+        if backend == 'onnx' or not os.path.exists(onnx_path):
+            _export_onnx(model, tokenizer, onnx_path + '.tmp')
+            os.replace(onnx_path + '.tmp', onnx_path)
+        if backend == 'onnx':
+            return path
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, temporary, weight_type=QuantType.QInt8)
+    os.replace(temporary, path)
+    return path
+
+
+def load_optimized(name, backend=None):
+    """A pipeline-compatible classifier running the model's artifact, or None when it has not been exported"""
+    backend = backend or settings.MODEL_BACKEND
+    if name not in EXPORTABLE_MODELS or backend not in BACKEND_FILES:
+        return None
+    path = artifact_path(name, backend)
+    if not os.path.exists(path) or not TRANSFORMERS_AVAILABLE:
+        return None
+    
+    directory = artifact_dir(name)
+    if backend == 'torch-int8':
+        config = AutoConfig.from_pretrained(directory)
+        model = _quantize(AutoModelForSequenceClassification.from_config(config).eval())
+        # The artifact is written by export_model, not downloaded. Quantized packed params are not plain
+        # tensors, so the full unpickler is asked for explicitly rather than torch >= 2.6's weights-only one
+        model.load_state_dict(torch.load(path, weights_only=False))
+        return pipeline(EXPORTABLE_MODELS[name][0], model=model, tokenizer=AutoTokenizer.from_pretrained(directory))
+    if not ONNX_AVAILABLE:
+        return None
+    return OnnxTextClassifier(directory, path)
+
+
+def _quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _export_onnx(model, tokenizer, path):
+    names = list(tokenizer.model_input_names)
+    sample = tokenizer(['A sample input.', 'A second, somewhat longer sample input.'],
+                       padding=True, return_tensors='pt')
+    axes = {key: {0: 'batch', 1: 'sequence'} for key in names}
+    axes['logits'] = {0: 'batch'}
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[key] for key in names), path, input_names=names,
+                          output_names=['logits'], dynamic_axes=axes, opset_version=14)
+
+
+class OnnxModel:
+    """An onnxruntime session called like a transformers model: keyword tensors in, `.logits` out"""
+    
+    def __init__(self, session, config, memory_bytes=0):
+        self.session = session
+        self.config = config
+        # Reported to the model registry in place of parameter sizes
+        self.memory_bytes = memory_bytes
+        self.input_names = [i.name for i in session.get_inputs()]
+    
+    def __call__(self, **inputs):
+        arrays = {key: value.numpy() if hasattr(value, 'numpy') else value for key, value in inputs.items()}
+        return SimpleNamespace(logits=torch.from_numpy(self.run(arrays)))
+    
+    def run(self, encoding):
+        """Logits as a numpy array; inputs the graph does not take (token_type_ids) are dropped"""
+        feed = {name: np.asarray(encoding[name], dtype=np.int64) for name in self.input_names}
+        return self.session.run(['logits'], feed)[0]
+
+
+class OnnxTextClassifier:
+    """Stand-in for a text-classification pipeline, running an ONNX export on CPU
+    
+    Called like the pipeline (a text or a list of texts, batch_size,
+    truncation) and returns the same [{'label': ..., 'score': ...}] list,
+    so infer() and the micro-batcher use it unchanged. `tokenizer` and
+    `model` are exposed as on a pipeline for SlidingWindowClassifier.
+    """
+    
+    def __init__(self, directory, path):
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.model = OnnxModel(session, AutoConfig.from_pretrained(directory), os.path.getsize(path))
+    
+    def __call__(self, inputs, batch_size=None, truncation=False):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or 1
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoding = self.tokenizer(texts[start:start + batch_size], padding=True,
+                                      truncation=truncation, return_tensors='np')
+            logits = self.model.run(encoding)
+            # Softmax over the labels, as the pipeline applies to single-label classifiers
+            exponentials = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probabilities = exponentials / exponentials.sum(axis=-1, keepdims=True)
+            for row in probabilities:
+                index = int(row.argmax())
+                results.append({'label': self.model.config.id2label[index], 'score': float(row[index])})
+        return results
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """Make the app registry usable in spawned workers (forked ones inherit it) and drop inherited DB connections"""
+    import django
+    from django.apps import apps
+    from django.db import DatabaseError, connections
+    if not apps.ready:
+        django.setup()
+    for connection in connections.all(initialized_only=True):
+        # A forked worker shares the parent's socket: close the descriptor first, so that closing the
+        # connection cannot send a terminate message that would end the parent's session
+        try:
+            os.close(connection.connection.fileno())
+        except (AttributeError, OSError, TypeError):
+            pass
+    try:
+        connections.close_all()
+    except DatabaseError:
+        pass
+
+
+def shared_executor(workers=None):
+    """Process pool kept alive across requests so workers are not re-spawned per check"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker)
+        return _executor
+
+
+def discard_executor(executor):
+    """Forget a broken shared pool so the next shared_executor() builds a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def candidate_count(documents):
+    if hasattr(documents, 'iterator'):
+        return documents.count()
+    return len(documents)
+
+
+class ParallelComparer:
+    """Shards candidate documents across a process pool and merges the per-shard results
+    
+    Documents are turned into picklable items (packed features, not model
+    instances) and streamed to the workers in shards of `shard_size`, at most
+    `window` shards in flight, so the parent never holds every candidate at
+    once. Items also carry the document text, because the sequence measure
+    aligns the raw texts and cannot be computed from features; a shard is
+    closed early once its items' `size` reaches `shard_chars`, which caps the
+    text in flight at about window * shard_chars characters. `score_shard`
+    must be a picklable callable taking (query, items) and returning a list
+    of results.
+    """
+    
+    def __init__(self, workers=None, shard_size=256, shard_chars=4_000_000):
+        self.workers = workers
+        self.shard_size = shard_size
+        self.shard_chars = shard_chars
+    
+    def map(self, score_shard, query, items, size=None, window=None):
+        """Run score_shard over shards of items; returns the per-shard results in order
+        
+        `size(item)` is the item's share of `shard_chars`, typically the length
+        of its text.
+        """
+        return list(self.imap(score_shard, ((query, shard) for shard in self.shards(items, size)), window))
+    
+    def shards(self, items, size=None):
+        """Lists of up to shard_size items, closed early at shard_chars of size(item)"""
+        shard = []
+        chars = 0
+        for item in items:
+            shard.append(item)
+            chars += size(item) if size else 0
+            if len(shard) == self.shard_size or chars >= self.shard_chars:
+                yield shard
+                shard = []
+                chars = 0
+        if shard:
+            yield shard
+    
+    def imap(self, fn, tasks, window=None, executor=None):
+        """Run fn(*args) for each args tuple in the pool, yielding results in submission order
+        
+        Tasks are pulled lazily, at most `window` ahead of the consumer. Pass a
+        thread pool as `executor` for work that waits on subprocesses. When a
+        worker of the shared pool dies (OOM kill, segfault) the pool is
+        replaced once and the unfinished tasks are resubmitted to the new one.
+        """
+        shared = executor is None
+        executor = executor or shared_executor(self.workers)
+        window = window or 2 * (self.workers or os.cpu_count())
+        tasks = iter(tasks)
+        # [args, future] of the tasks submitted and not yet yielded, oldest first
+        pending = deque()
+        exhausted = False
+        rebuilt = False
+        while pending or not exhausted:
+            try:
+                while not exhausted and len(pending) < window:
+                    args = next(tasks, None)
+                    if args is None:
+                        exhausted = True
+                        break
+                    pending.append([args, None])
+                    pending[-1][1] = executor.submit(fn, *args)
+                if not pending:
+                    break
+                result = pending[0][1].result()
+            except BrokenProcessPool:
+                if not shared or rebuilt:
+                    raise
+                rebuilt = True
+                discard_executor(executor)
+                executor = shared_executor(self.workers)
+                for entry in pending:
+                    entry[1] = executor.submit(fn, *entry[0])
+                continue
+            pending.popleft()
+            yield result
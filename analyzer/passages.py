@@ -0,0 +1,168 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from .shingle_index import ShingleIndex, shingle_hash
+
+
+class PassageDetector:
+    """Passage-level matching of overlapping sentence windows
+    
+    The submission and the candidate documents are cut into windows of
+    `window` sentences, advancing `stride` sentences at a time. The windows of
+    the candidate documents go into an in-memory inverted index of word
+    n-gram shingles. Each submission window is scored only against the
+    document windows it shares shingles with, so the cost grows with the
+    number of windows rather than with windows x windows. Overlapping or
+    adjacent hits are merged into spans with character offsets on both sides,
+    then trimmed to the sentences that actually occur in the other text.
+    """
+    
+    def __init__(self, window=3, stride=1, n=3, min_similarity=0.3):
+        self.window = window
+        self.stride = stride
+        self.n = n
+        self.min_similarity = min_similarity
+        self.candidate_limit = 50
+        # Shingles found in more windows than this (boilerplate phrases) are not indexed
+        self.max_postings = 50
+        # Hits whose offsets are at most this many characters apart are merged into one span
+        self.merge_gap = 1
+    
+    def windows(self, text):
+        """(start, end, shingle set) for each sentence window of a text"""
+        return self._windows(*self._segment(text), self.window, self.stride)
+    
+    def sentences(self, text):
+        """(start, end, shingle set) for each sentence of a text"""
+        return self._windows(*self._segment(text), 1, 1)
+    
+    def _segment(self, text):
+        tokens = [(m.group().lower(), m.start()) for m in re.finditer(r'\w+', text)]
+        starts = [start for _, start in tokens]
+        grams = [shingle_hash(' '.join(t[0] for t in tokens[i:i + self.n]))
+                 for i in range(len(tokens) - self.n + 1)]
+        sentences = [(m.start(), m.end()) for m in re.finditer(r'[^.!?\n]+[.!?]*', text) if m.group().strip()]
+        return sentences, starts, grams
+    
+    def _windows(self, sentences, starts, grams, size, stride):
+        if not sentences:
+            return []
+        
+        result = []
+        last = max(len(sentences) - size, 0)
+        for first in list(range(0, last + 1, stride)) + ([last] if last % stride else []):
+            start = sentences[first][0]
+            end = sentences[min(first + size, len(sentences)) - 1][1]
+            # Token range of the window, then every n-gram lying fully inside it
+            lo = bisect_left(starts, start)
+            hi = bisect_left(starts, end)
+            shingles = set(grams[lo:max(hi - self.n + 1, lo)])
+            if shingles:
+                result.append((start, end, shingles))
+        return result
+    
+    def detect(self, text, documents=None):
+        """Copied passages of the text, grouped per document with offsets and similarities"""
+        if documents is None:
+            documents = ShingleIndex().candidate_documents(text, self.candidate_limit)
+        
+        index = defaultdict(list)
+        sources = []
+        for doc in documents:
+            for start, end, shingles in self.windows(doc.content or ''):
+                key = len(sources)
+                sources.append((doc, start, end, len(shingles)))
+                for shingle in shingles:
+                    index[shingle].append(key)
+        
+        hits = defaultdict(list)
+        query_windows = self.windows(text)
+        for start, end, shingles in query_windows:
+            shared = Counter()
+            for shingle in shingles:
+                postings = index.get(shingle, ())
+                if len(postings) <= self.max_postings:
+                    shared.update(postings)
+            
+            # Best source window per document for this submission window
+            best = {}
+            for key, count in shared.items():
+                doc, source_start, source_end, size = sources[key]
+                similarity = count / (len(shingles) + size - count)
+                if similarity >= self.min_similarity and similarity > best.get(doc.pk, (0,))[0]:
+                    best[doc.pk] = (similarity, doc, source_start, source_end)
+            for similarity, doc, source_start, source_end in best.values():
+                hits[doc.pk].append((start, end, source_start, source_end, similarity, doc))
+        
+        query_sentences = self.sentences(text)
+        query_shingles = set().union(*(shingles for _, _, shingles in query_windows)) if hits else set()
+        matches = []
+        for doc_hits in hits.values():
+            doc = doc_hits[0][5]
+            content = doc.content or ''
+            doc_sentences = self.sentences(content)
+            doc_shingles = set().union(*(shingles for _, _, shingles in doc_sentences))
+            spans = []
+            for merged in self._merge(doc_hits):
+                # Windows overhang the copied text by up to window - 1 sentences, which also bridges
+                # copies fewer than `window` sentences apart: split into runs of copied sentences
+                for start, end, shingles in self._runs(merged['start'], merged['end'], query_sentences, doc_shingles):
+                    run_hits = [hit for hit in doc_hits if hit[0] < end and hit[1] > start]
+                    source_start, source_end = self._trim(min(hit[2] for hit in run_hits),
+                                                          max(hit[3] for hit in run_hits),
+                                                          doc_sentences, shingles or query_shingles)
+                    spans.append({'start': start, 'end': end, 'source_start': source_start,
+                                  'source_end': source_end, 'similarity': max(hit[4] for hit in run_hits),
+                                  'windows': len(run_hits), 'text': text[start:end]})
+            matches.append({
+                'document_id': str(doc.pk),
+                'title': doc.title,
+                'spans': spans,
+                'coverage': sum(s['end'] - s['start'] for s in spans) / max(len(text), 1),
+                'similarity': max(s['similarity'] for s in spans)
+            })
+        return sorted(matches, key=lambda m: m['coverage'], reverse=True)
+    
+    def _trim(self, start, end, sentences, other_shingles):
+        """Shrink [start, end) to the sentences whose shingles mostly occur in the other text"""
+        kept = self._copied(start, end, sentences, other_shingles)
+        if not kept:
+            return start, end
+        return kept[0][0], kept[-1][1]
+    
+    def _copied(self, start, end, sentences, other_shingles):
+        return [(s, e, shingles) for s, e, shingles in sentences
+                if s >= start and e <= end and len(shingles & other_shingles) / len(shingles) >= self.min_similarity]
+    
+    def _runs(self, start, end, sentences, other_shingles):
+        """Split [start, end) into (start, end, shingles) runs of consecutive copied sentences"""
+        inside = [sentence for sentence in sentences if sentence[0] >= start and sentence[1] <= end]
+        copied = {sentence[0] for sentence in self._copied(start, end, sentences, other_shingles)}
+        runs = []
+        previous = False
+        for s, e, shingles in inside:
+            if s not in copied:
+                previous = False
+                continue
+            if previous:
+                runs[-1] = (runs[-1][0], e, runs[-1][2] | shingles)
+            else:
+                runs.append((s, e, set(shingles)))
+            previous = True
+        return runs or [(start, end, set())]
+    
+    def _merge(self, hits):
+        spans = []
+        for start, end, source_start, source_end, similarity, _ in sorted(hits, key=lambda h: h[0]):
+            if spans and start <= spans[-1]['end'] + self.merge_gap:
+                span = spans[-1]
+                span['end'] = max(span['end'], end)
+                span['source_start'] = min(span['source_start'], source_start)
+                span['source_end'] = max(span['source_end'], source_end)
+                span['similarity'] = max(span['similarity'], similarity)
+                span['windows'] += 1
+            else:
+                spans.append({'start': start, 'end': end, 'source_start': source_start,
+                              'source_end': source_end, 'similarity': similarity, 'windows': 1})
+        return spans
+
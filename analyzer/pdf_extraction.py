@@ -0,0 +1,119 @@
+import io
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from .parallel_compare import ParallelComparer
+
+try:
+    import PyPDF2
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+
+def _open(source):
+    return PyPDF2.PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _extract_pages(source, start, end):
+    """Text of pages [start, end) of a PDF given as a path or bytes; '' for unreadable pages"""
+    reader = _open(source)
+    texts = []
+    for number in range(start, end):
+        try:
+            texts.append(reader.pages[number].extract_text() or '')
+        except Exception:
+            texts.append('')
+    return texts
+
+
+class PdfExtractor:
+    """Page-by-page PDF text extraction, spread over a worker pool
+    
+    Pages are cut into ranges of `pages_per_task`. With PyPDF2 each range is
+    extracted in the shared process pool. Without it, one pdftotext process
+    runs per range. `pages` yields the page texts in order and only keeps a
+    few ranges in flight ahead of the consumer, so a caller that stops
+    reading stops the extraction. `max_pages` caps how many pages are read
+    at all.
+    """
+    
+    def __init__(self, workers=None, pages_per_task=8, max_pages=None):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        # Shorter documents are extracted in-process; the pool is not worth the start-up
+        self.parallel_min_pages = 16
+        # Seconds allowed per pdftotext page range
+        self.pdftotext_timeout = 60
+        self.comparer = ParallelComparer(workers)
+    
+    def pages(self, file):
+        """Iterator over the text of each page, in order"""
+        source = self._source(file)
+        if PDF_AVAILABLE:
+            return self._pypdf_pages(source)
+        return self._pdftotext_pages(source)
+    
+    def page_ranges(self, total):
+        count = min(total, self.max_pages) if self.max_pages else total
+        return [(start, min(start + self.pages_per_task, count)) for start in range(0, count, self.pages_per_task)]
+    
+    def _source(self, file):
+        """Path of the upload when it is already on disk, otherwise its bytes"""
+        if isinstance(file, str):
+            return file
+        if hasattr(file, 'temporary_file_path'):
+            return file.temporary_file_path()
+        file.seek(0)
+        return file.read()
+    
+    def _pypdf_pages(self, source):
+        reader = _open(source)
+        if len(reader.pages) == 0:
+            raise ValueError("PDF has no pages")
+        
+        ranges = self.page_ranges(len(reader.pages))
+        if ranges[-1][1] < self.parallel_min_pages or (self.workers or os.cpu_count()) < 2:
+            for start, end in ranges:
+                for number in range(start, end):
+                    try:
+                        yield reader.pages[number].extract_text() or ''
+                    except Exception:
+                        yield ''
+            return
+        
+        del reader
+        for texts in self.comparer.imap(_extract_pages, ((source, start, end) for start, end in ranges)):
+            yield from texts
+    
+    def _pdftotext_pages(self, source):
+        total = self._pdfinfo_pages(source)
+        with ThreadPoolExecutor(max_workers=self.workers or os.cpu_count()) as executor:
+            tasks = ((source, start, end) for start, end in self.page_ranges(total))
+            for texts in self.comparer.imap(self._pdftotext_range, tasks, executor=executor):
+                yield from texts
+    
+    def _run(self, args, source, output=()):
+        """Run a poppler tool on the PDF, by path or through stdin"""
+        if isinstance(source, str):
+            command, data = args + [source], None
+        else:
+            command, data = args + ['-'], source
+        return subprocess.run(command + list(output), input=data, capture_output=True,
+                              timeout=self.pdftotext_timeout, check=True)
+    
+    def _pdfinfo_pages(self, source):
+        output = self._run(['pdfinfo'], source).stdout.decode('utf-8', errors='ignore')
+        match = re.search(r'^Pages:\s+(\d+)', output, re.MULTILINE)
+        if not match:
+            raise subprocess.SubprocessError('pdfinfo reported no page count')
+        return int(match.group(1))
+    
+    def _pdftotext_range(self, source, start, end):
+        result = self._run(['pdftotext', '-f', str(start + 1), '-l', str(end)], source, output=['-'])
+        # Every page of the output ends with a form feed
+        output = result.stdout.decode('utf-8', errors='ignore')
+        texts = output.split('\f')[:end - start]
+        return texts + [''] * (end - start - len(texts))
@@ -1,60 +1,74 @@
-import re
-from collections import Counter
-import math
+from .ai_markers import PatternCounter, TextAnalysis
+
+TRANSITION_PATTERNS = [
+    r'\b(furthermore|moreover|additionally|consequently|nevertheless|'
+    r'notwithstanding|in addition|as a result|therefore|thus|hence)\b',
+    r'\b(in conclusion|to summarize|in summary|as mentioned|as stated|'
+    r'as discussed|in essence|ultimately)\b'
+]
+PASSIVE_PATTERN = r'\b(is|are|was|were|be|been|being)\s+\w+ed\b'
+HEDGING_PATTERNS = [
+    r'\b(may|might|could|possibly|perhaps|arguably|seems|appears|'
+    r'tends to|appears to|seems to|it could be|it might be)\b'
+]
+CONCLUSION_PATTERNS = [
+    r'\b(in conclusion|to conclude|in summary|to summarize|'
+    r'in essence|ultimately|finally|in the end)\b'
+]
+PATTERNS = TRANSITION_PATTERNS + [PASSIVE_PATTERN] + HEDGING_PATTERNS + CONCLUSION_PATTERNS
+PATTERN_COUNTER = PatternCounter(PATTERNS)
 
 class ProfessionalAIDetector:
     """Professional AI content detection using linguistic analysis"""
     
     def detect_ai_content(self, text):
         """Detect AI-generated content (0.0 to 1.0)"""
+        return self.score_analysis(TextAnalysis(text, PATTERN_COUNTER))
+    
+    def score_analysis(self, analysis):
+        """AI score of a shared TextAnalysis"""
+        text = analysis.text
         if not text or len(text.strip()) < 50:
             return 0.0
         
         scores = []
         
         # 1. Formal transition phrases (20%)
-        formal_score = self._detect_formal_transitions(text)
+        formal_score = self._detect_formal_transitions(analysis)
         scores.append(('formal_transitions', formal_score, 0.20))
         
         # 2. Repetitive sentence structure (20%)
-        structure_score = self._detect_repetitive_structure(text)
+        structure_score = self._detect_repetitive_structure(analysis)
         scores.append(('sentence_structure', structure_score, 0.20))
         
         # 3. Passive voice overuse (15%)
-        passive_score = self._detect_passive_voice(text)
+        passive_score = self._detect_passive_voice(analysis)
         scores.append(('passive_voice', passive_score, 0.15))
         
         # 4. Hedging language (15%)
-        hedging_score = self._detect_hedging_language(text)
+        hedging_score = self._detect_hedging_language(analysis)
         scores.append(('hedging_language', hedging_score, 0.15))
         
         # 5. Complex sentence patterns (15%)
-        complexity_score = self._detect_complexity(text)
+        complexity_score = self._detect_complexity(analysis)
         scores.append(('complexity', complexity_score, 0.15))
         
         # 6. Vocabulary diversity (10%)
-        diversity_score = self._detect_vocabulary_diversity(text)
+        diversity_score = self._detect_vocabulary_diversity(analysis)
         scores.append(('vocabulary_diversity', diversity_score, 0.10))
         
         # 7. Conclusion markers (5%)
-        conclusion_score = self._detect_conclusion_markers(text)
+        conclusion_score = self._detect_conclusion_markers(analysis)
         scores.append(('conclusion_markers', conclusion_score, 0.05))
         
         # Calculate weighted average
         total_score = sum(score * weight for _, score, weight in scores)
         return min(max(total_score, 0.0), 1.0)
     
-    def _detect_formal_transitions(self, text):
+    def _detect_formal_transitions(self, analysis):
         """Detect formal transition phrases (20%)"""
-        transitions = [
-            r'\b(furthermore|moreover|additionally|consequently|nevertheless|'
-            r'notwithstanding|in addition|as a result|therefore|thus|hence)\b',
-            r'\b(in conclusion|to summarize|in summary|as mentioned|as stated|'
-            r'as discussed|in essence|ultimately)\b'
-        ]
-        
-        count = sum(len(re.findall(phrase, text, re.I)) for phrase in transitions)
-        sentences = len(re.split(r'[.!?]+', text))
+        count = sum(analysis.count(phrase) for phrase in TRANSITION_PATTERNS)
+        sentences = len(analysis.split_sentences)
         
         if sentences == 0:
             return 0.0
@@ -62,16 +76,13 @@ class ProfessionalAIDetector:
         ratio = count / sentences
         return min(ratio / 0.3, 1.0)  # Normalize to 1.0 at 0.3 ratio
     
-    def _detect_repetitive_structure(self, text):
+    def _detect_repetitive_structure(self, analysis):
         """Detect repetitive sentence structures (20%)"""
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        if len(sentences) < 3:
+        if len(analysis.sentences) < 3:
             return 0.0
         
         # Check sentence length consistency
-        lengths = [len(s.split()) for s in sentences]
+        lengths = [len(words) for words in analysis.sentence_words]
         avg_length = sum(lengths) / len(lengths)
         variance = sum((x - avg_length) ** 2 for x in lengths) / len(lengths)
         
@@ -83,27 +94,21 @@ class ProfessionalAIDetector:
         else:
             return 0.1
     
-    def _detect_passive_voice(self, text):
+    def _detect_passive_voice(self, analysis):
         """Detect passive voice overuse (15%)"""
-        passive_pattern = r'\b(is|are|was|were|be|been|being)\s+\w+ed\b'
-        passive_count = len(re.findall(passive_pattern, text, re.I))
+        passive_count = analysis.count(PASSIVE_PATTERN)
         
-        sentences = len(re.split(r'[.!?]+', text))
+        sentences = len(analysis.split_sentences)
         if sentences == 0:
             return 0.0
         
         ratio = passive_count / sentences
         return min(ratio / 0.4, 1.0)  # Normalize to 1.0 at 0.4 ratio
     
-    def _detect_hedging_language(self, text):
+    def _detect_hedging_language(self, analysis):
         """Detect hedging/uncertain language (15%)"""
-        hedging = [
-            r'\b(may|might|could|possibly|perhaps|arguably|seems|appears|'
-            r'tends to|appears to|seems to|it could be|it might be)\b'
-        ]
-        
-        count = sum(len(re.findall(phrase, text, re.I)) for phrase in hedging)
-        words = len(text.split())
+        count = sum(analysis.count(phrase) for phrase in HEDGING_PATTERNS)
+        words = len(analysis.tokens)
         
         if words == 0:
             return 0.0
@@ -111,10 +116,9 @@ class ProfessionalAIDetector:
         ratio = count / words
         return min(ratio / 0.05, 1.0)  # Normalize to 1.0 at 5% ratio
     
-    def _detect_complexity(self, text):
+    def _detect_complexity(self, analysis):
         """Detect overly complex sentence patterns (15%)"""
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        sentences = analysis.sentences
         
         if not sentences:
             return 0.0
@@ -128,9 +132,9 @@ class ProfessionalAIDetector:
         ratio = complex_count / len(sentences)
         return min(ratio / 0.5, 1.0)  # Normalize to 1.0 at 50% complex
     
-    def _detect_vocabulary_diversity(self, text):
+    def _detect_vocabulary_diversity(self, analysis):
         """Detect low vocabulary diversity (10%)"""
-        words = text.lower().split()
+        words = analysis.lower_tokens
         if not words:
             return 0.0
         
@@ -147,14 +151,9 @@ class ProfessionalAIDetector:
         else:
             return 0.0
     
-    def _detect_conclusion_markers(self, text):
+    def _detect_conclusion_markers(self, analysis):
         """Detect conclusion markers (5%)"""
-        markers = [
-            r'\b(in conclusion|to conclude|in summary|to summarize|'
-            r'in essence|ultimately|finally|in the end)\b'
-        ]
-        
-        count = sum(len(re.findall(marker, text, re.I)) for marker in markers)
+        count = sum(analysis.count(marker) for marker in CONCLUSION_PATTERNS)
         return min(count * 0.2, 1.0)
     
     def get_ai_probability(self, text):
@@ -1,5 +1,5 @@
 import re
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 import hashlib
 import math
 
@@ -47,8 +47,7 @@ class ProfessionalPlagiarismDetector:
     
     def _sequence_match(self, text1, text2):
         """Sequence matching for exact/near-exact plagiarism"""
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        return matcher.ratio()
+        return sequence_similarity(text1.lower(), text2.lower())
     
     def _ngram_similarity(self, text1, text2, n=4):
         """N-gram analysis for phrase-level plagiarism"""
@@ -2,11 +2,21 @@ import re
 import hashlib
 import random
 import string
-from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 from collections import Counter
 import qrcode
 from io import BytesIO
 from django.core.files.base import ContentFile
+from django.conf import settings
+from .minhash_lsh import MinHashLSH
+from .text_features import TextFeatures, clean_words, with_features
+from .parallel_compare import ParallelComparer, candidate_count
+from .pdf_extraction import PdfExtractor
+from .ocr import OcrPipeline
+from .model_registry import get_model
+from .inference_batcher import infer
+from .windowed_inference import SlidingWindowClassifier, ai_label_index
+from .ai_markers import PatternCounter, TextAnalysis
 try:
     from transformers import pipeline
     TRANSFORMERS_AVAILABLE = True
@@ -73,28 +83,23 @@ class DocumentParser:
                     raise ValueError("Word document processing not available. Please install python-docx.")
                 return DocumentParser._extract_from_docx(file)
             
-            elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
+            elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']:
                 if not OCR_AVAILABLE:
                     raise ValueError("Image processing not available. Please install Pillow and pytesseract.")
                 return DocumentParser._extract_from_image(file)
             
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
-                
+        
         except Exception as e:
             raise ValueError(f"Error processing file: {str(e)}")
     
     @staticmethod
     def _extract_from_pdf(file):
         """Extract text from PDF file"""
-        text = ""
         try:
-            file.seek(0)
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n"
+            pages = PdfExtractor(max_pages=settings.PDF_MAX_PAGES).pages(file)
+            text = ''.join(extracted + "\n" for extracted in pages if extracted)
         except Exception as e:
             raise ValueError(f"Error reading PDF: {str(e)}")
         
@@ -125,8 +130,7 @@ class DocumentParser:
     def _extract_from_image(file):
         """Extract text from image using OCR"""
         try:
-            image = Image.open(file)
-            text = pytesseract.image_to_string(image)
+            text = '\n'.join(OcrPipeline().pages(file))
         except Exception as e:
             raise ValueError(f"Error reading image: {str(e)}")
         
@@ -148,13 +152,17 @@ class DocumentParser:
                 formats['documents'].extend(['.doc', '.docx'])
         
         if OCR_AVAILABLE:
-            formats['images'] = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+            formats['images'] = ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']
         
         return formats
 
 class PlagiarismDetector:
     def __init__(self):
         self._download_nltk_data()
+        self.lsh = MinHashLSH()
+        # Candidate sets at least this large are scored across a process pool
+        self.parallel_min_candidates = 2000
+        self.comparer = ParallelComparer()
     
     def _download_nltk_data(self):
         if not NLTK_AVAILABLE:
@@ -169,10 +177,7 @@ class PlagiarismDetector:
             nltk.download('punkt_tab', quiet=True)
     
     def preprocess_text(self, text):
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        words = text.split()
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        return ' '.join([word for word in words if word not in stop_words])
+        return ' '.join(clean_words(text))
     
     def generate_fingerprint(self, text):
         return hashlib.md5(self.preprocess_text(text).encode()).hexdigest()
@@ -204,19 +209,38 @@ class PlagiarismDetector:
         return intersection / union if union > 0 else 0.0
     
     def sequence_similarity(self, text1, text2):
-        return SequenceMatcher(None, text1, text2).ratio()
+        return sequence_similarity(text1, text2)
     
     def detect_plagiarism(self, text, documents, threshold=0.7):
-        results = []
+        if self.lsh:
+            documents = self.lsh.prefilter(text, documents)
+        
+        query = TextFeatures.from_text(text)
+        documents = with_features(documents)
+        if self.parallel_min_candidates is not None and candidate_count(documents) >= self.parallel_min_candidates:
+            rows = documents.iterator() if hasattr(documents, 'iterator') else documents
+            items = ((str(doc.id), doc.title, TextFeatures.fields_for_document(doc), doc.content)
+                     for doc in rows)
+            shards = self.comparer.map(_compare_shard, (self, query.record_fields(), text, threshold), items,
+                                       size=lambda item: len(item[3] or ''))
+            results = [result for shard in shards for result in shard]
+        else:
+            items = ((str(doc.id), doc.title, TextFeatures.for_document(doc), doc.content) for doc in documents)
+            results = self._compare(query, text, items, threshold)
         
-        for doc in documents:
+        return sorted(results, key=lambda x: x['similarity'], reverse=True)
+    
+    def _compare(self, query, text, items, threshold):
+        """Score (id, title, features, content) items; keeps those above the threshold"""
+        results = []
+        for doc_id, title, features, content in items:
             # Multiple similarity algorithms
             similarities = {
-                'ngram_3': self.n_gram_similarity(text, doc.content, 3),
-                'ngram_4': self.n_gram_similarity(text, doc.content, 4),
-                'ngram_5': self.n_gram_similarity(text, doc.content, 5),
-                'sequence': self.sequence_similarity(text, doc.content),
-                'word_overlap': self.word_overlap_similarity(text, doc.content)
+                'ngram_3': query.ngram_similarity(features, 3, clean=True),
+                'ngram_4': query.ngram_similarity(features, 4, clean=True),
+                'ngram_5': query.ngram_similarity(features, 5, clean=True),
+                'sequence': self.sequence_similarity(text, content),
+                'word_overlap': query.word_overlap(features, clean=True)
             }
             
             # Weighted combination for better accuracy
@@ -230,23 +254,32 @@ class PlagiarismDetector:
             
             if overall_similarity > threshold:
                 results.append({
-                    'document_id': str(doc.id),
-                    'title': doc.title,
+                    'document_id': doc_id,
+                    'title': title,
                     'similarity': overall_similarity,
                     'details': similarities
                 })
-        
-        return sorted(results, key=lambda x: x['similarity'], reverse=True)
+        return results
+
+
+def _compare_shard(payload, items):
+    """Worker entry point: score one shard of packed document features"""
+    detector, query_fields, text, threshold = payload
+    items = ((doc_id, title, TextFeatures.from_fields(fields), content) for doc_id, title, fields, content in items)
+    return detector._compare(TextFeatures.from_fields(query_fields), text, items, threshold)
+
+# Simple heuristic patterns for AI detection, used when the classifier is unavailable
+HEURISTIC_PATTERNS = [
+    r'\b(furthermore|moreover|additionally|consequently)\b',
+    r'\b(it is important to note|it should be noted)\b',
+    r'\b(in conclusion|to summarize|in summary)\b',
+    r'\b(various|numerous|several)\b.*\b(aspects|factors|elements)\b'
+]
+HEURISTIC_PATTERN_COUNTER = PatternCounter(HEURISTIC_PATTERNS)
 
 class AIDetector:
     def __init__(self):
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                self.classifier = pipeline("text-classification", model="roberta-base-openai-detector")
-            except:
-                self.classifier = None
-        else:
-            self.classifier = None
+        self.classifier = get_model('ai-detector') if TRANSFORMERS_AVAILABLE else None
     
     def detect_ai_content(self, text):
         if not self.classifier:
@@ -254,8 +287,12 @@ class AIDetector:
             return self._heuristic_detection(text)
         
         try:
-            result = self.classifier(text)
-            ai_prob = result[0]['score'] if result[0]['label'] == 'AI' else 1 - result[0]['score']
+            if len(text) > settings.AI_WINDOW_MIN_CHARS:
+                return self._windowed_detection(text)
+            result = infer('ai-detector', text, truncation=True)
+            config = self.classifier.model.config
+            ai_label = config.id2label[ai_label_index(config)]
+            ai_prob = result[0]['score'] if result[0]['label'] == ai_label else 1 - result[0]['score']
             return {
                 'ai_probability': ai_prob,
                 'is_ai_generated': ai_prob > 0.7,
@@ -264,27 +301,31 @@ class AIDetector:
         except:
             return self._heuristic_detection(text)
     
+    def _windowed_detection(self, text):
+        """Classifier scores of overlapping 512-token windows of a long text"""
+        result = SlidingWindowClassifier().classify(text)
+        ai_prob = result['ai_probability']
+        return {
+            'ai_probability': ai_prob,
+            'is_ai_generated': ai_prob > 0.7,
+            'confidence': max(ai_prob, 1 - ai_prob),
+            'windows': result['windows']
+        }
+    
     def _heuristic_detection(self, text):
-        # Simple heuristic patterns for AI detection
-        ai_indicators = [
-            r'\b(furthermore|moreover|additionally|consequently)\b',
-            r'\b(it is important to note|it should be noted)\b',
-            r'\b(in conclusion|to summarize|in summary)\b',
-            r'\b(various|numerous|several)\b.*\b(aspects|factors|elements)\b'
-        ]
-        
-        score = 0
-        for pattern in ai_indicators:
-            matches = len(re.findall(pattern, text, re.IGNORECASE))
-            score += matches * 0.1
-        
-        ai_prob = min(score, 0.9)
+        ai_prob = self.score_analysis(TextAnalysis(text, HEURISTIC_PATTERN_COUNTER))
         return {
             'ai_probability': ai_prob,
             'is_ai_generated': ai_prob > 0.5,
             'confidence': ai_prob
         }
     
+    @staticmethod
+    def score_analysis(analysis):
+        """Heuristic AI score of a shared TextAnalysis (static: needs no classifier)"""
+        score = sum(analysis.count(pattern) * 0.1 for pattern in HEURISTIC_PATTERNS)
+        return min(score, 0.9)
+    
     def humanize_text(self, text):
         # Simple text humanization
         replacements = {
@@ -561,13 +602,7 @@ class PlagiarismRemover:
 
 class TextSummarizationService:
     def __init__(self):
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-            except:
-                self.summarizer = None
-        else:
-            self.summarizer = None
+        self.summarizer = get_model('summarizer') if TRANSFORMERS_AVAILABLE else None
     
     def extractive_summary(self, text, num_sentences=3):
         if not NLTK_AVAILABLE:
@@ -593,7 +628,7 @@ class TextSummarizationService:
             return self.extractive_summary(text)
         
         try:
-            summary = self.summarizer(text, max_length=max_length, min_length=30, do_sample=False)
+            summary = infer('summarizer', text, max_length=max_length, min_length=30, do_sample=False)
             return summary[0]['summary_text']
         except:
             return self.extractive_summary(text)
@@ -624,18 +659,12 @@ class LanguageTranslationService:
 
 class SentimentAnalysisService:
     def __init__(self):
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                self.analyzer = pipeline("sentiment-analysis")
-            except:
-                self.analyzer = None
-        else:
-            self.analyzer = None
+        self.analyzer = get_model('sentiment') if TRANSFORMERS_AVAILABLE else None
     
     def analyze_sentiment(self, text):
         if self.analyzer:
             try:
-                result = self.analyzer(text)
+                result = infer('sentiment', text)
                 sentiment = result[0]['label'].lower()
                 confidence = result[0]['score']
                 
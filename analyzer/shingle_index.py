@@ -0,0 +1,94 @@
+import re
+import hashlib
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count
+from .models import Document, ShinglePosting
+
+
+def shingle_hash(shingle):
+    """Stable signed 64-bit hash of a shingle (Python's hash() is salted per process)"""
+    digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class ShingleIndex:
+    """Inverted index from word 3/4-gram shingles to Document ids"""
+    
+    def __init__(self):
+        self.sizes = (3, 4)
+        self.candidate_limit = 500
+        self.chunk_size = 500
+        self.batch_size = 1000
+    
+    def shingles(self, text):
+        """Hashed word n-gram shingles of a text"""
+        words = re.findall(r'\w+', text.lower())
+        hashes = set()
+        for n in self.sizes:
+            for i in range(len(words) - n + 1):
+                hashes.add(shingle_hash(' '.join(words[i:i+n])))
+        return hashes
+    
+    def index_document(self, document):
+        """(Re)build the postings of one document"""
+        postings = [ShinglePosting(shingle=h, document_id=document.pk) for h in self.shingles(document.content or '')]
+        with transaction.atomic():
+            ShinglePosting.objects.filter(document_id=document.pk).delete()
+            ShinglePosting.objects.bulk_create(postings, batch_size=self.batch_size)
+        return len(postings)
+    
+    def remove_document(self, document):
+        ShinglePosting.objects.filter(document_id=document.pk).delete()
+    
+    def rebuild(self):
+        """Reindex every document; returns (documents, postings)"""
+        documents = 0
+        postings = 0
+        for document in Document.objects.only('id', 'content').iterator():
+            postings += self.index_document(document)
+            documents += 1
+        return documents, postings
+    
+    def shared_counts(self, shingles):
+        """Count shared shingles per document for a set of query shingles"""
+        shingles = list(shingles)
+        counts = Counter()
+        for start in range(0, len(shingles), self.chunk_size):
+            chunk = shingles[start:start + self.chunk_size]
+            rows = (ShinglePosting.objects.filter(shingle__in=chunk)
+                    .values('document_id').annotate(hits=Count('id')))
+            for row in rows:
+                counts[row['document_id']] += row['hits']
+        return counts
+    
+    def candidate_ids(self, text, limit=None):
+        """Document ids sharing at least one shingle with the text, most shared first"""
+        if limit is None:
+            limit = self.candidate_limit
+        counts = self.shared_counts(self.shingles(text))
+        return [doc_id for doc_id, _ in counts.most_common(limit)]
+    
+    def candidate_ids_batch(self, texts, limit=None):
+        """candidate_ids for many texts with a single pass over the postings of their shingles"""
+        if limit is None:
+            limit = self.candidate_limit
+        per_text = [self.shingles(text) for text in texts]
+        shingles = list(set().union(*per_text))
+        postings = defaultdict(list)
+        for start in range(0, len(shingles), self.chunk_size):
+            chunk = shingles[start:start + self.chunk_size]
+            for shingle, doc_id in ShinglePosting.objects.filter(shingle__in=chunk).values_list('shingle', 'document_id'):
+                postings[shingle].append(doc_id)
+        
+        candidates = []
+        for hashes in per_text:
+            counts = Counter()
+            for h in hashes:
+                counts.update(postings.get(h, ()))
+            candidates.append([doc_id for doc_id, _ in counts.most_common(limit)])
+        return candidates
+    
+    def candidate_documents(self, text, limit=None):
+        """Queryset of the documents worth sending to the expensive scorers"""
+        return Document.objects.filter(id__in=self.candidate_ids(text, limit))
@@ -0,0 +1,311 @@
+import re
+import math
+import heapq
+from collections import Counter
+from .ai_markers import (marker_engine, AI_MARKER_WEIGHTS, PASSIVE_PATTERN, SENTENCE_SPLIT,
+                         WORD_PATTERN, PUNCTUATION_PATTERN)
+from .document_parser import DocumentParser
+from .shingle_index import shingle_hash
+
+# A sentence ends at a run of terminators followed by whitespace; the cut is made after the whitespace
+SEGMENT_END = re.compile(r'[.!?]+\s+(?=\S)')
+
+
+class DistinctCounter:
+    """Number of distinct strings seen, in bounded memory (k minimum values sketch)
+    
+    Exact until `size` distinct strings have been added. From then on only
+    the `size` smallest hashes are kept, and the count is estimated from how
+    closely they pack the hash space: relative error about 1/sqrt(size).
+    """
+    
+    def __init__(self, size=1024):
+        self.size = size
+        self._heap = []
+        self._hashes = set()
+    
+    def add(self, value):
+        self.add_hash(shingle_hash(value) & 0xFFFFFFFFFFFFFFFF)
+    
+    def add_hash(self, h):
+        """Add a value by its unsigned 64-bit hash"""
+        if h in self._hashes:
+            return
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, -h)
+            self._hashes.add(h)
+        elif h < -self._heap[0]:
+            self._hashes.discard(-heapq.heapreplace(self._heap, -h))
+            self._hashes.add(h)
+    
+    def count(self):
+        if len(self._heap) < self.size:
+            return len(self._heap)
+        return (self.size - 1) * float(1 << 64) / (-self._heap[0] + 1)
+
+
+class HeavyHitters:
+    """Counts of the most frequent strings, in bounded memory (space-saving)
+    
+    At most `capacity` strings are tracked. A new string replaces the least
+    counted one and inherits its count, so counts are exact while there are
+    fewer distinct strings than `capacity` and never too low after that.
+    """
+    
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.counts = {}
+    
+    def add(self, value):
+        if value in self.counts:
+            self.counts[value] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[value] = 1
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[value] = self.counts.pop(victim) + 1
+    
+    def max_count(self):
+        return max(self.counts.values()) if self.counts else 0
+
+
+class MarkerStats:
+    """Running totals behind the ten AI markers of a span of sentences
+    
+    Segments are added one at a time and nothing is kept from them but
+    counters: Welford's mean and squared deviations of sentence lengths,
+    a DistinctCounter of words and HeavyHitters of sentence openers. For
+    text that fits the sketches, markers() equals MarkerEngine.analyze of
+    the concatenated segments.
+    """
+    
+    def __init__(self, sketch_size=1024, start_capacity=256):
+        self.sentences = 0
+        self.mean_length = 0.0
+        self.squared_deviations = 0.0
+        self.tokens = 0
+        self.token_chars = 0
+        self.words = 0
+        self.vocabulary = DistinctCounter(sketch_size)
+        self.starts = HeavyHitters(start_capacity)
+        self.lexicons = Counter()
+        self.passive = 0
+        self.hedging = 0
+        self.punctuation = 0
+    
+    def add(self, measure):
+        for length, start in measure['sentences']:
+            self.sentences += 1
+            delta = length - self.mean_length
+            self.mean_length += delta / self.sentences
+            self.squared_deviations += delta * (length - self.mean_length)
+            self.starts.add(start)
+        self.tokens += measure['tokens']
+        self.token_chars += measure['token_chars']
+        self.words += sum(measure['words'].values())
+        for h in measure['word_hashes']:
+            self.vocabulary.add_hash(h)
+        self.lexicons.update(measure['lexicons'])
+        self.passive += measure['passive']
+        self.hedging += measure['hedging']
+        self.punctuation += measure['punctuation']
+    
+    def markers(self):
+        sentence_count = max(self.sentences, 1)
+        markers = {}
+        markers['formal_transitions'] = min(self.lexicons['formal_transitions'] / sentence_count * 0.5, 1.0)
+        if self.sentences > 3:
+            markers['repetitive_structure'] = min(self.starts.max_count() / self.sentences * 0.8, 1.0)
+        else:
+            markers['repetitive_structure'] = 0.0
+        markers['passive_voice'] = min(self.passive / sentence_count * 0.6, 1.0)
+        markers['hedging_language'] = min(self.hedging / sentence_count * 0.4, 1.0)
+        avg_word_length = self.token_chars / max(self.tokens, 1)
+        avg_sentence_length = self.tokens / sentence_count
+        markers['complexity'] = min((avg_word_length / 6.0) * 0.5 + (avg_sentence_length / 20.0) * 0.5, 1.0)
+        markers['vocabulary_diversity'] = min(self.vocabulary.count() / max(self.words, 1) * 1.5, 1.0)
+        markers['conclusion_markers'] = min(self.lexicons['conclusion_markers'] * 0.3, 1.0)
+        if self.sentences > 1:
+            std_dev = math.sqrt(self.squared_deviations / self.sentences)
+            markers['sentence_length_variance'] = min(std_dev / 10.0, 1.0)
+        else:
+            markers['sentence_length_variance'] = 0.0
+        markers['punctuation_patterns'] = min(self.punctuation / sentence_count * 0.3, 1.0)
+        markers['rare_word_usage'] = min(self.lexicons['rare_word_usage'] * 0.2, 1.0)
+        return markers
+    
+    def ai_score(self):
+        markers = self.markers()
+        return min(sum(markers[key] * weight for key, weight in AI_MARKER_WEIGHTS.items()), 1.0)
+
+
+class StreamingAIDetector:
+    """Marker-based AI detection of text of any length, sentence by sentence
+    
+    Text arrives in pieces (pages, paragraphs) and is cut into segments that
+    end between sentences. A sentence longer than `max_segment_chars` is cut
+    at whitespace instead; its length and opener so far are carried into the
+    next segment, so it still counts as one sentence. Each segment is measured once and added to two
+    MarkerStats: one for the whole document and one for the current window
+    of `window_sentences` sentences. A full window is reported with its own
+    score and replaced by an empty one, so memory stays constant however long
+    the upload is, and the windows form an AI-likelihood heatmap.
+    """
+    
+    def __init__(self, window_sentences=50, threshold=0.45, engine=None):
+        self.window_sentences = window_sentences
+        self.threshold = threshold
+        self.engine = engine or marker_engine
+        self.sketch_size = 1024
+        self.start_capacity = 256
+        # Text without sentence breaks is cut at whitespace once this long
+        self.max_segment_chars = 10000
+        # Characters of the upload kept for AIDetection.text
+        self.preview_chars = 20000
+        self.min_text_length = 10
+        # Word hashes remembered across segments; cleared when it grows past this many words
+        self.hash_cache_size = 1 << 16
+        self._hashes = {}
+    
+    def check_file(self, file):
+        return self.check(DocumentParser.iter_text(file))
+    
+    def check(self, pieces):
+        """Document score, markers and per-window scores for a text given as an iterable of pieces"""
+        return self.result(list(self.windows(pieces)))
+    
+    def windows(self, pieces):
+        """Yield each window as soon as it is complete"""
+        self.start()
+        for piece in pieces:
+            yield from self.feed(piece)
+        yield from self.finish()
+    
+    def start(self):
+        """Begin a new text; then feed() its pieces and finish()"""
+        self._reset()
+        self._buffer = ''
+        self._offset = 0
+    
+    def feed(self, piece):
+        """Add one piece of text; returns the windows it completed"""
+        windows = []
+        buffer = self._buffer + piece
+        cut = 0
+        for match in SEGMENT_END.finditer(buffer):
+            windows += self._add(buffer[cut:match.end()], self._offset + cut)
+            cut = match.end()
+        if len(buffer) - cut > self.max_segment_chars:
+            space = max(buffer.rfind(' ', cut), buffer.rfind('\n', cut))
+            if space > cut:
+                windows += self._add(buffer[cut:space + 1], self._offset + cut, open_end=True)
+                cut = space + 1
+        self._offset += cut
+        self._buffer = buffer[cut:]
+        return windows
+    
+    def finish(self):
+        """Add the text left after the last sentence break; returns the remaining windows"""
+        windows = []
+        if self._buffer or self._open:
+            windows += self._add(self._buffer, self._offset)
+            self._buffer = ''
+        if self.window.sentences:
+            windows.append(self._close_window())
+        return windows
+    
+    def result(self, windows):
+        """Result dict of the text fed so far, given the windows it produced"""
+        ai_score = self.document.ai_score() if self.characters >= self.min_text_length else 0.0
+        return {
+            'text': ''.join(self.preview),
+            'characters': self.characters,
+            'sentences': self.document.sentences,
+            'ai_score': ai_score,
+            'is_ai_generated': ai_score >= self.threshold,
+            'markers': self.document.markers(),
+            'windows': windows
+        }
+    
+    def _reset(self):
+        self.document = self._stats()
+        self.window = self._stats()
+        self.window_start = 0
+        self.window_end = 0
+        self.window_index = 0
+        self.characters = 0
+        self.preview = []
+        # (words, opener) of a sentence cut at whitespace, completed by the next segment
+        self._open = None
+    
+    def _stats(self):
+        return MarkerStats(self.sketch_size, self.start_capacity)
+    
+    def _add(self, segment, offset, open_end=False):
+        if offset < self.preview_chars:
+            self.preview.append(segment[:self.preview_chars - offset])
+        self.characters = offset + len(segment)
+        measure = self._measure(segment, open_end)
+        self.document.add(measure)
+        self.window.add(measure)
+        self.window_end = self.characters
+        if self.window.sentences >= self.window_sentences:
+            yield self._close_window()
+    
+    def _measure(self, segment, open_end=False):
+        """Everything MarkerStats needs from one segment"""
+        lower = segment.lower()
+        tokens = segment.split()
+        words = Counter(WORD_PATTERN.findall(lower))
+        return {
+            'sentences': self._sentences(segment, open_end),
+            'tokens': len(tokens),
+            'token_chars': sum(len(token) for token in tokens),
+            'words': words,
+            'word_hashes': [self._word_hash(word) for word in words],
+            'lexicons': self.engine.substrings.count(lower),
+            'passive': len(PASSIVE_PATTERN.findall(lower)),
+            'hedging': sum(words[word] for word in self.engine.hedging),
+            'punctuation': len(PUNCTUATION_PATTERN.findall(segment))
+        }
+    
+    def _sentences(self, segment, open_end):
+        """(words, opener) of each sentence the segment completes
+        
+        The first piece continues a sentence left open by the previous
+        segment. With `open_end` the last piece is held back in self._open.
+        """
+        pieces = [piece.split() for piece in SENTENCE_SPLIT.split(segment)]
+        carried, self._open = self._open, None
+        sentences = []
+        for i, words_of in enumerate(pieces):
+            if i == 0 and carried:
+                sentences.append((carried[0] + len(words_of), carried[1]))
+            elif words_of:
+                sentences.append((len(words_of), words_of[0]))
+        if open_end and (pieces[-1] or (len(pieces) == 1 and carried)):
+            self._open = sentences.pop()
+        return sentences
+    
+    def _word_hash(self, word):
+        h = self._hashes.get(word)
+        if h is None:
+            if len(self._hashes) >= self.hash_cache_size:
+                self._hashes.clear()
+            h = self._hashes[word] = shingle_hash(word) & 0xFFFFFFFFFFFFFFFF
+        return h
+    
+    def _close_window(self):
+        window = {
+            'index': self.window_index,
+            'start': self.window_start,
+            'end': self.window_end,
+            'first_sentence': self.document.sentences - self.window.sentences,
+            'sentences': self.window.sentences,
+            'ai_score': self.window.ai_score(),
+            'markers': self.window.markers()
+        }
+        self.window = self._stats()
+        self.window_index += 1
+        self.window_start = self.window_end
+        return window
@@ -0,0 +1,156 @@
+import math
+import re
+from collections import Counter, defaultdict
+from django.db.models import Count
+from .document_parser import DocumentParser
+from .models import Document, ShinglePosting
+from .shingle_index import ShingleIndex, shingle_hash
+from .streaming_ai import DistinctCounter
+from .text_features import TextFeatures, with_features
+from .winnowing import Winnower
+
+
+class StreamingPlagiarismChecker:
+    """Plagiarism check of an upload that never holds the whole text
+    
+    The parser yields pages or paragraphs, which are regrouped into chunks of
+    about `chunk_chars` characters. Each chunk is shingled, fingerprinted and
+    looked up in the shingle and winnowing indexes on its own; across chunks
+    only per-document counters, the passages found so far and the term
+    frequency vector are kept, so peak memory depends on the chunk size and
+    the vocabulary, not on the size of the document.
+    
+    Coverage counts distinct shingles, as for a text checked in one piece: a
+    shingle repeated in a later chunk is not counted again. The shingles
+    found in the corpus are remembered exactly (there are at most as many as
+    the upload shares with it); the upload's distinct shingle count, the
+    denominator of upload coverage, comes from a bounded sketch.
+    """
+    
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.chunk_chars = 1 << 16
+        self.candidate_limit = 50
+        # Characters of the previous chunk re-read so shingles and fingerprints spanning the boundary are found
+        self.overlap_chars = 200
+        # Characters of the upload kept for PlagiarismCheck.text
+        self.preview_chars = 20000
+        # Distinct shingles counted exactly up to this many, estimated past it (about 1.5% error)
+        self.sketch_size = 4096
+        self.shingler = ShingleIndex()
+        self.winnower = Winnower()
+    
+    def check_file(self, file):
+        return self.check(DocumentParser.iter_text(file))
+    
+    def check(self, pieces):
+        """Result dict for a text given as an iterable of pieces"""
+        shared = Counter()
+        matched = set()
+        terms = Counter()
+        passages = defaultdict(list)
+        distinct = DistinctCounter(self.sketch_size)
+        characters = 0
+        chunks = 0
+        preview = []
+        tail = ''
+        covered = 0
+        
+        for offset, chunk in self.chunks(pieces):
+            chunks += 1
+            characters = offset + len(chunk)
+            if offset < self.preview_chars:
+                preview.append(chunk[:self.preview_chars - offset])
+            
+            # The overlap is re-shingled for boundary-spanning n-grams; shingles wholly inside it were counted already
+            shingles = self.shingler.shingles(tail + chunk) - self.shingler.shingles(tail)
+            for h in shingles:
+                distinct.add_hash(h & 0xFFFFFFFFFFFFFFFF)
+            for shingle, doc_id in self._postings(shingles - matched):
+                matched.add(shingle)
+                shared[doc_id] += 1
+            terms.update(shingle_hash(word) for word in re.findall(r'\b\w+\b', chunk.lower()))
+            
+            base = offset - len(tail)
+            fingerprints = [(h, base + start, base + end) for h, start, end in self.winnower.fingerprints(tail + chunk)
+                            if base + start >= covered]
+            if fingerprints:
+                covered = fingerprints[-1][1] + 1
+            for doc_id, hits in self.winnower.fingerprint_hits(fingerprints).items():
+                self.winnower.extend_passages(passages[doc_id], hits)
+            self._drop_noise(passages, base)
+            tail = chunk[-self.overlap_chars:]
+        
+        matches = self._matches(shared, terms, passages, distinct.count())
+        similarity_score = max([m['similarity'] for m in matches]) if matches else 0.0
+        return {
+            'text': ''.join(preview),
+            'characters': characters,
+            'chunks': chunks,
+            'similarity_score': similarity_score,
+            'is_plagiarized': similarity_score > self.threshold,
+            'matches': matches
+        }
+    
+    def chunks(self, pieces):
+        """(offset, text) chunks of about chunk_chars, cut after a newline where possible"""
+        buffer = ''
+        offset = 0
+        for piece in pieces:
+            buffer += piece
+            while len(buffer) >= self.chunk_chars:
+                cut = buffer.rfind('\n', 0, self.chunk_chars) + 1 or self.chunk_chars
+                yield offset, buffer[:cut]
+                offset += cut
+                buffer = buffer[cut:]
+        if buffer:
+            yield offset, buffer
+    
+    def _postings(self, shingles):
+        """(shingle, document id) of every posting of the given shingles"""
+        shingles = list(shingles)
+        for start in range(0, len(shingles), self.shingler.chunk_size):
+            chunk = shingles[start:start + self.shingler.chunk_size]
+            yield from ShinglePosting.objects.filter(shingle__in=chunk).values_list('shingle', 'document_id')
+    
+    def _drop_noise(self, passages, position):
+        """Forget closed passages too short to be reported, so isolated hits do not pile up"""
+        for doc_id in list(passages):
+            kept = [p for p in passages[doc_id] if p['fingerprints'] >= self.winnower.min_fingerprints or
+                    p['end'] + self.winnower.merge_gap >= position]
+            if kept:
+                passages[doc_id] = kept
+            else:
+                del passages[doc_id]
+    
+    def _matches(self, shared, terms, passages, total_shingles):
+        """Documents whose distinct shared shingles cover enough of them or of the upload"""
+        ids = [doc_id for doc_id, _ in shared.most_common(self.candidate_limit)]
+        ids += [doc_id for doc_id in passages if doc_id not in ids]
+        if not ids:
+            return []
+        
+        sizes = dict(ShinglePosting.objects.filter(document_id__in=ids)
+                     .values_list('document_id').annotate(count=Count('id')))
+        query = TextFeatures(tokens=None, clean_tokens=None, ngrams={}, terms=terms,
+                             norm=math.sqrt(sum(v**2 for v in terms.values())), head=[])
+        
+        matches = []
+        for doc in with_features(Document.objects.filter(id__in=ids)):
+            doc_passages = [p for p in passages.get(doc.id, []) if p['fingerprints'] >= self.winnower.min_fingerprints]
+            source_coverage = min(shared[doc.id] / sizes[doc.id], 1.0) if sizes.get(doc.id) else 0.0
+            upload_coverage = shared[doc.id] / total_shingles if total_shingles else 0.0
+            # A large upload that copies a whole source is plagiarised even though most of it is original
+            similarity = max(source_coverage, upload_coverage)
+            if similarity < self.threshold and not doc_passages:
+                continue
+            matches.append({
+                'document_id': str(doc.id),
+                'title': doc.title,
+                'similarity': similarity,
+                'source_coverage': source_coverage,
+                'upload_coverage': upload_coverage,
+                'cosine': query.cosine_similarity(TextFeatures.for_document(doc)),
+                'passages': doc_passages
+            })
+        return sorted(matches, key=lambda m: m['similarity'], reverse=True)
@@ -0,0 +1,249 @@
+import os
+import time
+import uuid
+from django.conf import settings
+from django.db import transaction
+from .models import PlagiarismCheck, AIDetection
+from .shingle_index import ShingleIndex
+
+try:
+    from celery import shared_task
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def _update(check_id, **fields):
+    PlagiarismCheck.objects.filter(pk=check_id).update(**fields)
+
+
+def spool_upload(upload):
+    """Copy an upload to UPLOAD_SPOOL_DIR for a worker to read; returns its path"""
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(upload.name)[1].lower()
+    path = os.path.join(settings.UPLOAD_SPOOL_DIR, uuid.uuid4().hex + extension)
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+def _discard(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def process_plagiarism_check(check_id, engine='ultimate', source_path=None):
+    """Run a queued check and store its result on the PlagiarismCheck row
+
+    engine 'ultimate' produces the full web report (AI markers, copied
+    passages); 'services' runs the API detector; 'streaming' checks the
+    spooled upload at source_path chunk by chunk and then deletes it.
+    """
+    check = PlagiarismCheck.objects.get(pk=check_id)
+    if check.status in FINISHED_STATUSES:
+        _discard(source_path)
+        return check.status
+
+    _update(check.pk, status='running', progress=5)
+    try:
+        if engine == 'services':
+            _run_services(check)
+        elif engine == 'streaming':
+            _run_streaming(check, source_path)
+        else:
+            _run_ultimate(check)
+    except Exception as e:
+        _update(check.pk, status='failed', error=str(e))
+        return 'failed'
+    finally:
+        _discard(source_path)
+    return 'completed'
+
+
+def _run_ultimate(check):
+    from .ultimate_detector import UltimatePlagiarismDetector
+    from .winnowing import Winnower
+
+    text = check.text
+    documents = ShingleIndex().candidate_documents(text)
+    _update(check.pk, progress=20)
+
+    detection_result = UltimatePlagiarismDetector().detect_all(text, documents)
+    _update(check.pk, progress=80)
+
+    plagiarism_score = detection_result['plagiarism_score'] * 100
+    results = detection_result['details']['plagiarism'].get('matches', [])
+    winnower = Winnower()
+    passages = winnower.shared_passages(text, [r['document_id'] for r in results])
+    passages = {str(doc_id): doc_passages for doc_id, doc_passages in passages.items()}
+    for result in results:
+        result['similarity'] = result['similarity'] * 100
+        for key in ['sequence', 'ngram3', 'ngram4', 'word_overlap']:
+            if key in result:
+                result[key] = result[key] * 100
+        result['passages'] = passages.get(result['document_id'], [])
+
+    _update(
+        check.pk,
+        similarity_score=plagiarism_score,
+        is_plagiarized=plagiarism_score > (check.threshold * 100),
+        matches=results,
+        report={
+            'plagiarism_score': plagiarism_score,
+            'ai_score': detection_result['ai_score'] * 100,
+            'overall_risk': detection_result['overall_risk'] * 100,
+            'ai_markers': detection_result['details']['ai_markers'],
+            'plagiarism_methods': detection_result['details']['plagiarism_methods'],
+            'highlighted_text': winnower.segments(text, [p for r in results for p in r['passages']])
+        },
+        status='completed',
+        progress=100
+    )
+
+
+def _run_streaming(check, source_path):
+    """Plagiarism and marker-based AI scores of a large upload from one pass over its text"""
+    from .document_parser import DocumentParser
+    from .streaming_ai import StreamingAIDetector
+    from .streaming_check import StreamingPlagiarismChecker
+    from .winnowing import Winnower
+
+    ai_detector = StreamingAIDetector()
+    ai_detector.start()
+    windows = []
+
+    def pieces(file):
+        for piece in DocumentParser.iter_text(file):
+            windows.extend(ai_detector.feed(piece))
+            yield piece
+
+    with open(source_path, 'rb') as f:
+        result = StreamingPlagiarismChecker(check.threshold).check(pieces(f))
+    windows.extend(ai_detector.finish())
+    ai_result = ai_detector.result(windows)
+    if not result['text'].strip():
+        raise ValueError('No readable text found in document')
+    _update(check.pk, progress=90)
+
+    text = result['text']
+    results = result['matches']
+    for match in results:
+        match['similarity'] = match['similarity'] * 100
+    plagiarism_score = result['similarity_score'] * 100
+    ai_score = ai_result['ai_score'] * 100
+    # Only the preview of the upload is stored, so only passages starting in it are highlighted
+    preview_passages = [p for r in results for p in r['passages'] if p['start'] < len(text)]
+    _update(
+        check.pk,
+        text=text,
+        similarity_score=plagiarism_score,
+        is_plagiarized=result['is_plagiarized'],
+        matches=results,
+        report={
+            'plagiarism_score': plagiarism_score,
+            'ai_score': ai_score,
+            'overall_risk': max(plagiarism_score, ai_score),
+            'ai_markers': ai_result['markers'],
+            'highlighted_text': Winnower().segments(text, preview_passages),
+            'characters': result['characters'],
+            'chunks': result['chunks']
+        },
+        status='completed',
+        progress=100
+    )
+
+
+def process_ai_detection(detection_id, source_path):
+    """Score a spooled upload for AI markers, store the result on the AIDetection row, delete the upload"""
+    from .streaming_ai import StreamingAIDetector
+
+    detection = AIDetection.objects.get(pk=detection_id)
+    if detection.status in FINISHED_STATUSES:
+        _discard(source_path)
+        return detection.status
+
+    rows = AIDetection.objects.filter(pk=detection_id)
+    rows.update(status='running', progress=5)
+    try:
+        with open(source_path, 'rb') as f:
+            result = StreamingAIDetector().check_file(f)
+        if not result['text'].strip():
+            raise ValueError('No readable text found in document')
+        rows.update(
+            text=result['text'],
+            humanized_text=result['text'],
+            ai_probability=result['ai_score'] * 100,
+            is_ai_generated=result['is_ai_generated'],
+            report={'ai_markers': result['markers'], 'windows': result['windows'],
+                    'characters': result['characters']},
+            status='completed',
+            progress=100
+        )
+    except Exception as e:
+        rows.update(status='failed', error=str(e))
+        return 'failed'
+    finally:
+        _discard(source_path)
+    return 'completed'
+
+
+def _run_services(check):
+    from .services import PlagiarismDetector
+
+    documents = ShingleIndex().candidate_documents(check.text)
+    _update(check.pk, progress=20)
+
+    results = PlagiarismDetector().detect_plagiarism(check.text, documents, check.threshold)
+    similarity_score = max([r['similarity'] for r in results]) if results else 0.0
+    _update(
+        check.pk,
+        similarity_score=similarity_score,
+        is_plagiarized=similarity_score > check.threshold,
+        matches=results,
+        status='completed',
+        progress=100
+    )
+
+
+if CELERY_AVAILABLE:
+    @shared_task(name='analyzer.run_plagiarism_check')
+    def run_plagiarism_check(check_id, engine='ultimate', source_path=None):
+        return process_plagiarism_check(check_id, engine, source_path)
+
+    @shared_task(name='analyzer.run_ai_detection')
+    def run_ai_detection(detection_id, source_path):
+        return process_ai_detection(detection_id, source_path)
+
+
+def enqueue_plagiarism_check(check, engine='ultimate', source_path=None):
+    """Hand a pending check to a worker; runs inline when Celery is not installed
+
+    With no CELERY_BROKER_URL the task runs eagerly in this process, so the
+    same submit-then-poll flow works in tests and single-process deployments.
+    source_path is a spooled upload (spool_upload) for the 'streaming' engine.
+    """
+    if CELERY_AVAILABLE:
+        transaction.on_commit(lambda: run_plagiarism_check.delay(str(check.pk), engine, source_path))
+    else:
+        process_plagiarism_check(check.pk, engine, source_path)
+
+
+def enqueue_ai_detection(detection, source_path):
+    """Hand a pending AI detection of a spooled upload to a worker, like enqueue_plagiarism_check"""
+    if CELERY_AVAILABLE:
+        transaction.on_commit(lambda: run_ai_detection.delay(str(detection.pk), source_path))
+    else:
+        process_ai_detection(detection.pk, source_path)
+
+
+def wait_for_check(check_id, timeout, interval=0.5):
+    """Long-poll: reload the check until it finishes or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    check = PlagiarismCheck.objects.get(pk=check_id)
+    while check.status not in FINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(interval)
+        check.refresh_from_db()
+    return check
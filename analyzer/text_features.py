@@ -0,0 +1,211 @@
+import re
+import math
+from array import array
+from collections import Counter
+from django.core.exceptions import ObjectDoesNotExist
+from .models import Document, DocumentFeatures
+from .shingle_index import shingle_hash
+
+FEATURES_VERSION = 1
+NGRAM_SIZES = (3, 4, 5)
+HEAD_WORDS = 50
+PACKED_FIELDS = ('tokens', 'ngrams', 'terms', 'norm', 'head')
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
+
+
+def clean_words(text):
+    """Lowercased words with punctuation and stop words removed"""
+    words = re.sub(r'[^\w\s]', '', text.lower()).split()
+    return [word for word in words if word not in STOP_WORDS]
+
+
+def _pack(arrays):
+    """Concatenate int64 arrays behind a length header"""
+    header = array('q', [len(values) for values in arrays])
+    body = array('q')
+    for values in arrays:
+        body.extend(values)
+    return array('q', [len(arrays)]).tobytes() + header.tobytes() + body.tobytes()
+
+
+def _unpack(blob):
+    values = array('q')
+    values.frombytes(bytes(blob))
+    count = values[0]
+    lengths = values[1:count + 1]
+    arrays = []
+    offset = count + 1
+    for length in lengths:
+        arrays.append(values[offset:offset + length])
+        offset += length
+    return arrays
+
+
+class TextFeatures:
+    """Tokens, hashed word n-grams and term frequencies of one text, computed once
+    
+    Two token views are kept: the raw view (lowercased whitespace tokens) used by
+    the hybrid and ultimate detectors, and the clean view (punctuation and stop
+    words removed) used by services.PlagiarismDetector.
+    """
+    
+    def __init__(self, tokens, clean_tokens, ngrams, terms, norm, head):
+        self.tokens = tokens
+        self.clean_tokens = clean_tokens
+        self.ngrams = ngrams
+        self.terms = terms
+        self.norm = norm
+        self.head = head
+        self._sets = {}
+    
+    @classmethod
+    def from_text(cls, text):
+        lower = (text or '').lower()
+        words = lower.split()
+        cleaned = clean_words(lower)
+        
+        ngrams = {}
+        for clean, view in ((False, words), (True, cleaned)):
+            for n in NGRAM_SIZES:
+                ngrams[(clean, n)] = array('q', {shingle_hash(' '.join(view[i:i+n]))
+                                                 for i in range(len(view) - n + 1)})
+        
+        freq = Counter(shingle_hash(word) for word in re.findall(r'\b\w+\b', lower))
+        return cls(
+            tokens=array('q', [shingle_hash(word) for word in words]),
+            clean_tokens=array('q', [shingle_hash(word) for word in cleaned]),
+            ngrams=ngrams,
+            terms=dict(freq),
+            norm=math.sqrt(sum(v**2 for v in freq.values())),
+            head=words[:HEAD_WORDS]
+        )
+    
+    @classmethod
+    def from_fields(cls, fields):
+        """Rebuild features from the packed fields produced by record_fields()"""
+        tokens, clean_tokens = _unpack(fields['tokens'])
+        packed = _unpack(fields['ngrams'])
+        keys = [(clean, n) for clean in (False, True) for n in NGRAM_SIZES]
+        term_ids, term_counts = _unpack(fields['terms'])
+        return cls(
+            tokens=tokens,
+            clean_tokens=clean_tokens,
+            ngrams=dict(zip(keys, packed)),
+            terms=dict(zip(term_ids, term_counts)),
+            norm=fields['norm'],
+            head=fields['head'].split()
+        )
+    
+    @classmethod
+    def from_record(cls, record):
+        return cls.from_fields({name: getattr(record, name) for name in PACKED_FIELDS})
+    
+    @classmethod
+    def for_document(cls, document):
+        """Stored features of a document, recomputed from its content when missing or stale"""
+        record = cls._current_record(document)
+        if record is not None:
+            return cls.from_record(record)
+        return cls.from_text(document.content)
+    
+    @classmethod
+    def fields_for_document(cls, document):
+        """Packed features of a document; plain bytes, cheap to send to worker processes"""
+        record = cls._current_record(document)
+        if record is None:
+            return cls.from_text(document.content).record_fields()
+        fields = {name: getattr(record, name) for name in PACKED_FIELDS}
+        for name in ('tokens', 'ngrams', 'terms'):
+            fields[name] = bytes(fields[name])
+        return fields
+    
+    @staticmethod
+    def _current_record(document):
+        try:
+            record = document.features
+        except (ObjectDoesNotExist, AttributeError):
+            return None
+        return record if record is not None and record.version == FEATURES_VERSION else None
+    
+    @classmethod
+    def index_document(cls, document):
+        """(Re)build the stored features of one document"""
+        features = cls.from_text(document.content)
+        DocumentFeatures.objects.update_or_create(document_id=document.pk, defaults=features.record_fields())
+        return features
+    
+    @classmethod
+    def rebuild(cls, only_missing=False):
+        """Compute features for every document; returns the number of documents processed"""
+        documents = Document.objects.only('id', 'content')
+        if only_missing:
+            documents = documents.exclude(features__version=FEATURES_VERSION)
+        count = 0
+        for document in documents.iterator():
+            cls.index_document(document)
+            count += 1
+        return count
+    
+    def record_fields(self):
+        keys = [(clean, n) for clean in (False, True) for n in NGRAM_SIZES]
+        term_ids = list(self.terms)
+        return {
+            'version': FEATURES_VERSION,
+            'tokens': _pack([self.tokens, self.clean_tokens]),
+            'ngrams': _pack([self.ngrams[key] for key in keys]),
+            'terms': _pack([array('q', term_ids), array('q', [self.terms[t] for t in term_ids])]),
+            'norm': self.norm,
+            'head': ' '.join(self.head)
+        }
+    
+    @property
+    def word_count(self):
+        return len(self.tokens)
+    
+    def ngram_set(self, n, clean=False):
+        key = ('ngram', clean, n)
+        if key not in self._sets:
+            self._sets[key] = set(self.ngrams[(clean, n)])
+        return self._sets[key]
+    
+    def word_set(self, clean=False):
+        key = ('word', clean)
+        if key not in self._sets:
+            self._sets[key] = set(self.clean_tokens if clean else self.tokens)
+        return self._sets[key]
+    
+    def ngram_similarity(self, other, n, clean=False):
+        """Jaccard similarity of word n-gram sets"""
+        return jaccard(self.ngram_set(n, clean), other.ngram_set(n, clean))
+    
+    def word_overlap(self, other, clean=False):
+        """Jaccard similarity of word sets"""
+        return jaccard(self.word_set(clean), other.word_set(clean))
+    
+    def cosine_similarity(self, other):
+        """Cosine similarity of the term-frequency vectors"""
+        if not self.terms or not other.terms or self.norm == 0 or other.norm == 0:
+            return 0.0
+        
+        small, large = sorted((self.terms, other.terms), key=len)
+        dot_product = sum(count * large[term] for term, count in small.items() if term in large)
+        return dot_product / (self.norm * other.norm)
+
+
+def jaccard(set1, set2):
+    if not set1 or not set2:
+        return 0.0
+    
+    intersection = len(set1 & set2)
+    union = len(set1 | set2)
+    return intersection / union if union > 0 else 0.0
+
+
+def with_features(documents):
+    """Fetch stored features alongside a document queryset (lists pass through)"""
+    if hasattr(documents, 'select_related'):
+        related = documents.query.select_related
+        if isinstance(related, dict) and 'features' in related:
+            return documents
+        return documents.select_related('features')
+    return documents
@@ -1,7 +1,7 @@
 from .ultra_detector import UltraAccuratePlagiarismDetector
 from .services import (AIDetector, TextSummarizationService, SentimentAnalysisService, 
                        TextStatisticsService, URLShortenerService, QRCodeGenerator, KeywordExtractionService)
-from .document_parser import DocumentParser
+from .extraction_cache import ExtractionCache
 
 class ToolValidator:
     @staticmethod
@@ -67,7 +67,7 @@ class ToolValidator:
     @staticmethod
     def validate_document_parser(file):
         try:
-            text = DocumentParser.extract_text_from_file(file)
+            text = ExtractionCache().extract_text(file)
             return {'status': 'ok', 'text_length': len(text)}
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
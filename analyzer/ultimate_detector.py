@@ -1,8 +1,11 @@
-import re
 from difflib import SequenceMatcher
+from .aligner import sequence_similarity
 import hashlib
-from collections import Counter
-import math
+import heapq
+from .minhash_lsh import MinHashLSH
+from .text_features import TextFeatures, with_features
+from .parallel_compare import ParallelComparer, candidate_count
+from .ai_markers import marker_engine, AI_MARKER_WEIGHTS, TextAnalysis
 
 class UltimatePlagiarismDetector:
     """Ultimate plagiarism detector combining 10+ methods for maximum accuracy"""
@@ -11,10 +14,22 @@ class UltimatePlagiarismDetector:
         self.plagiarism_threshold = 0.25
         self.ai_threshold = 0.45
         self.min_text_length = 10
+        # Cap on the matches reported; None lists every document above the threshold
+        self.top_k = None
+        self.lsh = MinHashLSH()
+        self.weights = {'sequence': 0.25, 'ngram3': 0.20, 'ngram4': 0.20,
+                        'word_overlap': 0.15, 'semantic': 0.15, 'fuzzy': 0.05}
+        # Scorers from cheapest to most expensive
+        self.cascade = ('word_overlap', 'ngram3', 'ngram4', 'semantic', 'fuzzy', 'sequence')
+        self.cascade_stats = {}
+        # Candidate sets at least this large are scored across a process pool
+        self.parallel_min_candidates = 2000
+        self.comparer = ParallelComparer()
     
     def detect_all(self, text, documents=None):
         """Comprehensive detection combining plagiarism and AI detection"""
-        plagiarism_score = self._detect_plagiarism(text, documents)
+        matches = self._scan_documents(text, documents)
+        plagiarism_score = matches[0]['similarity'] if matches else 0.0
         ai_score = self._detect_ai_content(text)
         
         return {
@@ -24,116 +39,214 @@ class UltimatePlagiarismDetector:
             'is_ai_generated': ai_score >= self.ai_threshold,
             'overall_risk': max(plagiarism_score, ai_score),
             'details': {
-                'plagiarism': self._get_plagiarism_details(text, documents),
+                'plagiarism': self._plagiarism_details(matches, documents),
                 'ai_markers': self._analyze_ai_markers(text),
-                'plagiarism_methods': self._get_plagiarism_breakdown(text, documents)
+                'plagiarism_methods': self._plagiarism_breakdown(matches),
+                'cascade': self.cascade_stats
             }
         }
     
-    def _detect_plagiarism(self, text, documents=None):
-        """Detect plagiarism using 6 methods"""
+    def _scan_documents(self, text, documents=None):
+        """Score documents through the cascade and keep those above the threshold
+        
+        A document is dropped as soon as the upper bound of its weighted score
+        can neither reach the threshold nor beat the best score so far, or, when
+        top_k is set, falls to the current k-th best score. The best match is
+        kept even below the threshold so plagiarism_score stays the exact maximum.
+        """
+        self.cascade_stats = self._empty_stats()
         if not text or len(text.strip()) < self.min_text_length:
-            return 0.0
+            return []
         
-        if not documents:
-            return 0.0
+        if documents is None:
+            return []
+        
+        if self.lsh:
+            documents = self.lsh.prefilter(text, documents)
         
-        max_similarity = 0.0
-        for doc in documents:
-            if not doc.content or len(doc.content.strip()) < self.min_text_length:
+        documents = with_features(documents)
+        if self.parallel_min_candidates is not None and candidate_count(documents) >= self.parallel_min_candidates:
+            top = self._scan_parallel(text, documents)
+        else:
+            rows = documents.iterator() if hasattr(documents, 'iterator') else documents
+            items = ((order, doc, TextFeatures.for_document(doc), doc.content.lower())
+                     for order, doc in enumerate(rows) if self._comparable(doc))
+            top = self._top_matches(TextFeatures.from_text(text), text.lower(), items, self.cascade_stats)
+        
+        top = sorted(top, key=lambda entry: entry[:2], reverse=True)
+        # Below the threshold only the best match is reported, for its score
+        top = [entry for rank, entry in enumerate(top) if rank == 0 or entry[0] >= self.plagiarism_threshold]
+        return [
+            {'document': doc, 'similarity': similarity, 'metrics': metrics}
+            for similarity, _, doc, metrics in top[:self.top_k]
+        ]
+    
+    def _scan_parallel(self, text, documents):
+        """Score shards of packed features in worker processes and merge their top-k"""
+        rows = documents.iterator() if hasattr(documents, 'iterator') else documents
+        items = ((order, doc.pk, TextFeatures.fields_for_document(doc), doc.content.lower())
+                 for order, doc in enumerate(rows) if self._comparable(doc))
+        payload = (self, TextFeatures.from_text(text).record_fields(), text.lower())
+        shards = self.comparer.map(_score_shard, payload, items, size=lambda item: len(item[3]))
+        
+        for shard in shards:
+            self.cascade_stats['candidates'] += shard['stats']['candidates']
+            self.cascade_stats['scored'] += shard['stats']['scored']
+            for stage, count in shard['stats']['pruned'].items():
+                self.cascade_stats['pruned'][stage] += count
+        top = [entry for shard in shards for entry in shard['top']]
+        
+        if hasattr(documents, 'model'):
+            found = documents.model.objects.in_bulk([pk for _, _, pk, _ in top])
+        else:
+            found = {doc.pk: doc for doc in documents}
+        return [(similarity, order, found[pk], metrics) for similarity, order, pk, metrics in top if pk in found]
+    
+    def _comparable(self, doc):
+        return bool(doc.content) and len(doc.content.strip()) >= self.min_text_length
+    
+    def _empty_stats(self):
+        return {'candidates': 0, 'scored': 0, 'pruned': {stage: 0 for stage in ('bounds',) + self.cascade}}
+    
+    def _top_matches(self, query, query_lower, items, stats):
+        """(similarity, -order, key, metrics) entries of (order, key, features, lower) items
+        
+        Every entry above the threshold (the best top_k of them when set), plus
+        the best entry when it is below the threshold.
+        """
+        heap = []
+        best = None
+        for order, key, features, doc_lower in items:
+            stats['candidates'] += 1
+            floor = heap[0][0] if self.top_k and len(heap) == self.top_k else None
+            # Until a document is scored there is no best match, and nothing below the threshold may be skipped
+            metrics = self._cascade_score(query, features, query_lower, doc_lower, floor,
+                                          best[0] if best else -1.0, stats)
+            if metrics is None:
                 continue
+            stats['scored'] += 1
+            similarity = self._weighted_score(metrics)
             
-            similarity = self._calculate_plagiarism_similarity(text, doc.content)
-            max_similarity = max(max_similarity, similarity)
+            # Ties keep the earlier document: -order makes later ones smaller
+            entry = (similarity, -order, key, metrics)
+            if best is None or entry[:2] > best[:2]:
+                best = entry
+            if similarity < self.plagiarism_threshold:
+                continue
+            if not self.top_k or len(heap) < self.top_k:
+                heapq.heappush(heap, entry)
+            elif similarity > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+        if best is not None and best[0] < self.plagiarism_threshold:
+            heap.append(best)
+        return heap
+    
+    def _cascade_score(self, query, doc, query_lower, doc_lower, floor, best, stats):
+        """Run the scorers cheapest first; None once the document cannot make the cut"""
+        bounds = self._metric_bounds(query, doc, query_lower, doc_lower)
+        if self._pruned(bounds, floor, best):
+            stats['pruned']['bounds'] += 1
+            return None
+        
+        for stage in self.cascade:
+            bounds[stage] = self._score_metric(stage, query, doc, query_lower, doc_lower)
+            if stage != self.cascade[-1] and self._pruned(bounds, floor, best):
+                stats['pruned'][stage] += 1
+                return None
+        return bounds
+    
+    def _pruned(self, bounds, floor, best):
+        """True when the document cannot beat `floor`, or can neither reach the threshold nor beat `best`
+        
+        best is None when no best match is tracked: then the threshold alone decides.
+        """
+        # The epsilon keeps float rounding from dropping a document sitting exactly on the cut
+        bound = self._weighted_score(bounds) + 1e-9
+        if floor is not None and bound <= floor:
+            return True
+        return bound < self.plagiarism_threshold and (best is None or bound <= best)
+    
+    def _metric_bounds(self, query, doc, query_lower, doc_lower):
+        """Upper bound of every metric from set and text sizes alone"""
+        def size_ratio(a, b):
+            return min(a, b) / max(a, b) if a and b else 0.0
         
-        return max_similarity
+        return {
+            'sequence': 2.0 * min(len(query_lower), len(doc_lower)) / max(len(query_lower) + len(doc_lower), 1),
+            'ngram3': size_ratio(len(query.ngrams[(False, 3)]), len(doc.ngrams[(False, 3)])),
+            'ngram4': size_ratio(len(query.ngrams[(False, 4)]), len(doc.ngrams[(False, 4)])),
+            'word_overlap': size_ratio(len(query.word_set()), len(doc.word_set())),
+            'semantic': 1.0,
+            # Every leading query word may find a match, repeated words included
+            'fuzzy': len(query.head) / max(query.word_count, doc.word_count) if query.head and doc.head else 0.0
+        }
+    
+    def _score_metric(self, name, query, doc, query_lower, doc_lower):
+        if name == 'sequence':
+            return sequence_similarity(query_lower, doc_lower)
+        if name == 'ngram3':
+            return query.ngram_similarity(doc, 3)
+        if name == 'ngram4':
+            return query.ngram_similarity(doc, 4)
+        if name == 'word_overlap':
+            return query.word_overlap(doc)
+        if name == 'semantic':
+            return query.cosine_similarity(doc)
+        return self._fuzzy_words(query.head, doc.head, query.word_count, doc.word_count)
+    
+    def _detect_plagiarism(self, text, documents=None):
+        """Detect plagiarism using 6 methods"""
+        matches = self._scan_documents(text, documents)
+        return matches[0]['similarity'] if matches else 0.0
+    
+    def _score_features(self, query, doc, query_lower, doc_lower):
+        """Compute every plagiarism metric for one pair of cached features"""
+        return {name: self._score_metric(name, query, doc, query_lower, doc_lower) for name in self.weights}
+    
+    def _weighted_score(self, metrics):
+        # Weighted: sequence(25%), ngram3(20%), ngram4(20%), word(15%), semantic(15%), fuzzy(5%)
+        return sum(metrics[name] * weight for name, weight in self.weights.items())
     
     def _calculate_plagiarism_similarity(self, text1, text2):
         """Calculate plagiarism using 6 methods"""
-        seq = self._sequence_match(text1, text2)
-        ngram3 = self._ngram_similarity(text1, text2, n=3)
-        ngram4 = self._ngram_similarity(text1, text2, n=4)
-        word = self._word_overlap(text1, text2)
-        semantic = self._semantic_similarity(text1, text2)
-        fuzzy = self._fuzzy_match(text1, text2)
-        
-        # Weighted: sequence(25%), ngram3(20%), ngram4(20%), word(15%), semantic(15%), fuzzy(5%)
-        return (seq * 0.25) + (ngram3 * 0.20) + (ngram4 * 0.20) + (word * 0.15) + (semantic * 0.15) + (fuzzy * 0.05)
+        return self._weighted_score(self._score_features(
+            TextFeatures.from_text(text1), TextFeatures.from_text(text2), text1.lower(), text2.lower()))
     
     def _sequence_match(self, text1, text2):
         """Sequence matching"""
-        matcher = SequenceMatcher(None, text1.lower(), text2.lower())
-        return matcher.ratio()
+        return sequence_similarity(text1.lower(), text2.lower())
     
     def _ngram_similarity(self, text1, text2, n=4):
         """N-gram analysis"""
-        def get_ngrams(text):
-            words = text.lower().split()
-            return set(' '.join(words[i:i+n]) for i in range(max(0, len(words)-n+1)))
-        
-        ngrams1 = get_ngrams(text1)
-        ngrams2 = get_ngrams(text2)
-        
-        if not ngrams1 or not ngrams2:
-            return 0.0
-        
-        intersection = len(ngrams1 & ngrams2)
-        union = len(ngrams1 | ngrams2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).ngram_similarity(TextFeatures.from_text(text2), n)
     
     def _word_overlap(self, text1, text2):
         """Word-level overlap"""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
-        return intersection / union if union > 0 else 0.0
+        return TextFeatures.from_text(text1).word_overlap(TextFeatures.from_text(text2))
     
     def _semantic_similarity(self, text1, text2):
         """Semantic similarity using word frequency"""
-        def get_word_freq(text):
-            words = re.findall(r'\b\w+\b', text.lower())
-            return Counter(words)
-        
-        freq1 = get_word_freq(text1)
-        freq2 = get_word_freq(text2)
-        
-        if not freq1 or not freq2:
-            return 0.0
-        
-        common_words = set(freq1.keys()) & set(freq2.keys())
-        if not common_words:
-            return 0.0
-        
-        dot_product = sum(freq1[w] * freq2[w] for w in common_words)
-        magnitude1 = math.sqrt(sum(v**2 for v in freq1.values()))
-        magnitude2 = math.sqrt(sum(v**2 for v in freq2.values()))
-        
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
+        return TextFeatures.from_text(text1).cosine_similarity(TextFeatures.from_text(text2))
     
     def _fuzzy_match(self, text1, text2):
         """Fuzzy matching for typos and variations"""
-        text1_words = text1.lower().split()
-        text2_words = text2.lower().split()
-        
-        if not text1_words or not text2_words:
+        words1 = text1.lower().split()
+        words2 = text2.lower().split()
+        return self._fuzzy_words(words1[:50], words2[:50], len(words1), len(words2))
+    
+    def _fuzzy_words(self, head1, head2, count1, count2):
+        """Share of the leading words with a close match in the other text"""
+        if not head1 or not head2:
             return 0.0
         
         matches = 0
-        for w1 in text1_words[:50]:
-            for w2 in text2_words[:50]:
+        for w1 in head1:
+            for w2 in head2:
                 if self._string_similarity(w1, w2) > 0.85:
                     matches += 1
                     break
         
-        return matches / max(len(text1_words), len(text2_words))
+        return matches / max(count1, count2)
     
     def _string_similarity(self, s1, s2):
         """Calculate string similarity"""
@@ -145,146 +258,72 @@ class UltimatePlagiarismDetector:
     
     def _detect_ai_content(self, text):
         """Detect AI-generated content using 10 markers"""
+        return self.score_analysis(TextAnalysis(text))
+    
+    def score_analysis(self, analysis):
+        """AI score of a shared TextAnalysis"""
+        text = analysis.text
         if not text or len(text.strip()) < self.min_text_length:
             return 0.0
         
-        markers = self._analyze_ai_markers(text)
-        
-        weights = {
-            'formal_transitions': 0.15,
-            'repetitive_structure': 0.15,
-            'passive_voice': 0.12,
-            'hedging_language': 0.12,
-            'complexity': 0.12,
-            'vocabulary_diversity': 0.10,
-            'conclusion_markers': 0.08,
-            'sentence_length_variance': 0.08,
-            'punctuation_patterns': 0.05,
-            'rare_word_usage': 0.03
-        }
+        markers = marker_engine.markers(analysis)
         
-        ai_score = sum(markers.get(key, 0) * weight for key, weight in weights.items())
+        ai_score = sum(markers.get(key, 0) * weight for key, weight in AI_MARKER_WEIGHTS.items())
         return min(ai_score, 1.0)
     
     def _analyze_ai_markers(self, text):
         """Analyze 10 AI markers"""
-        text_lower = text.lower()
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        markers = {}
-        
-        # 1. Formal transitions
-        formal_transitions = ['furthermore', 'moreover', 'in addition', 'consequently', 
-                            'therefore', 'thus', 'hence', 'additionally', 'notably',
-                            'significantly', 'importantly', 'ultimately', 'essentially']
-        transition_count = sum(text_lower.count(t) for t in formal_transitions)
-        markers['formal_transitions'] = min(transition_count / max(len(sentences), 1) * 0.5, 1.0)
-        
-        # 2. Repetitive structure
-        if len(sentences) > 3:
-            sentence_starts = [s.split()[0] if s.split() else '' for s in sentences]
-            start_counter = Counter(sentence_starts)
-            repetition = max(start_counter.values()) / len(sentences) if sentences else 0
-            markers['repetitive_structure'] = min(repetition * 0.8, 1.0)
-        else:
-            markers['repetitive_structure'] = 0.0
-        
-        # 3. Passive voice
-        passive_pattern = r'\b(is|are|was|were|be|been|being)\s+\w+ed\b'
-        passive_count = len(re.findall(passive_pattern, text_lower))
-        markers['passive_voice'] = min(passive_count / max(len(sentences), 1) * 0.6, 1.0)
-        
-        # 4. Hedging language
-        hedging_words = ['may', 'might', 'could', 'possibly', 'arguably', 'somewhat',
-                        'relatively', 'rather', 'quite', 'seems', 'appears', 'tends']
-        hedging_count = sum(len(re.findall(r'\b' + word + r'\b', text_lower)) for word in hedging_words)
-        markers['hedging_language'] = min(hedging_count / max(len(sentences), 1) * 0.4, 1.0)
-        
-        # 5. Complexity
-        avg_word_length = sum(len(word) for word in text.split()) / max(len(text.split()), 1)
-        avg_sentence_length = len(text.split()) / max(len(sentences), 1)
-        complexity = (avg_word_length / 6.0) * 0.5 + (avg_sentence_length / 20.0) * 0.5
-        markers['complexity'] = min(complexity, 1.0)
-        
-        # 6. Vocabulary diversity
-        words = re.findall(r'\b\w+\b', text_lower)
-        unique_words = len(set(words))
-        diversity = unique_words / max(len(words), 1)
-        markers['vocabulary_diversity'] = min(diversity * 1.5, 1.0)
-        
-        # 7. Conclusion markers
-        conclusion_markers = ['in conclusion', 'to conclude', 'in summary', 'to summarize',
-                            'ultimately', 'in essence', 'in short']
-        conclusion_count = sum(text_lower.count(m) for m in conclusion_markers)
-        markers['conclusion_markers'] = min(conclusion_count * 0.3, 1.0)
-        
-        # 8. Sentence length variance
-        if len(sentences) > 1:
-            sentence_lengths = [len(s.split()) for s in sentences]
-            avg_length = sum(sentence_lengths) / len(sentence_lengths)
-            variance = sum((l - avg_length) ** 2 for l in sentence_lengths) / len(sentence_lengths)
-            std_dev = math.sqrt(variance)
-            markers['sentence_length_variance'] = min(std_dev / 10.0, 1.0)
-        else:
-            markers['sentence_length_variance'] = 0.0
-        
-        # 9. Punctuation patterns
-        punctuation_count = len(re.findall(r'[,;:]', text))
-        markers['punctuation_patterns'] = min(punctuation_count / max(len(sentences), 1) * 0.3, 1.0)
-        
-        # 10. Rare word usage
-        rare_words = ['aforementioned', 'notwithstanding', 'heretofore', 'henceforth',
-                     'erstwhile', 'perchance', 'betwixt', 'thenceforth']
-        rare_count = sum(text_lower.count(w) for w in rare_words)
-        markers['rare_word_usage'] = min(rare_count * 0.2, 1.0)
-        
-        return markers
+        return marker_engine.analyze(text)
     
-    def _get_plagiarism_details(self, text, documents):
-        """Get detailed plagiarism analysis"""
-        if not documents:
+    def _plagiarism_details(self, matches, documents):
+        """Detailed plagiarism analysis derived from the scan results"""
+        if documents is None:
             return {'status': 'no_documents', 'matches': []}
         
         results = []
-        for doc in documents:
-            if not doc.content or len(doc.content.strip()) < self.min_text_length:
+        for match in matches:
+            if match['similarity'] < self.plagiarism_threshold:
                 continue
-            
-            similarity = self._calculate_plagiarism_similarity(text, doc.content)
-            if similarity >= self.plagiarism_threshold:
-                results.append({
-                    'title': doc.title,
-                    'similarity': similarity,
-                    'sequence': self._sequence_match(text, doc.content),
-                    'ngram3': self._ngram_similarity(text, doc.content, n=3),
-                    'ngram4': self._ngram_similarity(text, doc.content, n=4),
-                    'word_overlap': self._word_overlap(text, doc.content)
-                })
+            metrics = match['metrics']
+            results.append({
+                'document_id': str(match['document'].pk),
+                'title': match['document'].title,
+                'similarity': match['similarity'],
+                'sequence': metrics['sequence'],
+                'ngram3': metrics['ngram3'],
+                'ngram4': metrics['ngram4'],
+                'word_overlap': metrics['word_overlap']
+            })
         
         return {
             'status': 'plagiarized' if results else 'original',
-            'matches': sorted(results, key=lambda x: x['similarity'], reverse=True)
+            'matches': results
         }
     
-    def _get_plagiarism_breakdown(self, text, documents):
-        """Get breakdown of plagiarism detection methods"""
-        if not documents or not documents.exists():
-            return {}
-        
-        doc = documents.first()
-        if not doc.content:
+    def _plagiarism_breakdown(self, matches):
+        """Per-method breakdown for the best matching document"""
+        if not matches:
             return {}
         
+        metrics = matches[0]['metrics']
         return {
-            'sequence_match': self._sequence_match(text, doc.content),
-            'ngram_3gram': self._ngram_similarity(text, doc.content, n=3),
-            'ngram_4gram': self._ngram_similarity(text, doc.content, n=4),
-            'word_overlap': self._word_overlap(text, doc.content),
-            'semantic': self._semantic_similarity(text, doc.content),
-            'fuzzy_match': self._fuzzy_match(text, doc.content)
+            'sequence_match': metrics['sequence'],
+            'ngram_3gram': metrics['ngram3'],
+            'ngram_4gram': metrics['ngram4'],
+            'word_overlap': metrics['word_overlap'],
+            'semantic': metrics['semantic'],
+            'fuzzy_match': metrics['fuzzy']
         }
     
     def get_fingerprint(self, text):
         """Generate document fingerprint"""
         return hashlib.sha256(text.lower().encode()).hexdigest()
+
+
+def _score_shard(payload, items):
+    """Worker entry point: cascade-score one shard of packed document features"""
+    detector, query_fields, query_lower = payload
+    stats = detector._empty_stats()
+    items = ((order, pk, TextFeatures.from_fields(fields), lower) for order, pk, fields, lower in items)
+    top = detector._top_matches(TextFeatures.from_fields(query_fields), query_lower, items, stats)
+    return {'top': top, 'stats': stats}
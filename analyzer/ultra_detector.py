@@ -1,6 +1,12 @@
 import re
 from collections import Counter
-import math
+from .ai_markers import PatternCounter, TextAnalysis
+
+FORMAL_PATTERN = r'\b(furthermore|moreover|additionally|consequently|nevertheless|notwithstanding)\b'
+MARKER_PATTERN = r'\b(in conclusion|to summarize|it is important|can be seen|it is evident)\b'
+PATTERNS = [FORMAL_PATTERN, MARKER_PATTERN]
+PATTERN_COUNTER = PatternCounter(PATTERNS)
+SENTENCE_START = re.compile(r'^[A-Za-z]+')
 
 class UltraAccuratePlagiarismDetector:
     def detect_plagiarism(self, text, documents, threshold=0.7):
@@ -30,16 +36,19 @@ class UltraAccuratePlagiarismDetector:
         return sorted(results, key=lambda x: x['similarity'], reverse=True)
     
     def _analyze_text_patterns(self, text):
+        return self.score_analysis(TextAnalysis(text, PATTERN_COUNTER))
+    
+    def score_analysis(self, analysis):
+        """Pattern score of a shared TextAnalysis"""
         score = 0.0
         
         # Check for excessive formal language
-        formal_words = len(re.findall(r'\b(furthermore|moreover|additionally|consequently|nevertheless|notwithstanding)\b', text, re.I))
+        formal_words = analysis.count(FORMAL_PATTERN)
         score += min(formal_words * 0.05, 0.3)
         
         # Check for repetitive sentence structures
-        sentences = re.split(r'[.!?]+', text)
-        if len(sentences) > 3:
-            sentence_starts = [re.match(r'^[A-Za-z]+', s.strip()) for s in sentences if s.strip()]
+        if len(analysis.split_sentences) > 3:
+            sentence_starts = [SENTENCE_START.match(s) for s in analysis.sentences]
             starts = [m.group() for m in sentence_starts if m]
             if starts:
                 start_freq = Counter(starts)
@@ -47,7 +56,7 @@ class UltraAccuratePlagiarismDetector:
                 score += min(repetition * 0.2, 0.2)
         
         # Check for unnatural word transitions
-        words = text.lower().split()
+        words = analysis.lower_tokens
         if len(words) > 10:
             transitions = [f"{words[i]} {words[i+1]}" for i in range(len(words)-1)]
             unique_ratio = len(set(transitions)) / len(transitions)
@@ -55,7 +64,7 @@ class UltraAccuratePlagiarismDetector:
                 score += 0.15
         
         # Check for AI markers
-        ai_markers = len(re.findall(r'\b(in conclusion|to summarize|it is important|can be seen|it is evident)\b', text, re.I))
+        ai_markers = analysis.count(MARKER_PATTERN)
         score += min(ai_markers * 0.08, 0.25)
         
         return min(score, 1.0)
@@ -12,8 +12,10 @@ urlpatterns = [
     path('reset-password/', auth_views.reset_password, name='reset_password'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('plagiarism/', views.plagiarism_check, name='plagiarism_check'),
+    path('plagiarism/<uuid:check_id>/', views.plagiarism_status, name='plagiarism_status'),
     path('plagiarism-removal/', views.plagiarism_removal, name='plagiarism_removal'),
     path('ai-detection/', views.ai_detection, name='ai_detection'),
+    path('ai-detection/<uuid:detection_id>/', views.ai_detection_status, name='ai_detection_status'),
     path('text-summarization/', views.text_summarization, name='text_summarization'),
     path('sentiment-analysis/', views.sentiment_analysis, name='sentiment_analysis'),
     path('text-statistics/', views.text_statistics, name='text_statistics'),
@@ -4,16 +4,19 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 from django.utils import timezone
+from django.conf import settings
 import json
 from .models import (Document, PlagiarismCheck, AIDetection, URLShortener, QRCode, PlagiarismRemoval,
                     TextSummarization, LanguageTranslation, SentimentAnalysis, KeywordExtraction, TextStatistics, UserProfile)
 from .services import (PlagiarismDetector, AIDetector, URLShortenerService, QRCodeGenerator, PlagiarismRemover,
                       TextSummarizationService, LanguageTranslationService, SentimentAnalysisService,
                       KeywordExtractionService, TextStatisticsService)
-from .document_parser import DocumentParser
+from .extraction_cache import ExtractionCache
 from .decorators import subscription_required
 from .ai_humanizer import AIHumanizer
 from .ultimate_detector import UltimatePlagiarismDetector
+from .shingle_index import ShingleIndex
+from .tasks import enqueue_plagiarism_check, enqueue_ai_detection, spool_upload
 
 @login_required
 def dashboard(request):
@@ -32,9 +35,15 @@ def plagiarism_check(request):
         document = request.FILES.get('document')
         threshold = float(request.POST.get('threshold', 0.7))
         
+        if document and document.size >= settings.STREAMING_CHECK_MIN_SIZE:
+            # Large uploads are checked chunk by chunk in a worker
+            check = PlagiarismCheck.objects.create(text='', threshold=threshold, status='pending', progress=0)
+            enqueue_plagiarism_check(check, engine='streaming', source_path=spool_upload(document))
+            return redirect('plagiarism_status', check_id=check.id)
+        
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'plagiarism_check.html')
@@ -46,54 +55,51 @@ def plagiarism_check(request):
             messages.error(request, 'Please provide text or upload a document')
             return render(request, 'plagiarism_check.html')
         
-        try:
-            detector = UltimatePlagiarismDetector()
-            documents = Document.objects.all()
-            detection_result = detector.detect_all(text, documents)
-            
-            plagiarism_score = detection_result['plagiarism_score'] * 100
-            ai_score = detection_result['ai_score'] * 100
-            overall_risk = detection_result['overall_risk'] * 100
-            
-            results = detection_result['details']['plagiarism'].get('matches', [])
-            for result in results:
-                result['similarity'] = result['similarity'] * 100
-                for key in ['sequence', 'ngram3', 'ngram4', 'word_overlap']:
-                    if key in result:
-                        result[key] = result[key] * 100
-            
-            check = PlagiarismCheck.objects.create(
-                text=text,
-                similarity_score=plagiarism_score,
-                is_plagiarized=plagiarism_score > (threshold * 100),
-                matches=results
-            )
-            
-            return render(request, 'plagiarism_result.html', {
-                'check': check,
-                'results': results,
-                'plagiarism_score': plagiarism_score,
-                'ai_score': ai_score,
-                'overall_risk': overall_risk,
-                'ai_markers': detection_result['details']['ai_markers'],
-                'plagiarism_methods': detection_result['details']['plagiarism_methods'],
-                'threshold': threshold
-            })
-        except Exception as e:
-            messages.error(request, f'Analysis error: {str(e)}')
-            return render(request, 'plagiarism_check.html')
+        check = PlagiarismCheck.objects.create(text=text, threshold=threshold, status='pending', progress=0)
+        enqueue_plagiarism_check(check)
+        return redirect('plagiarism_status', check_id=check.id)
     
     return render(request, 'plagiarism_check.html')
 
+@subscription_required
+def plagiarism_status(request, check_id):
+    check = get_object_or_404(PlagiarismCheck, id=check_id)
+    
+    if check.status == 'failed':
+        messages.error(request, f'Analysis error: {check.error}')
+        return render(request, 'plagiarism_check.html')
+    
+    if check.status != 'completed':
+        return render(request, 'plagiarism_status.html', {'check': check})
+    
+    report = check.report
+    return render(request, 'plagiarism_result.html', {
+        'check': check,
+        'results': check.matches,
+        'plagiarism_score': report.get('plagiarism_score', check.similarity_score),
+        'ai_score': report.get('ai_score', 0),
+        'overall_risk': report.get('overall_risk', check.similarity_score),
+        'ai_markers': report.get('ai_markers', {}),
+        'plagiarism_methods': report.get('plagiarism_methods', {}),
+        'highlighted_text': report.get('highlighted_text', []),
+        'threshold': check.threshold
+    })
+
 @subscription_required
 def ai_detection(request):
     if request.method == 'POST':
         text = request.POST.get('text', '').strip()
         document = request.FILES.get('document')
         
+        if document and document.size >= settings.STREAMING_CHECK_MIN_SIZE:
+            # Large uploads are scored sentence by sentence in a worker
+            detection = AIDetection.objects.create(text='', status='pending', progress=0)
+            enqueue_ai_detection(detection, spool_upload(document))
+            return redirect('ai_detection_status', detection_id=detection.id)
+        
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'ai_detection.html')
@@ -128,6 +134,24 @@ def ai_detection(request):
     
     return render(request, 'ai_detection.html')
 
+@subscription_required
+def ai_detection_status(request, detection_id):
+    detection = get_object_or_404(AIDetection, id=detection_id)
+    
+    if detection.status == 'failed':
+        messages.error(request, f'Analysis error: {detection.error}')
+        return render(request, 'ai_detection.html')
+    
+    if detection.status != 'completed':
+        return render(request, 'ai_detection_status.html', {'detection': detection})
+    
+    return render(request, 'ai_result.html', {
+        'detection': detection,
+        'ai_score': detection.ai_probability,
+        'ai_markers': detection.report.get('ai_markers', {}),
+        'windows': detection.report.get('windows', [])
+    })
+
 @login_required
 def url_shortener(request):
     if request.method == 'POST':
@@ -269,7 +293,7 @@ def plagiarism_removal(request):
         
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'plagiarism_removal.html')
@@ -283,7 +307,7 @@ def plagiarism_removal(request):
         
         try:
             detector = UltimatePlagiarismDetector()
-            documents = Document.objects.all()
+            documents = ShingleIndex().candidate_documents(text)
             
             original_detection = detector.detect_all(text, documents)
             original_plagiarism = original_detection['plagiarism_score'] * 100
@@ -334,7 +358,7 @@ def text_summarization(request):
         
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'text_summarization.html')
@@ -383,7 +407,7 @@ def sentiment_analysis(request):
         
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'sentiment_analysis.html')
@@ -421,7 +445,7 @@ def text_statistics(request):
         
         if document:
             try:
-                text = DocumentParser.extract_text_from_file(document)
+                text = ExtractionCache().extract_text(document)
             except ValueError as e:
                 messages.error(request, f'File Error: {str(e)}')
                 return render(request, 'text_statistics.html')
@@ -0,0 +1,100 @@
+from django.conf import settings
+from .model_registry import get_model
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+# Labels classifiers use for machine-written text; roberta-base-openai-detector calls it "Fake"
+AI_LABELS = ('ai', 'fake', 'machine', 'generated')
+
+
+def ai_label_index(config):
+    """Output index of the machine-written class in a classifier's config"""
+    for index, label in sorted(config.id2label.items()):
+        if str(label).lower() in AI_LABELS:
+            return int(index)
+    return 0
+
+
+class SlidingWindowClassifier:
+    """AI probability of texts longer than the classifier's 512-token context
+    
+    The text is tokenized once by the pipeline's fast tokenizer, which cuts
+    it into windows of `max_length` tokens overlapping by `stride`, with
+    character offsets back into the text. Windows run through the model in
+    padded batches of `batch_size` without gradients, so time and memory grow
+    linearly with the number of windows; beyond `max_windows` an evenly
+    spaced subset is scored. The document probability is the mean of the
+    window probabilities, each weighted by the tokens it adds past the
+    overlap with the window before it.
+    """
+    
+    def __init__(self, name='ai-detector', max_length=512, stride=128, batch_size=None, max_windows=None):
+        self.name = name
+        self.max_length = max_length
+        self.stride = stride
+        self.batch_size = batch_size or settings.AI_WINDOW_BATCH
+        self.max_windows = settings.AI_MAX_WINDOWS if max_windows is None else max_windows
+    
+    def classify(self, text):
+        classifier = get_model(self.name)
+        if classifier is None or not TORCH_AVAILABLE:
+            raise RuntimeError(f'Model {self.name} is not available')
+        tokenizer, model = classifier.tokenizer, classifier.model
+        
+        encoding = tokenizer(text, max_length=self.max_length, stride=self.stride, truncation=True,
+                             padding=True, return_overflowing_tokens=True, return_offsets_mapping=True,
+                             return_tensors='pt')
+        offsets = encoding.pop('offset_mapping').tolist()
+        encoding.pop('overflow_to_sample_mapping', None)
+        rows = self.select(len(offsets))
+        ai_index = ai_label_index(model.config)
+        
+        probabilities = []
+        with torch.no_grad():
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                logits = model(**{key: value[batch] for key, value in encoding.items()}).logits
+                probabilities.extend(torch.softmax(logits, dim=-1)[:, ai_index].tolist())
+        
+        windows = self.windows(rows, offsets, probabilities)
+        total_weight = sum(w['weight'] for w in windows) or 1
+        ai_probability = sum(w['ai_probability'] * w['weight'] for w in windows) / total_weight
+        return {
+            'ai_probability': ai_probability,
+            'max_probability': max([w['ai_probability'] for w in windows], default=0.0),
+            'windows_total': len(offsets),
+            'windows': windows
+        }
+    
+    def windows(self, rows, offsets, probabilities):
+        """Character span and weight of each scored window, from the tokenizer's offsets"""
+        windows = []
+        previous = None
+        for row, probability in zip(rows, probabilities):
+            # Special and padding tokens have empty offsets
+            spans = [(s, e) for s, e in offsets[row] if e > s]
+            if not spans:
+                continue
+            overlap = self.stride if previous is not None and row == previous + 1 else 0
+            windows.append({
+                'index': row,
+                'start': spans[0][0],
+                'end': spans[-1][1],
+                'tokens': len(spans),
+                'weight': max(len(spans) - overlap, 1),
+                'ai_probability': probability
+            })
+            previous = row
+        return windows
+    
+    def select(self, count):
+        """Rows of the windows to score: all of them, or `max_windows` evenly spaced ones"""
+        if not self.max_windows or count <= self.max_windows:
+            return list(range(count))
+        if self.max_windows == 1:
+            return [0]
+        return sorted({round(i * (count - 1) / (self.max_windows - 1)) for i in range(self.max_windows)})
@@ -0,0 +1,158 @@
+from collections import deque, defaultdict
+from django.db import transaction
+from .models import Document, WinnowFingerprint
+
+# Karp-Rabin rolling hash modulus; values fit a signed 64-bit column
+HASH_MODULUS = (1 << 61) - 1
+HASH_BASE = 257
+
+
+class Winnower:
+    """MOSS-style winnowing fingerprints with character offsets into the original text"""
+    
+    def __init__(self, k=25, window=25):
+        self.k = k
+        self.window = window
+        self.min_fingerprints = 2
+        self.merge_gap = 2 * (k + window)
+        self.max_occurrences = 20
+        self.chunk_size = 500
+        self.batch_size = 1000
+    
+    def normalize(self, text):
+        """Lowercased alphanumerics plus the original offset of every kept character"""
+        chars = []
+        offsets = []
+        for i, ch in enumerate(text):
+            if ch.isalnum():
+                chars.append(ch.lower())
+                offsets.append(i)
+        return ''.join(chars), offsets
+    
+    def kgram_hashes(self, normalized):
+        """Rolling hash of every k-gram"""
+        k = self.k
+        if len(normalized) < k:
+            return []
+        
+        high = pow(HASH_BASE, k - 1, HASH_MODULUS)
+        h = 0
+        for ch in normalized[:k]:
+            h = (h * HASH_BASE + ord(ch)) % HASH_MODULUS
+        hashes = [h]
+        for i in range(k, len(normalized)):
+            h = ((h - ord(normalized[i - k]) * high) * HASH_BASE + ord(normalized[i])) % HASH_MODULUS
+            hashes.append(h)
+        return hashes
+    
+    def winnow(self, hashes):
+        """Positions of the rightmost minimal hash in every window"""
+        if not hashes:
+            return []
+        
+        w = min(self.window, len(hashes))
+        selected = []
+        candidates = deque()
+        for i, h in enumerate(hashes):
+            while candidates and hashes[candidates[-1]] >= h:
+                candidates.pop()
+            candidates.append(i)
+            if candidates[0] <= i - w:
+                candidates.popleft()
+            if i >= w - 1 and (not selected or selected[-1] != candidates[0]):
+                selected.append(candidates[0])
+        return selected
+    
+    def fingerprints(self, text):
+        """List of (hash, start, end) with [start, end) offsets in the original text"""
+        normalized, offsets = self.normalize(text)
+        hashes = self.kgram_hashes(normalized)
+        return [(hashes[i], offsets[i], offsets[i + self.k - 1] + 1) for i in self.winnow(hashes)]
+    
+    def index_document(self, document):
+        """(Re)build the stored fingerprints of one document"""
+        rows = [WinnowFingerprint(hash=h, start=start, end=end, document_id=document.pk)
+                for h, start, end in self.fingerprints(document.content or '')]
+        with transaction.atomic():
+            WinnowFingerprint.objects.filter(document_id=document.pk).delete()
+            WinnowFingerprint.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
+    
+    def rebuild(self):
+        """Fingerprint every document; returns (documents, fingerprints)"""
+        documents = 0
+        fingerprints = 0
+        for document in Document.objects.only('id', 'content').iterator():
+            fingerprints += self.index_document(document)
+            documents += 1
+        return documents, fingerprints
+    
+    def shared_passages(self, text, document_ids=None):
+        """Passages of the text copied from stored documents, keyed by document id
+        
+        Each passage holds the character offsets in the text (start, end) and in
+        the source document (source_start, source_end).
+        """
+        pairs = self.fingerprint_hits(self.fingerprints(text), document_ids)
+        return {doc_id: passages for doc_id, passages in
+                ((doc_id, self._merge(matches)) for doc_id, matches in pairs.items()) if passages}
+    
+    def fingerprint_hits(self, fingerprints, document_ids=None):
+        """Stored fingerprints matching the given ones, as (start, end, source_start, source_end) per document"""
+        query = defaultdict(list)
+        for h, start, end in fingerprints:
+            if len(query[h]) < self.max_occurrences:
+                query[h].append((start, end))
+        
+        pairs = defaultdict(list)
+        hashes = list(query)
+        for first in range(0, len(hashes), self.chunk_size):
+            rows = WinnowFingerprint.objects.filter(hash__in=hashes[first:first + self.chunk_size])
+            if document_ids is not None:
+                rows = rows.filter(document_id__in=document_ids)
+            for doc_id, h, source_start, source_end in rows.values_list('document_id', 'hash', 'start', 'end'):
+                for start, end in query[h]:
+                    pairs[doc_id].append((start, end, source_start, source_end))
+        return pairs
+    
+    def segments(self, text, passages):
+        """Split text into plain and copied segments for highlighting"""
+        spans = sorted((p['start'], p['end']) for p in passages)
+        segments = []
+        position = 0
+        for start, end in spans:
+            if end <= position:
+                continue
+            start = max(start, position)
+            if start > position:
+                segments.append({'text': text[position:start], 'copied': False})
+            segments.append({'text': text[start:end], 'copied': True})
+            position = end
+        if position < len(text):
+            segments.append({'text': text[position:], 'copied': False})
+        return segments
+    
+    def _merge(self, matches):
+        """Merge fingerprint hits that are close in both texts into passages"""
+        passages = self.extend_passages([], matches)
+        return [p for p in passages if p['fingerprints'] >= self.min_fingerprints]
+    
+    def extend_passages(self, passages, matches):
+        """Merge hits into an existing passage list, in place
+        
+        Used to build passages incrementally when the text is fingerprinted in
+        consecutive chunks; matches must not start before the earlier ones.
+        Returns the list unfiltered by min_fingerprints.
+        """
+        current = passages[-1] if passages else None
+        for start, end, source_start, source_end in sorted(matches):
+            if (current and start <= current['end'] + self.merge_gap and
+                    current['source_start'] <= source_start <= current['source_end'] + self.merge_gap):
+                current['end'] = max(current['end'], end)
+                current['source_end'] = max(current['source_end'], source_end)
+                current['fingerprints'] += 1
+                continue
+            current = {'start': start, 'end': end, 'source_start': source_start,
+                       'source_end': source_end, 'fingerprints': 1}
+            passages.append(current)
+        return passages
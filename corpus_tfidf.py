@@ -0,0 +1,142 @@
+import os
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+
+class CorpusTfidf:
+    """Corpus-level TF-IDF model stored on disk as a sparse term-frequency matrix
+
+    Terms are hashed, so adding a document never refits a vocabulary: its term
+    counts are queued as a new row and the document frequencies updated; queued
+    rows are stacked onto the matrix in one go when it is next needed. IDF
+    weights (smoothed, as in TfidfVectorizer) are applied at query time, so a
+    query is scored against every document with a sparse matrix-vector product.
+    Each row carries a version string (the document fingerprint), which lets
+    sync() tell a model that only lags behind its table from a stale one.
+    """
+
+    def __init__(self, path='corpus_tfidf.npz', n_features=2**20):
+        self.path = path
+        self.vectorizer = HashingVectorizer(n_features=n_features, stop_words='english', ngram_range=(1, 3),
+                                            alternate_sign=False, norm=None)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.versions = np.zeros(0, dtype=str)
+        self._tf = sparse.csr_matrix((0, n_features), dtype=np.float64)
+        self.df = np.zeros(n_features, dtype=np.float64)
+        self._pending = []
+        self._weights = None
+        # Rows added since the last save
+        self.unsaved = 0
+
+    def __len__(self):
+        return len(self.ids) + len(self._pending)
+
+    @property
+    def tf(self):
+        if self._pending:
+            ids, versions, rows = zip(*self._pending)
+            self.ids = np.concatenate([self.ids, np.array(ids, dtype=np.int64)])
+            self.versions = np.concatenate([self.versions, np.array(versions, dtype=str)])
+            self._tf = sparse.vstack([self._tf] + list(rows), format='csr')
+            self._pending = []
+        return self._tf
+
+    def fit(self, rows):
+        """Build the model from (id, version, content) rows"""
+        rows = list(rows)
+        self.ids = np.array([doc_id for doc_id, _, _ in rows], dtype=np.int64)
+        self.versions = np.array([version or '' for _, version, _ in rows], dtype=str)
+        self._tf = self.vectorizer.transform([content or '' for _, _, content in rows]).tocsr()
+        self.df = np.bincount(self._tf.indices, minlength=self._tf.shape[1]).astype(np.float64)
+        self._pending = []
+        self._weights = None
+        self.unsaved = len(rows)
+        return self
+
+    def add(self, doc_id, content, version=''):
+        """Queue one document as a new row, updating the document frequencies"""
+        row = self.vectorizer.transform([content or '']).tocsr()
+        self._pending.append((doc_id, version or '', row))
+        self.df[row.indices] += 1
+        self._weights = None
+        self.unsaved += 1
+
+    def sync(self, versions, contents):
+        """Bring the model in line with a table of {id: version}
+
+        Rows missing from the model are fetched with contents(ids), an iterable
+        of (id, version, content), and appended. When a row of the model was
+        deleted from the table or changed since, the model is refitted from
+        contents(None). Returns True when anything changed.
+        """
+        self.tf
+        known = dict(zip(self.ids.tolist(), self.versions.tolist()))
+        if any(versions.get(doc_id) != version for doc_id, version in known.items()):
+            self.fit(contents(None))
+            return True
+        missing = [doc_id for doc_id in versions if doc_id not in known]
+        for doc_id, version, content in (contents(missing) if missing else ()):
+            self.add(doc_id, content, version)
+        return bool(missing)
+
+    def idf(self):
+        n = len(self)
+        return np.log((1 + n) / (1 + self.df)) + 1
+
+    def _idf_and_norms(self):
+        if self._weights is None:
+            idf = self.idf()
+            squared = idf ** 2
+            norms = np.sqrt(self.tf.multiply(self.tf) @ squared)
+            self._weights = (idf, squared, norms)
+        return self._weights
+
+    def similarities(self, text):
+        """Cosine similarity of the text to every document, keyed by document id
+
+        Query terms that occur in no document are outside a corpus-fitted
+        vocabulary, so they are dropped rather than weighted with the top idf.
+        """
+        if not len(self):
+            return {}
+
+        idf, squared, norms = self._idf_and_norms()
+        query = self.vectorizer.transform([text]).tocsr()
+        seen = self.df[query.indices] > 0
+        indices, counts = query.indices[seen], query.data[seen]
+        query_norm = np.sqrt(np.sum((counts * idf[indices]) ** 2))
+        if query_norm == 0:
+            return {int(doc_id): 0.0 for doc_id in self.ids}
+
+        weights = np.zeros(self.tf.shape[1])
+        weights[indices] = counts * squared[indices]
+        dots = self.tf @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(norms > 0, dots / (norms * query_norm), 0.0)
+        return dict(zip(self.ids.tolist(), scores.tolist()))
+
+    def save(self):
+        sparse.save_npz(self.path, self.tf)
+        np.savez(self._meta_path(), ids=self.ids, versions=self.versions, df=self.df)
+        self.unsaved = 0
+
+    def load(self):
+        """Load the saved model; returns False when there is none"""
+        if not os.path.exists(self.path) or not os.path.exists(self._meta_path()):
+            return False
+        meta = np.load(self._meta_path())
+        if 'versions' not in meta:
+            return False
+        self._tf = sparse.load_npz(self.path).tocsr()
+        self.ids = meta['ids']
+        self.versions = meta['versions']
+        self.df = meta['df']
+        self._pending = []
+        self._weights = None
+        self.unsaved = 0
+        return True
+
+    def _meta_path(self):
+        root, _ = os.path.splitext(self.path)
+        return root + '_meta.npz'
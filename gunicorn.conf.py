@@ -0,0 +1,12 @@
+# Loaded automatically by gunicorn from the working directory (Procfile, render.yaml)
+import os
+
+# Several request threads per worker let concurrent model calls share one batched forward pass
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def post_worker_init(worker):
+    """Load the models named in MODEL_WARMUP before the worker takes requests"""
+    from analyzer.model_registry import registry
+    for name, error in registry.warm_up().items():
+        worker.log.warning('Model %s failed to load: %s', name, error)
@@ -1,7 +1,7 @@
 import re
 import hashlib
 import sqlite3
-from difflib import SequenceMatcher
+from analyzer.aligner import sequence_similarity
 from collections import Counter
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -12,13 +12,23 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize, sent_tokenize
 import requests
 from bs4 import BeautifulSoup
+from corpus_tfidf import CorpusTfidf
+from analyzer.embedding_index import EmbeddingIndex
 
 class PlagiarismDetector:
     def __init__(self):
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
         self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 3))
+        self.tfidf = CorpusTfidf()
+        # Corpus TF-IDF rows are written to disk in batches; rows lost in a crash are re-added at start-up
+        self.tfidf_save_every = 100
+        # Not the Django app's store (settings.EMBEDDING_INDEX_DIR): each drops keys missing from its own table
+        self.embeddings = EmbeddingIndex('plagiarism_embeddings')
+        self.semantic_top_k = 100
         self.init_database()
         self._download_nltk_data()
+        self._load_tfidf()
+        self._sync_embeddings()
         
     def _download_nltk_data(self):
         try:
@@ -41,6 +51,45 @@ class PlagiarismDetector:
         ''')
         self.conn.commit()
     
+    def _load_tfidf(self):
+        """Load the saved corpus TF-IDF model and bring it up to date with the documents table"""
+        versions = {doc_id: fingerprint or '' for doc_id, fingerprint in
+                    self.conn.execute("SELECT id, fingerprint FROM documents")}
+        if not self.tfidf.load():
+            self.tfidf.fit(self._document_rows())
+        if self.tfidf.sync(versions, self._document_rows) or self.tfidf.unsaved:
+            self.tfidf.save()
+    
+    def _document_rows(self, ids=None):
+        """(id, fingerprint, content) of the given documents, or of every document"""
+        if ids is None:
+            return self.conn.execute("SELECT id, fingerprint, content FROM documents").fetchall()
+        rows = []
+        for first in range(0, len(ids), 500):
+            chunk = ids[first:first + 500]
+            rows += self.conn.execute("SELECT id, fingerprint, content FROM documents WHERE id IN (%s)"
+                                      % ','.join('?' * len(chunk)), chunk).fetchall()
+        return rows
+    
+    def _sync_embeddings(self):
+        """Embed documents that are missing or stale in the embedding store, dropping deleted ones"""
+        rows = self.conn.execute("SELECT id, fingerprint, content FROM documents").fetchall()
+        live = {str(doc_id) for doc_id, _, _ in rows}
+        self.embeddings.remove([key for key in self.embeddings.keys if key not in live])
+        stale = [row for row in rows if not self.embeddings.is_current(row[0], row[1])]
+        for first in range(0, len(stale), 256):
+            batch = stale[first:first + 256]
+            vectors = self.model.encode([content for _, _, content in batch])
+            self.embeddings.add_many(
+                (doc_id, fingerprint, vector) for (doc_id, fingerprint, _), vector in zip(batch, vectors))
+        self.embeddings.train_if_needed()
+    
+    def rebuild_embeddings(self):
+        """Re-embed every document and retrain the ANN index"""
+        self.embeddings.clear()
+        self._sync_embeddings()
+        return self.embeddings.train()
+    
     def preprocess_text(self, text):
         text = re.sub(r'[^\w\s]', '', text.lower())
         tokens = word_tokenize(text)
@@ -77,18 +126,23 @@ class PlagiarismDetector:
             return 0.0
     
     def sequence_similarity(self, text1, text2):
-        return SequenceMatcher(None, text1, text2).ratio()
+        return sequence_similarity(text1, text2)
     
     def detect_plagiarism(self, text, threshold=0.7):
         results = []
         
+        # One sparse product scores the text against the whole corpus
+        tfidf_scores = self.tfidf.similarities(text)
+        # One encode plus an ANN lookup; documents outside the top-k score 0
+        semantic_scores = dict(self.embeddings.search(self.model.encode(text), self.semantic_top_k))
+        
         # Check against database
-        cursor = self.conn.execute("SELECT title, content FROM documents")
-        for title, content in cursor.fetchall():
+        cursor = self.conn.execute("SELECT id, title, content FROM documents")
+        for doc_id, title, content in cursor.fetchall():
             similarities = {
                 'ngram': self.n_gram_similarity(text, content),
-                'semantic': self.semantic_similarity(text, content),
-                'tfidf': self.tfidf_similarity(text, content),
+                'semantic': semantic_scores.get(str(doc_id), 0.0),
+                'tfidf': tfidf_scores.get(doc_id, 0.0),
                 'sequence': self.sequence_similarity(text, content)
             }
             
@@ -145,11 +199,16 @@ class PlagiarismDetector:
     
     def add_document(self, title, content):
         fingerprint = self.generate_fingerprint(content)
-        self.conn.execute(
+        cursor = self.conn.execute(
             "INSERT INTO documents (title, content, fingerprint) VALUES (?, ?, ?)",
             (title, content, fingerprint)
         )
         self.conn.commit()
+        self.tfidf.add(cursor.lastrowid, content, fingerprint)
+        if self.tfidf.unsaved >= self.tfidf_save_every:
+            self.tfidf.save()
+        self.embeddings.add(cursor.lastrowid, fingerprint, self.model.encode(content))
+        self.embeddings.train_if_needed()
     
     def comprehensive_check(self, text):
         """Perform comprehensive plagiarism check"""
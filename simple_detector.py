@@ -1,7 +1,7 @@
 import re
 import hashlib
 import sqlite3
-from difflib import SequenceMatcher
+from analyzer.aligner import sequence_similarity
 from collections import Counter
 import json
 import os
@@ -50,7 +50,7 @@ class SimplePlagiarismDetector:
         return intersection / union if union > 0 else 0.0
     
     def sequence_similarity(self, text1, text2):
-        return SequenceMatcher(None, text1, text2).ratio()
+        return sequence_similarity(text1, text2)
     
     def word_overlap_similarity(self, text1, text2):
         words1 = set(self.preprocess_text(text1).split())
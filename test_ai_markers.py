@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""Parity and speed test for the compiled AI-marker engine"""
+
+import os
+import re
+import sys
+import math
+import time
+import random
+import django
+from collections import Counter
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from analyzer.ai_markers import (marker_engine, FORMAL_TRANSITIONS, HEDGING_WORDS,
+                                 CONCLUSION_MARKERS, RARE_WORDS)
+from analyzer.modern_detector import AI_PATTERNS as MODERN_PATTERNS, AI_PATTERN_COUNTER as MODERN_COUNTER
+from analyzer.ai_detector_improved import AI_PATTERNS as IMPROVED_PATTERNS, AI_PATTERN_COUNTER as IMPROVED_COUNTER
+from analyzer.ai_detector_improved import ImprovedAIDetector
+from analyzer.ai_detector_accurate import AccurateAIDetector
+from analyzer.professional_ai_detector import ProfessionalAIDetector
+from analyzer.ultimate_detector import UltimatePlagiarismDetector
+from analyzer.advanced_hybrid_detector import AdvancedHybridDetector
+from analyzer.ultra_detector import UltraAccuratePlagiarismDetector
+from analyzer.modern_detector import ModernPlagiarismDetector
+from analyzer.services import AIDetector
+from analyzer.ai_ensemble import AIEnsemble
+
+VOCABULARY = (
+    "furthermore moreover additionally consequently therefore thus hence notably enthusiasm thesis "
+    "in addition in conclusion to conclude in summary to summarize ultimately in essence in short "
+    "aforementioned henceforth thenceforth may might could possibly mayor quite seems appears tends "
+    "was were is been being tested it is important to note it should be noted various aspects numerous factors "
+    "the purpose of this can be seen it is evident that in today's world plays a crucial role research shows "
+    "on the other hand in fact indeed In Fact INDEED Thus, dog cat house run_fast x1 , ; : . ! ?"
+).split(' ')
+
+
+def reference_markers(text):
+    """The ten markers as the detectors computed them before the engine: one regex or count per word"""
+    text_lower = text.lower()
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    markers = {}
+    
+    transition_count = sum(text_lower.count(t) for t in FORMAL_TRANSITIONS)
+    markers['formal_transitions'] = min(transition_count / max(len(sentences), 1) * 0.5, 1.0)
+    
+    if len(sentences) > 3:
+        sentence_starts = [s.split()[0] if s.split() else '' for s in sentences]
+        repetition = max(Counter(sentence_starts).values()) / len(sentences)
+        markers['repetitive_structure'] = min(repetition * 0.8, 1.0)
+    else:
+        markers['repetitive_structure'] = 0.0
+    
+    passive_count = len(re.findall(r'\b(is|are|was|were|be|been|being)\s+\w+ed\b', text_lower))
+    markers['passive_voice'] = min(passive_count / max(len(sentences), 1) * 0.6, 1.0)
+    
+    hedging_count = sum(len(re.findall(r'\b' + word + r'\b', text_lower)) for word in HEDGING_WORDS)
+    markers['hedging_language'] = min(hedging_count / max(len(sentences), 1) * 0.4, 1.0)
+    
+    avg_word_length = sum(len(word) for word in text.split()) / max(len(text.split()), 1)
+    avg_sentence_length = len(text.split()) / max(len(sentences), 1)
+    markers['complexity'] = min((avg_word_length / 6.0) * 0.5 + (avg_sentence_length / 20.0) * 0.5, 1.0)
+    
+    words = re.findall(r'\b\w+\b', text_lower)
+    markers['vocabulary_diversity'] = min(len(set(words)) / max(len(words), 1) * 1.5, 1.0)
+    
+    conclusion_count = sum(text_lower.count(m) for m in CONCLUSION_MARKERS)
+    markers['conclusion_markers'] = min(conclusion_count * 0.3, 1.0)
+    
+    if len(sentences) > 1:
+        sentence_lengths = [len(s.split()) for s in sentences]
+        avg_length = sum(sentence_lengths) / len(sentence_lengths)
+        variance = sum((l - avg_length) ** 2 for l in sentence_lengths) / len(sentence_lengths)
+        markers['sentence_length_variance'] = min(math.sqrt(variance) / 10.0, 1.0)
+    else:
+        markers['sentence_length_variance'] = 0.0
+    
+    punctuation_count = len(re.findall(r'[,;:]', text))
+    markers['punctuation_patterns'] = min(punctuation_count / max(len(sentences), 1) * 0.3, 1.0)
+    
+    rare_count = sum(text_lower.count(w) for w in RARE_WORDS)
+    markers['rare_word_usage'] = min(rare_count * 0.2, 1.0)
+    return markers
+
+
+def reference_pattern_counts(patterns, text):
+    return {pattern: len(re.findall(pattern, text, re.IGNORECASE)) for pattern in patterns}
+
+
+def generate_text(length, seed=1):
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def test_marker_parity():
+    """The engine and pattern counters give exactly the former results"""
+    print("=" * 80)
+    print("AI MARKER PARITY")
+    print("=" * 80)
+    
+    texts = ['', 'Thus.', 'henceforthenceforth thenceforth', 'Maybe it may be. In short, shortly.']
+    texts += [generate_text(random.Random(seed).randint(0, 3000), seed) for seed in range(200)]
+    for text in texts:
+        assert marker_engine.analyze(text) == reference_markers(text), text[:200]
+        assert MODERN_COUNTER.count(text) == reference_pattern_counts(MODERN_PATTERNS, text), text[:200]
+        assert IMPROVED_COUNTER.count(text) == reference_pattern_counts(IMPROVED_PATTERNS, text), text[:200]
+    print(f"\n{len(texts)} texts: identical markers and pattern counts")
+
+
+def test_marker_speed():
+    """Time the engine against the per-call regex scans on 100KB of text"""
+    print("\n" + "=" * 80)
+    print("AI MARKER SPEED (100KB)")
+    print("=" * 80)
+    
+    text = generate_text(100_000)
+    cases = [
+        ('markers', reference_markers, marker_engine.analyze),
+        ('modern patterns', lambda t: reference_pattern_counts(MODERN_PATTERNS, t), MODERN_COUNTER.count),
+        ('improved patterns', lambda t: reference_pattern_counts(IMPROVED_PATTERNS, t), IMPROVED_COUNTER.count),
+    ]
+    for name, reference, compiled in cases:
+        assert compiled(text) == reference(text)
+        timings = []
+        for fn in (reference, compiled):
+            start = time.perf_counter()
+            for _ in range(5):
+                fn(text)
+            timings.append((time.perf_counter() - start) / 5 * 1000)
+        print(f"\n{name}: per-call regex {timings[0]:.1f} ms, compiled {timings[1]:.1f} ms, "
+              f"{timings[0] / timings[1]:.2f}x")
+
+
+def test_ensemble_parity():
+    """Each ensemble score equals the detector run on its own"""
+    print("\n" + "=" * 80)
+    print("AI ENSEMBLE PARITY")
+    print("=" * 80)
+    
+    ensemble = AIEnsemble()
+    standalone = {
+        'ultimate': UltimatePlagiarismDetector()._detect_ai_content,
+        'advanced_hybrid': AdvancedHybridDetector()._detect_ai_content,
+        'professional': ProfessionalAIDetector().detect_ai_content,
+        'accurate': AccurateAIDetector().detect_ai_content,
+        'improved': lambda t: ImprovedAIDetector().detect_ai_content(t)['ai_probability'],
+        'heuristic': lambda t: AIDetector.__new__(AIDetector)._heuristic_detection(t)['ai_probability'],
+        'modern': lambda t: ModernPlagiarismDetector.__new__(ModernPlagiarismDetector)._detect_ai_patterns(t),
+        'ultra': UltraAccuratePlagiarismDetector()._analyze_text_patterns,
+    }
+    for seed in range(50):
+        text = generate_text(random.Random(seed).randint(0, 3000), seed)
+        result = ensemble.detect(text)
+        for name, detect in standalone.items():
+            assert result['detectors'][name]['score'] == detect(text), (name, text[:200])
+    
+    text = generate_text(100_000)
+    start = time.perf_counter()
+    ensemble.detect(text)
+    ensemble_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for detect in standalone.values():
+        detect(text)
+    separate_ms = (time.perf_counter() - start) * 1000
+    print(f"\n{len(standalone)} detectors on 100KB: separately {separate_ms:.1f} ms, ensemble {ensemble_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    test_marker_parity()
+    test_marker_speed()
+    test_ensemble_parity()
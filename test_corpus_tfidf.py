@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Tests for the incremental corpus TF-IDF model behind plagiarism_detector.py"""
+
+import os
+import sys
+import random
+import tempfile
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus_tfidf import CorpusTfidf
+
+WORDS = ("neural network training data model learning results method analysis study sample "
+         "value error test paper approach system input output cooking recipe garden river").split()
+
+
+def random_corpus(rng, size):
+    return [(pk, f'v{pk}', ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 60))))
+            for pk in range(1, size + 1)]
+
+
+def reference_scores(rows, query):
+    """Cosine similarities from a TfidfVectorizer fitted on the corpus"""
+    vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 3))
+    matrix = vectorizer.fit_transform([content for _, _, content in rows])
+    return cosine_similarity(vectorizer.transform([query]), matrix)[0]
+
+
+def test_tfidf_parity():
+    """Scores match a corpus-fitted TfidfVectorizer, also for queries with unseen terms"""
+    print("=" * 80)
+    print("CORPUS TF-IDF PARITY")
+    print("=" * 80)
+    
+    rng = random.Random(3)
+    rows = random_corpus(rng, 40)
+    model = CorpusTfidf(path=os.path.join(tempfile.mkdtemp(), 'tfidf.npz')).fit(rows)
+    queries = [rows[0][2], rows[5][2] + ' zebra quantum xylophone', 'entirely unseen vocabulary here',
+               ' '.join(rng.choice(WORDS) for _ in range(30))]
+    for query in queries:
+        scores = model.similarities(query)
+        expected = reference_scores(rows, query)
+        difference = max(abs(scores[pk] - want) for (pk, _, _), want in zip(rows, expected))
+        assert difference < 1e-9, (query, difference)
+    print(f"\n{len(queries)} queries: scores match TfidfVectorizer, unseen terms dropped")
+
+
+def test_incremental_add():
+    """Documents added one by one give the model a single fit would, saved and loaded"""
+    print("\n" + "=" * 80)
+    print("CORPUS TF-IDF INCREMENTAL ADD")
+    print("=" * 80)
+    
+    rng = random.Random(5)
+    rows = random_corpus(rng, 30)
+    path = os.path.join(tempfile.mkdtemp(), 'tfidf.npz')
+    fitted = CorpusTfidf(path=path + '.fit').fit(rows)
+    model = CorpusTfidf(path=path).fit(rows[:10])
+    for pk, version, content in rows[10:]:
+        model.add(pk, content, version)
+    assert len(model) == len(rows) and model.unsaved == len(rows)
+    query = rows[12][2]
+    assert model.similarities(query) == fitted.similarities(query)
+    
+    model.save()
+    assert model.unsaved == 0
+    loaded = CorpusTfidf(path=path)
+    assert loaded.load()
+    assert loaded.similarities(query) == fitted.similarities(query)
+    assert loaded.versions.tolist() == [version for _, version, _ in rows]
+    print(f"\n{len(rows) - 10} queued rows: identical to a single fit after save and load")
+
+
+def test_sync():
+    """sync() appends missing rows and refits when a known row was changed or deleted"""
+    print("\n" + "=" * 80)
+    print("CORPUS TF-IDF SYNC")
+    print("=" * 80)
+    
+    rng = random.Random(9)
+    rows = random_corpus(rng, 20)
+    table = {pk: (version, content) for pk, version, content in rows}
+    requested = []
+    
+    def contents(ids):
+        requested.append(ids)
+        return [(pk, table[pk][0], table[pk][1]) for pk in (sorted(table) if ids is None else ids)]
+    
+    def versions():
+        return {pk: version for pk, (version, _) in table.items()}
+    
+    model = CorpusTfidf(path=os.path.join(tempfile.mkdtemp(), 'tfidf.npz')).fit(rows[:15])
+    assert model.sync(versions(), contents)
+    assert requested == [[16, 17, 18, 19, 20]]
+    assert not model.sync(versions(), contents)
+    
+    table[3] = ('changed', 'cooking recipe garden river')
+    del table[7]
+    assert model.sync(versions(), contents)
+    assert requested[-1] is None
+    assert sorted(model.ids.tolist()) == sorted(table)
+    query = 'cooking recipe garden'
+    expected = CorpusTfidf(path=model.path).fit(contents(None)).similarities(query)
+    assert model.similarities(query) == expected
+    assert 7 not in model.similarities(query)
+    print("\nMissing rows appended; changed and deleted rows trigger a refit")
+
+
+if __name__ == '__main__':
+    test_tfidf_parity()
+    test_incremental_add()
+    test_sync()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Tests for the upload extraction cache"""
+
+import os
+import sys
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from analyzer import extraction_cache
+from analyzer.extraction_cache import ExtractionCache
+from analyzer.models import ExtractedText
+from analyzer.tool_validator import ToolValidator
+
+
+class CountingCache(ExtractionCache):
+    """Counts parses; PDFs are 'parsed' as their bytes plus the page limit, so no PDF library is needed"""
+    
+    parses = 0
+    
+    def _parse(self, file, sha256, file_type):
+        CountingCache.parses += 1
+        if file_type != '.pdf':
+            return super()._parse(file, sha256, file_type)
+        file.seek(0)
+        text = f'{file.read().decode()} (first {settings.PDF_MAX_PAGES or "all"} pages)'
+        return ExtractedText(sha256=sha256, file_type=file_type, text=text, pages=[0], size=len(text))
+
+
+def upload(name, text):
+    return SimpleUploadedFile(name, text.encode())
+
+
+def test_extraction_cache():
+    """Hits skip parsing, the PDF page limit is part of the key, eviction rarely sums the table"""
+    print("=" * 80)
+    print("EXTRACTION CACHE")
+    print("=" * 80)
+    
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    call_command('flush', interactive=False, verbosity=0)
+    extraction_cache._stored.update(bytes=None, calls=0)
+    try:
+        cache = CountingCache()
+        text = 'The quick brown fox jumps over the lazy dog. ' * 20
+        assert cache.extract_text(upload('a.txt', text)) == text.strip()
+        assert cache.extract_text(upload('renamed.txt', text)) == text.strip()
+        assert CountingCache.parses == 1
+        assert ExtractedText.objects.get().hits == 1
+        
+        # The page limit changes the text, so it is part of the key
+        with override_settings(PDF_MAX_PAGES=2):
+            first_two = cache.extract_text(upload('report.pdf', 'report body'))
+            assert cache.extract_text(upload('report.pdf', 'report body')) == first_two
+        with override_settings(PDF_MAX_PAGES=None):
+            every_page = cache.extract_text(upload('report.pdf', 'report body'))
+        assert first_two != every_page and CountingCache.parses == 3
+        assert sorted(ExtractedText.objects.filter(file_type='.pdf').values_list('max_pages', flat=True)) == [0, 2]
+        
+        # The validator goes through the cache too: same bytes, another hit
+        assert ToolValidator.validate_document_parser(upload('b.txt', text))['text_length'] == len(text.strip())
+        assert ExtractedText.objects.get(file_type='.txt').hits == 2
+        
+        cache = CountingCache(max_bytes=5000)
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(40):
+                cache.extract_text(upload(f'{i}.txt', f'document {i} ' * 30))
+        sums = [q for q in queries.captured_queries if 'SUM(' in q['sql'].upper()]
+        stored = sum(ExtractedText.objects.values_list('size', flat=True))
+        assert stored <= 5000 and ExtractedText.objects.count() < 43
+        assert len(sums) <= 1
+        assert extraction_cache._stored['bytes'] == stored
+        print(f"\nHits skip parsing, PDF entries keyed by page limit; 40 misses summed the table {len(sums)} time(s), "
+              f"{stored} bytes kept")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    test_extraction_cache()
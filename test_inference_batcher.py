@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Tests for the micro-batcher that coalesces concurrent model calls (analyzer.inference_batcher)"""
+
+import os
+import sys
+import time
+import threading
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from concurrent.futures import TimeoutError
+from analyzer.inference_batcher import MicroBatcher
+from analyzer.model_registry import registry
+
+
+class StubModel:
+    """Stands in for a text-classification pipeline and records each forward pass"""
+    
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.batches = []
+    
+    def __call__(self, values, batch_size=None, **kwargs):
+        self.batches.append((list(values), kwargs))
+        time.sleep(self.delay)
+        if 'boom' in values:
+            raise ValueError('bad input')
+        if 'short' in values and len(values) == 1:
+            return []
+        return [{'label': value.upper(), 'score': len(value), **kwargs} for value in values]
+
+
+def run_concurrently(batcher, calls):
+    """Start all calls at once; each gives (result, None) or (None, exception)"""
+    results = [None] * len(calls)
+    start = threading.Barrier(len(calls))
+    
+    def call(i, value, kwargs):
+        start.wait()
+        try:
+            results[i] = (batcher(value, **kwargs), None)
+        except Exception as e:
+            results[i] = (None, e)
+    
+    threads = [threading.Thread(target=call, args=(i, value, kwargs)) for i, (value, kwargs) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def stub_batcher(model, **options):
+    registry.unload('batcher-test')
+    registry.register('batcher-test', lambda: model)
+    return MicroBatcher('batcher-test', **options)
+
+
+def test_coalescing():
+    """Concurrent calls share a forward pass; calls with other kwargs are batched separately"""
+    print("=" * 80)
+    print("MICRO-BATCHER COALESCING")
+    print("=" * 80)
+    
+    model = StubModel()
+    batcher = stub_batcher(model, max_batch_size=16, max_latency=0.2)
+    calls = [(f'text{i}', {}) for i in range(6)] + [(f'long{i}', {'truncation': True}) for i in range(3)]
+    results = run_concurrently(batcher, calls)
+    
+    for (value, kwargs), (result, error) in zip(calls, results):
+        assert error is None, error
+        assert result == [{'label': value.upper(), 'score': len(value), **kwargs}]
+    assert len(model.batches) == 2, model.batches
+    sizes = sorted((len(values), kwargs.get('truncation', False)) for values, kwargs in model.batches)
+    assert sizes == [(3, True), (6, False)]
+    registry.unload('batcher-test')
+    print(f"\n{len(calls)} calls in {len(model.batches)} forward passes, one per kwargs group")
+
+
+def test_error_isolation():
+    """A bad input fails only its own caller; a short output and a timeout are errors"""
+    print("\n" + "=" * 80)
+    print("MICRO-BATCHER ERRORS")
+    print("=" * 80)
+    
+    model = StubModel()
+    batcher = stub_batcher(model, max_batch_size=16, max_latency=0.2)
+    calls = [('fine', {}), ('boom', {}), ('short', {}), ('also fine', {})]
+    results = dict(zip((value for value, _ in calls), run_concurrently(batcher, calls)))
+    
+    assert results['fine'] == ([{'label': 'FINE', 'score': 4}], None)
+    assert results['also fine'][0] == [{'label': 'ALSO FINE', 'score': 9}]
+    assert isinstance(results['boom'][1], ValueError)
+    assert isinstance(results['short'][1], RuntimeError) and '0 outputs for 1' in str(results['short'][1])
+    assert len(model.batches[0][0]) == 4 and all(len(values) == 1 for values, _ in model.batches[1:])
+    print("\nFailed batch retried call by call: errors reach only the callers that caused them")
+    
+    slow = stub_batcher(StubModel(delay=0.5), max_latency=0, timeout=0.05)
+    try:
+        slow('waiting')
+        assert False, 'expected a timeout'
+    except TimeoutError:
+        pass
+    registry.unload('batcher-test')
+    print("Call slower than the timeout raises TimeoutError")
+
+
+if __name__ == '__main__':
+    test_coalescing()
+    test_error_isolation()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""Parity and latency of the ONNX / int8 CPU backends against the transformers pipelines"""
+
+import os
+import sys
+import time
+import tempfile
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from django.test.utils import override_settings
+from analyzer.optimized_models import (TRANSFORMERS_AVAILABLE, ONNX_AVAILABLE, EXPORTABLE_MODELS,
+                                       BACKEND_FILES, _quantize, artifact_path, export_model, load_optimized)
+from analyzer.model_registry import ModelRegistry, registry
+from analyzer.windowed_inference import SlidingWindowClassifier
+
+SAMPLE_TEXTS = [
+    "I absolutely loved this movie, the acting was wonderful.",
+    "The service was slow and the food arrived cold. Never again.",
+    "Furthermore, it is important to note that the aforementioned factors play a crucial role in "
+    "shaping outcomes. In conclusion, a comprehensive approach is essential.",
+    "lol we missed the bus again so just walked, honestly kind of nice out",
+    "The quarterly report shows revenue growth of 12 percent, driven mainly by the new product line.",
+    "Meh.",
+    "This paper presents a novel framework for evaluating the robustness of neural networks. " * 40,
+]
+# Largest difference allowed between a backend's probability and the pipeline's
+TOLERANCES = {'onnx': 1e-3, 'onnx-int8': 0.1, 'torch-int8': 0.1}
+
+
+def backends():
+    """Backends this environment can run, exporting any artifact that is missing (downloads the model)"""
+    if not TRANSFORMERS_AVAILABLE:
+        return []
+    names = [b for b in BACKEND_FILES if ONNX_AVAILABLE or not b.startswith('onnx')]
+    for name in EXPORTABLE_MODELS:
+        for backend in names:
+            if not os.path.exists(artifact_path(name, backend)):
+                export_model(name, backend)
+    return names
+
+
+def reference_pipeline(name):
+    from transformers import pipeline
+    return pipeline(*EXPORTABLE_MODELS[name])
+
+
+def probability(result, label):
+    """Probability of `label` from a binary classifier's top result"""
+    return result['score'] if result['label'] == label else 1 - result['score']
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def test_backend_parity():
+    """Every backend labels the samples like the pipeline, within its tolerance"""
+    print("=" * 80)
+    print("MODEL BACKEND PARITY")
+    print("=" * 80)
+    
+    available = backends()
+    if not available:
+        print("\ntransformers/torch not installed, skipped")
+        return
+    
+    for name in EXPORTABLE_MODELS:
+        reference = reference_pipeline(name)
+        expected = reference(SAMPLE_TEXTS, batch_size=4, truncation=True)
+        for backend in available:
+            classifier = load_optimized(name, backend)
+            results = classifier(SAMPLE_TEXTS, batch_size=4, truncation=True)
+            difference = max(abs(probability(result, want['label']) - want['score'])
+                             for result, want in zip(results, expected))
+            assert difference <= TOLERANCES[backend], (name, backend, difference)
+            for result, want in zip(results, expected):
+                # int8 may flip a label the pipeline was itself unsure of
+                assert result['label'] == want['label'] or want['score'] < 0.5 + TOLERANCES[backend], (name, backend)
+            print(f"\n{name} / {backend}: max probability difference {difference:.5f}")
+    
+    # Long texts go through the windowed classifier, which uses the backend's tokenizer and model
+    text = SAMPLE_TEXTS[-1] * 3
+    loaders = {'pipeline': lambda: reference_pipeline('ai-detector')}
+    loaders.update({backend: lambda b=backend: load_optimized('ai-detector', b) for backend in available})
+    scores = {}
+    for backend, loader in loaders.items():
+        registry.unload('ai-detector-test')
+        registry.register('ai-detector-test', loader)
+        scores[backend] = SlidingWindowClassifier(name='ai-detector-test').classify(text)['ai_probability']
+    for backend in available:
+        assert abs(scores[backend] - scores['pipeline']) <= TOLERANCES[backend], (backend, scores)
+        print(f"\nwindowed ai-detector / {backend}: {scores[backend]:.4f} (pipeline {scores['pipeline']:.4f})")
+    registry.unload('ai-detector-test')
+
+
+def tiny_model(directory):
+    """A two-layer BERT classifier and a vocabulary of the sample words, built and saved without downloads"""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizer
+    words = sorted({word.strip('.,').lower() for text in SAMPLE_TEXTS for word in text.split()})
+    vocab = os.path.join(directory, 'vocab.txt')
+    with open(vocab, 'w') as f:
+        f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words) + '\n')
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(words) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, id2label={0: 'NEGATIVE', 1: 'POSITIVE'},
+                        label2id={'NEGATIVE': 0, 'POSITIVE': 1})
+    BertForSequenceClassification(config).eval().save_pretrained(directory)
+    BertTokenizer(vocab).save_pretrained(directory)
+
+
+def test_export_round_trip():
+    """A locally built model exported to each backend loads back and scores like the model it came from"""
+    print("\n" + "=" * 80)
+    print("MODEL EXPORT ROUND TRIP")
+    print("=" * 80)
+    
+    if not TRANSFORMERS_AVAILABLE:
+        print("\ntransformers/torch not installed, skipped")
+        return
+    
+    from transformers import AutoModelForSequenceClassification, pipeline
+    source = tempfile.mkdtemp()
+    tiny_model(source)
+    task = EXPORTABLE_MODELS['sentiment'][0]
+    reference = pipeline(task, model=source)
+    quantized = pipeline(task, model=_quantize(AutoModelForSequenceClassification.from_pretrained(source).eval()),
+                         tokenizer=source)
+    
+    with override_settings(MODEL_ARTIFACT_DIR=tempfile.mkdtemp()):
+        for backend in BACKEND_FILES:
+            if backend.startswith('onnx') and not ONNX_AVAILABLE:
+                continue
+            path = export_model('sentiment', backend, source=source)
+            assert path == artifact_path('sentiment', backend) and os.path.exists(path)
+            classifier = load_optimized('sentiment', backend)
+            results = classifier(SAMPLE_TEXTS, batch_size=4, truncation=True)
+            # torch-int8 reloads the very weights quantized in memory; ONNX is compared with the float model
+            expected = (quantized if backend == 'torch-int8' else reference)(SAMPLE_TEXTS, batch_size=4, truncation=True)
+            tolerance = 1e-5 if backend == 'torch-int8' else TOLERANCES[backend]
+            difference = max(abs(probability(result, want['label']) - want['score'])
+                             for result, want in zip(results, expected))
+            assert difference <= tolerance, (backend, difference)
+            print(f"\n{backend}: exported to {os.path.basename(path)}, max probability difference {difference:.6f}")
+
+
+def test_registry_retry():
+    """A failed load gives None and its error, and is retried once retry_seconds have passed"""
+    print("\n" + "=" * 80)
+    print("MODEL REGISTRY FAILED LOADS")
+    print("=" * 80)
+    
+    attempts = []
+    
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('weights unavailable')
+        return 'model'
+    
+    models = ModelRegistry(loaders={'flaky': loader}, memory_budget=0, retry_seconds=3600)
+    assert models.warm_up(['flaky']) == {'flaky': 'weights unavailable'}
+    assert models.get('flaky') is None and len(attempts) == 1
+    models.retry_seconds = 0
+    assert models.get('flaky') == 'model' and len(attempts) == 2
+    assert models.error('flaky') == '' and models.warm_up(['flaky']) == {}
+    assert len(attempts) == 2
+    print("\nFailure cached within retry_seconds, reported by warm_up, retried after")
+
+
+def test_backend_latency():
+    """Time one text and a batch of 16 on each backend against the pipeline"""
+    print("\n" + "=" * 80)
+    print("MODEL BACKEND LATENCY (CPU)")
+    print("=" * 80)
+    
+    available = backends()
+    if not available:
+        print("\ntransformers/torch not installed, skipped")
+        return
+    
+    batch = (SAMPLE_TEXTS[:6] * 3)[:16]
+    for name in EXPORTABLE_MODELS:
+        classifiers = [('pipeline', reference_pipeline(name))]
+        classifiers += [(backend, load_optimized(name, backend)) for backend in available]
+        baseline = None
+        print(f"\n{name}:")
+        for backend, classifier in classifiers:
+            classifier(SAMPLE_TEXTS[0])
+            single = timed(lambda: classifier(SAMPLE_TEXTS[2], truncation=True), 20)
+            batched = timed(lambda: classifier(batch, batch_size=16, truncation=True), 5)
+            baseline = baseline or (single, batched)
+            size = os.path.getsize(artifact_path(name, backend)) / 2 ** 20 if backend in BACKEND_FILES else 0
+            print(f"  {backend:<11} 1 text {single:7.1f} ms ({baseline[0] / single:.2f}x), "
+                  f"16 texts {batched:7.1f} ms ({baseline[1] / batched:.2f}x)"
+                  + (f", artifact {size:.0f} MB" if size else ""))
+
+
+if __name__ == '__main__':
+    test_backend_parity()
+    test_export_round_trip()
+    test_registry_retry()
+    test_backend_latency()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""Tests for tiled OCR (analyzer.ocr) with a stub in place of pytesseract.image_to_string"""
+
+import io
+import os
+import sys
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from analyzer import document_parser, ocr
+from analyzer.document_parser import DocumentParser
+from analyzer.ocr import OcrPipeline, _ocr_tile, otsu_threshold
+
+try:
+    from PIL import Image, ImageDraw
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Lines of the test pages are black bars; line i is 10 + 7 * i pixels wide
+BAR_HEIGHT, LINE_SPACING = 30, 60
+
+
+def draw_page(lines, width=400, ink=0, paper=255, mode='L'):
+    """A page of `lines` bars, one every LINE_SPACING rows"""
+    image = Image.new('L', (width, LINE_SPACING * lines + BAR_HEIGHT), paper)
+    draw = ImageDraw.Draw(image)
+    for i in range(lines):
+        top = LINE_SPACING * i + BAR_HEIGHT // 2
+        draw.rectangle((0, top, 10 + 7 * i - 1, top + BAR_HEIGHT - 1), fill=ink)
+    return image.convert(mode)
+
+
+def read_bars(tile, config=''):
+    """Stands in for image_to_string: each run of inked rows is read as the line its ink width encodes"""
+    rows = tile.resize((1, tile.height), Image.BOX).getdata()
+    lines = []
+    inside = False
+    for mean in rows:
+        ink = round((255 - mean) * tile.width / 255)
+        if ink and not inside:
+            lines.append(f'line {round((ink - 10) / 7)}')
+        inside = bool(ink)
+    return '\n'.join(lines) + '\n'
+
+
+def expected_text(lines):
+    return '\n'.join(f'line {i}' for i in range(lines))
+
+
+class StubTesseract:
+    """pytesseract with image_to_string replaced by read_bars; records the config of each call"""
+    
+    def __init__(self):
+        self.configs = []
+    
+    def image_to_string(self, tile, config=''):
+        self.configs.append(config)
+        return read_bars(tile, config)
+
+
+def install_stub():
+    original = getattr(ocr, 'pytesseract', None)
+    stub = StubTesseract()
+    ocr.pytesseract = stub
+    return stub, original
+
+
+def restore(original):
+    if original is None:
+        del ocr.pytesseract
+    else:
+        ocr.pytesseract = original
+
+
+def test_otsu_threshold():
+    """The threshold falls between the ink and paper peaks; binarising maps them to 0 and 255"""
+    print("=" * 80)
+    print("OTSU THRESHOLD")
+    print("=" * 80)
+    
+    histogram = [0] * 256
+    for level in range(30, 51):
+        histogram[level] = 100 - abs(level - 40) * 5
+    for level in range(185, 216):
+        histogram[level] = 400 - abs(level - 200) * 10
+    threshold = otsu_threshold(histogram)
+    assert 50 <= threshold < 185, threshold
+    assert otsu_threshold([0] * 90 + [1000] + [0] * 165) == 127
+    two_levels = [0] * 256
+    two_levels[90], two_levels[160] = 500, 1500
+    assert otsu_threshold(two_levels) == 90
+    print(f"\nPeaks at 40 and 200: threshold {threshold}; one grey level: 127; levels 90 and 160: 90")
+    
+    if not PIL_AVAILABLE:
+        print("Pillow not installed, skipped")
+        return
+    
+    # Grey ink on grey paper, in colour, with more pixels than max_side allows
+    image = draw_page(10, ink=90, paper=160, mode='RGB')
+    binary = OcrPipeline(max_side=300).preprocess(image)
+    assert binary.mode == 'L' and max(binary.size) == 300
+    assert set(binary.getdata()) == {0, 255}
+    assert OcrPipeline(max_side=4000).preprocess(image).size == image.size
+    print(f"{image.size[0]}x{image.size[1]} RGB page of grey 90 on 160: {binary.size[0]}x{binary.size[1]} of 0 and 255")
+
+
+def test_bands():
+    """Tall pages are cut into bands at blank rows near every tile_height rows"""
+    print("\n" + "=" * 80)
+    print("OCR BANDS")
+    print("=" * 80)
+    
+    if not PIL_AVAILABLE:
+        print("\nPillow not installed, skipped")
+        return
+    
+    # Every 620th row is inside a bar, so each cut has to move
+    pipeline = OcrPipeline(max_side=4000, tile_height=620)
+    search = int(pipeline.tile_height * pipeline.cut_search)
+    assert len(pipeline.tiles(pipeline.preprocess(draw_page(12)))) == 1
+    
+    page = pipeline.preprocess(draw_page(50))
+    rows = list(page.resize((1, page.height), Image.BOX).getdata())
+    tiles = pipeline.tiles(page)
+    assert len(tiles) > 1 and sum(tile.height for tile in tiles) == page.height
+    top = 0
+    for tile in tiles[:-1]:
+        assert abs(tile.height - pipeline.tile_height) <= search
+        top += tile.height
+        assert rows[top] == 255, top
+    assert tiles[-1].height <= pipeline.tile_height + search
+    print(f"\n{page.height} rows in {len(tiles)} bands of {[tile.height for tile in tiles]} rows, each cut on a blank row")
+
+
+def test_recognize():
+    """Bands are read as blocks and stitched top to bottom; a single band keeps automatic segmentation"""
+    print("\n" + "=" * 80)
+    print("OCR RECOGNIZE")
+    print("=" * 80)
+    
+    if not PIL_AVAILABLE:
+        print("\nPillow not installed, skipped")
+        return
+    
+    stub, original = install_stub()
+    try:
+        pipeline = OcrPipeline(workers=1, max_side=4000, tile_height=620)
+        assert pipeline.recognize(draw_page(50)) == expected_text(50)
+        assert len(stub.configs) > 1 and set(stub.configs) == {pipeline.band_config}
+        
+        stub.configs.clear()
+        assert pipeline.recognize(draw_page(5)) == expected_text(5)
+        assert stub.configs == [pipeline.config]
+        
+        # Blank bands add no empty lines
+        blank = Image.new('L', (400, 1500), 255)
+        blank.paste(draw_page(5), (0, 1000))
+        assert pipeline.recognize(blank) == expected_text(5)
+    finally:
+        restore(original)
+    print("\n50 lines read band by band in order, 5 lines read whole, blank bands dropped")
+    
+    # Through the pool the workers read the bands, so the stub is the tile reader itself
+    ocr._ocr_tile = read_bars
+    try:
+        assert OcrPipeline(workers=2, max_side=4000, tile_height=620).recognize(draw_page(50)) == expected_text(50)
+    finally:
+        ocr._ocr_tile = _ocr_tile
+    print("50 lines read in the process pool: same text")
+
+
+def test_frames():
+    """Every frame of a multi-page TIFF is read, in order, whatever its mode"""
+    print("\n" + "=" * 80)
+    print("OCR FRAMES")
+    print("=" * 80)
+    
+    if not PIL_AVAILABLE:
+        print("\nPillow not installed, skipped")
+        return
+    
+    frames = [draw_page(3, mode='RGB'), draw_page(14), draw_page(7, mode='1')]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format='TIFF', save_all=True, append_images=frames[1:])
+    
+    stub, original = install_stub()
+    try:
+        buffer.seek(0)
+        pages = list(OcrPipeline(workers=1, max_side=4000).pages(buffer))
+        assert pages == [expected_text(3), expected_text(14), expected_text(7)]
+        
+        available = document_parser.OCR_AVAILABLE
+        document_parser.OCR_AVAILABLE = True
+        try:
+            upload = SimpleUploadedFile('scan.tiff', buffer.getvalue())
+            text = DocumentParser.extract_text_from_file(upload)
+            assert text == '\n'.join(pages), text
+            
+            try:
+                DocumentParser.extract_text_from_file(SimpleUploadedFile('blank.png', b'not an image'))
+                assert False, 'expected ValueError'
+            except ValueError as e:
+                assert 'Image extraction failed' in str(e)
+        finally:
+            document_parser.OCR_AVAILABLE = available
+    finally:
+        restore(original)
+    print(f"\n{len(frames)}-frame TIFF: {len(pages)} pages in frame order, through DocumentParser as well")
+
+
+if __name__ == '__main__':
+    test_otsu_threshold()
+    test_bands()
+    test_recognize()
+    test_frames()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""Tests for page-by-page PDF extraction (analyzer.pdf_extraction) on PDFs built in the test"""
+
+import io
+import os
+import sys
+import tempfile
+import subprocess
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from concurrent.futures.process import BrokenProcessPool
+from analyzer import document_parser, pdf_extraction
+from analyzer.document_parser import DocumentParser
+from analyzer.pdf_extraction import PDF_AVAILABLE, PdfExtractor, _extract_pages
+
+
+def make_pdf(texts):
+    """An in-memory PDF upload with one line of Helvetica text per page"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in texts:
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(texts)} >>'
+    
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n{body}\nendobj\n'.encode()
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    pdf += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return io.BytesIO(pdf)
+
+
+def page_texts(count):
+    return [f'Page {number} of the test document' for number in range(1, count + 1)]
+
+
+def write_pdf(texts):
+    path = os.path.join(tempfile.mkdtemp(), 'test.pdf')
+    with open(path, 'wb') as f:
+        f.write(make_pdf(texts).getvalue())
+    return path
+
+
+def crash_once(source, start, end):
+    """Kill the worker the first time any worker extracts from this path"""
+    marker = source + '.crashed'
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return _extract_pages(source, start, end)
+
+
+def crash(source, start, end):
+    os._exit(1)
+
+
+def stub_poppler(extractor, texts):
+    """Answer pdfinfo and pdftotext for a PDF of these page texts; returns the commands run"""
+    commands = []
+    
+    def run(args, source, output=()):
+        commands.append(args)
+        if args[0] == 'pdfinfo':
+            stdout = f'Producer:       test\nPages:          {len(texts)}\n'
+        else:
+            first, last = int(args[2]), int(args[4])
+            stdout = ''.join(text + '\n\f' for text in texts[first - 1:last])
+        return subprocess.CompletedProcess(args, 0, stdout.encode())
+    
+    extractor._run = run
+    return commands
+
+
+def test_pypdf_pages():
+    """Pages come back in order, in-process for short documents and through the pool for long ones"""
+    print("=" * 80)
+    print("PDF EXTRACTION")
+    print("=" * 80)
+    
+    if not PDF_AVAILABLE:
+        print("\nPyPDF2 not installed, skipped")
+        return
+    
+    texts = page_texts(5)
+    pages = list(PdfExtractor().pages(make_pdf(texts)))
+    assert [page.strip() for page in pages] == texts, pages
+    
+    texts = page_texts(40)
+    path = write_pdf(texts)
+    extractor = PdfExtractor(workers=2, pages_per_task=4)
+    assert [page.strip() for page in extractor.pages(path)] == texts
+    assert [page.strip() for page in extractor.pages(make_pdf(texts))] == texts
+    print(f"\n5 pages in-process and {len(texts)} pages in ranges of 4 through the pool, in page order")
+    
+    pdf_extraction._extract_pages = crash
+    try:
+        # Below parallel_min_pages, or with one worker, nothing is sent to the pool
+        assert [page.strip() for page in PdfExtractor(workers=2).pages(make_pdf(page_texts(15)))] == page_texts(15)
+        assert [page.strip() for page in PdfExtractor(workers=1).pages(path)] == texts
+    finally:
+        pdf_extraction._extract_pages = _extract_pages
+    print("15 pages, or one worker: extracted serially without the pool")
+
+
+def test_page_limit():
+    """max_pages caps the pages read, on both the serial and the pool path"""
+    print("\n" + "=" * 80)
+    print("PDF PAGE LIMIT")
+    print("=" * 80)
+    
+    assert PdfExtractor(pages_per_task=8).page_ranges(20) == [(0, 8), (8, 16), (16, 20)]
+    assert PdfExtractor(pages_per_task=8, max_pages=10).page_ranges(20) == [(0, 8), (8, 10)]
+    assert PdfExtractor(max_pages=50).page_ranges(3) == [(0, 3)]
+    
+    if not PDF_AVAILABLE:
+        print("\nPyPDF2 not installed, skipped")
+        return
+    
+    texts = page_texts(40)
+    pdf = make_pdf(texts)
+    assert [page.strip() for page in PdfExtractor(max_pages=3).pages(pdf)] == texts[:3]
+    pages = list(PdfExtractor(workers=2, pages_per_task=4, max_pages=30).pages(pdf))
+    assert [page.strip() for page in pages] == texts[:30]
+    print("\nmax_pages of 3 and 30 on a 40-page PDF: the first 3 and 30 pages")
+
+
+def test_pool_failure():
+    """A worker that dies once is replaced; a pool that keeps dying fails the extraction"""
+    print("\n" + "=" * 80)
+    print("PDF POOL FAILURE")
+    print("=" * 80)
+    
+    if not PDF_AVAILABLE:
+        print("\nPyPDF2 not installed, skipped")
+        return
+    
+    texts = page_texts(40)
+    try:
+        pdf_extraction._extract_pages = crash_once
+        pages = list(PdfExtractor(workers=2, pages_per_task=4).pages(write_pdf(texts)))
+        assert [page.strip() for page in pages] == texts
+        
+        pdf_extraction._extract_pages = crash
+        try:
+            list(PdfExtractor(workers=2, pages_per_task=4).pages(write_pdf(texts)))
+            assert False, 'expected BrokenProcessPool'
+        except BrokenProcessPool:
+            pass
+    finally:
+        pdf_extraction._extract_pages = _extract_pages
+    # The next extraction gets a working pool
+    assert [page.strip() for page in PdfExtractor(workers=2, pages_per_task=4).pages(write_pdf(texts))] == texts
+    print("\nOne dead worker: all 40 pages after the pool is rebuilt; every worker dying: BrokenProcessPool")
+
+
+def test_pdftotext_fallback():
+    """Without PyPDF2, pdftotext reads each page range and its form feeds split the pages"""
+    print("\n" + "=" * 80)
+    print("PDFTOTEXT FALLBACK")
+    print("=" * 80)
+    
+    texts = page_texts(20)
+    pdf = make_pdf(texts)
+    available = pdf_extraction.PDF_AVAILABLE
+    pdf_extraction.PDF_AVAILABLE = False
+    try:
+        extractor = PdfExtractor(workers=2, pages_per_task=8, max_pages=18)
+        commands = stub_poppler(extractor, texts)
+        assert [page.strip() for page in extractor.pages(pdf)] == texts[:18]
+        assert commands[0] == ['pdfinfo']
+        assert sorted(command[1:] for command in commands[1:]) == [
+            ['-f', '1', '-l', '8'], ['-f', '17', '-l', '18'], ['-f', '9', '-l', '16']
+        ]
+        
+        # A range whose output is missing pages is padded with empty pages
+        extractor = PdfExtractor(pages_per_task=8)
+        stub_poppler(extractor, texts[:12])
+        extractor._pdfinfo_pages = lambda source: len(texts)
+        pages = list(extractor.pages(pdf))
+        assert [page.strip() for page in pages] == texts[:12] + [''] * 8
+    finally:
+        pdf_extraction.PDF_AVAILABLE = available
+    print(f"\n{len(texts)} pages, limit 18: pdftotext ran on pages 1-8, 9-16 and 17-18, short output padded")
+    
+    parser_available = document_parser.PDF_AVAILABLE
+    document_parser.PDF_AVAILABLE = pdf_extraction.PDF_AVAILABLE = False
+    original = PdfExtractor._run
+    
+    def missing_tool(self, args, source, output=()):
+        raise FileNotFoundError(args[0])
+    
+    PdfExtractor._run = missing_tool
+    try:
+        list(DocumentParser._extract_from_pdf_fallback(pdf))
+        assert False, 'expected ValueError'
+    except ValueError as e:
+        assert 'PDF extraction failed' in str(e)
+    finally:
+        PdfExtractor._run = original
+        document_parser.PDF_AVAILABLE = parser_available
+        pdf_extraction.PDF_AVAILABLE = available
+    print("Neither PyPDF2 nor poppler: ValueError asking for PyPDF2")
+
+
+if __name__ == '__main__':
+    test_pypdf_pages()
+    test_page_limit()
+    test_pool_failure()
+    test_pdftotext_fallback()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""Plagiarism check API: submit-then-poll with Celery running tasks eagerly, and batches"""
+
+import os
+import sys
+import json
+import tempfile
+import django
+from contextlib import contextmanager
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+os.environ['CELERY_BROKER_URL'] = ''
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from analyzer import api_views
+from analyzer.batch_check import BatchPlagiarismChecker
+from analyzer.models import Document, PlagiarismCheck, AIDetection
+from analyzer.services import PlagiarismDetector
+from analyzer.shingle_index import ShingleIndex
+from analyzer.streaming_check import StreamingPlagiarismChecker
+from analyzer.tasks import CELERY_AVAILABLE
+
+SOURCE = ("Machine learning models are trained on large datasets to recognise patterns and make "
+          "predictions about data they have never seen before, which requires careful validation.")
+OTHER = ("The river flooded the valley every spring, so the farmers built their houses on the hills "
+         "and planted rice in the terraces that still shape the landscape today.")
+
+
+@contextmanager
+def throwaway_database():
+    """A migrated throwaway database for the duration of the block"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    # An in-memory test database can outlive destroy_test_db while a connection is open
+    call_command('flush', interactive=False, verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def test_submit_and_poll():
+    """An async submission returns a status URL that reports the finished check"""
+    print("=" * 80)
+    print("PLAGIARISM CHECK API")
+    print("=" * 80)
+    
+    with throwaway_database():
+        Document.objects.create(title='Source', content=SOURCE, fingerprint='source')
+        client = Client()
+        response = client.post('/api/plagiarism-check/', json.dumps({'text': SOURCE, 'async': True}),
+                               content_type='application/json', secure=True)
+        assert response.status_code in (200, 202), response.content
+        submitted = response.json()
+        assert submitted['status_url'].endswith(submitted['id'] + '/')
+        
+        status = client.get(submitted['status_url'], {'wait': 5}, secure=True).json()
+        assert status['status'] == 'completed', status
+        assert status['progress'] == 100
+        assert status['matches'] and status['matches'][0]['title'] == 'Source'
+        assert status['is_plagiarized']
+        print(f"\nCelery {'eager' if CELERY_AVAILABLE else 'not installed, inline'}: "
+              f"check {status['id']} completed with score {status['similarity_score']:.3f}")
+        
+        assert client.get(submitted['status_url'], {'wait': 'soon'}, secure=True).status_code == 400
+        assert api_views.MAX_WAIT_SECONDS < 30
+
+
+def test_batch_check():
+    """Batch results come back in input order and match checking each text alone"""
+    print("\n" + "=" * 80)
+    print("BATCH PLAGIARISM CHECK")
+    print("=" * 80)
+    
+    with throwaway_database():
+        Document.objects.create(title='Source', content=SOURCE, fingerprint='source')
+        Document.objects.create(title='Other', content=OTHER, fingerprint='other')
+        texts = [SOURCE, '   ', OTHER + ' ' + SOURCE, 'Nothing in common with the corpus at all.', 42, OTHER]
+        
+        single = PlagiarismDetector()
+        expected = {}
+        for i, text in enumerate(texts):
+            if isinstance(text, str) and text.strip():
+                documents = list(ShingleIndex().candidate_documents(text))
+                expected[i] = single.detect_plagiarism(text, documents, 0.3)
+        
+        for parallel_min_texts in (100, 1):
+            checker = BatchPlagiarismChecker(threshold=0.3)
+            checker.parallel_min_texts = parallel_min_texts
+            checker.chunk_size = 2
+            checker.probe_size = 2
+            results = list(checker.check(texts))
+            assert [result['index'] for result in results] == list(range(len(texts)))
+            for result in results:
+                if result['index'] not in expected:
+                    assert result['error'] == 'Text is required'
+                    continue
+                want = expected[result['index']]
+                assert [(m['title'], m['similarity']) for m in result['matches']] == \
+                    [(m['title'], m['similarity']) for m in want]
+                assert result['similarity_score'] == max([m['similarity'] for m in want], default=0.0)
+            assert [m['title'] for m in results[0]['matches']] == ['Source']
+            assert {m['title'] for m in results[2]['matches']} == {'Source', 'Other'}
+            assert results[3]['matches'] == []
+        assert PlagiarismCheck.objects.count() == 2 * len(expected)
+        
+        response = Client().post('/api/plagiarism-check/batch/', json.dumps({'texts': texts[:3], 'threshold': 0.3}),
+                                 content_type='application/json', secure=True)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        assert [line['index'] for line in lines] == [0, 1, 2] and 'error' in lines[1]
+        
+        # An item that fails to score or save gets an error record; the others still come back
+        checker = BatchPlagiarismChecker(threshold=0.3)
+        compare = checker.detector._compare
+        
+        def failing_compare(features, text, items, threshold):
+            if text == OTHER:
+                raise ValueError('cannot score')
+            return compare(features, text, items, threshold)
+        
+        checker.detector._compare = failing_compare
+        results = list(checker.check([SOURCE, OTHER, SOURCE]))
+        assert results[1] == {'index': 1, 'error': 'cannot score'}
+        assert [m['title'] for m in results[2]['matches']] == ['Source']
+        checker.detector._compare = compare
+        
+        def failing_bulk_create(checks):
+            raise DatabaseError('disk full')
+        
+        bulk_create = PlagiarismCheck.objects.bulk_create
+        PlagiarismCheck.objects.bulk_create = failing_bulk_create
+        try:
+            results = list(checker.check([SOURCE, '']))
+        finally:
+            PlagiarismCheck.objects.bulk_create = bulk_create
+        assert results == [{'index': 0, 'error': 'disk full'}, {'index': 1, 'error': 'Text is required'}]
+        
+        # Anything else failing mid-stream ends the body with an error line instead of cutting it off
+        def broken_check(self, texts, cross_compare=False, cross_threshold=None):
+            yield {'index': 0, 'error': 'Text is required'}
+            raise RuntimeError('lost the database')
+        
+        original_check = BatchPlagiarismChecker.check
+        BatchPlagiarismChecker.check = broken_check
+        try:
+            response = Client().post('/api/plagiarism-check/batch/', json.dumps({'texts': ['', SOURCE]}),
+                                     content_type='application/json', secure=True)
+            tail = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        finally:
+            BatchPlagiarismChecker.check = original_check
+        assert tail == [{'index': 0, 'error': 'Text is required'}, {'error': 'lost the database'}]
+        assert Client().post('/api/plagiarism-check/batch/', json.dumps({'texts': []}),
+                             content_type='application/json', secure=True).status_code == 400
+        print(f"\n{len(texts)} texts in order, serial and pooled scoring match single checks; "
+              f"API streamed {len(lines)} lines")
+
+
+def test_streaming_upload():
+    """Large uploads are spooled and checked in the task, with an AI score and distinct-shingle coverage"""
+    print("\n" + "=" * 80)
+    print("STREAMING UPLOAD CHECK")
+    print("=" * 80)
+    
+    upload = ('\n'.join([OTHER] * 40 + [SOURCE] * 40) + '\n').encode()
+    spool = tempfile.mkdtemp()
+    with throwaway_database(), override_settings(STREAMING_CHECK_MIN_SIZE=1024, UPLOAD_SPOOL_DIR=spool):
+        Document.objects.create(title='Source', content=SOURCE, fingerprint='source')
+        
+        # Repeats of the source in later chunks are not counted again
+        pieces = [line + '\n' for line in upload.decode().splitlines()]
+        whole = StreamingPlagiarismChecker(0.3).check(pieces)
+        checker = StreamingPlagiarismChecker(0.3)
+        checker.chunk_chars = 512
+        chunked = checker.check(pieces)
+        assert chunked['chunks'] > 10 and whole['chunks'] == 1
+        for key in ('similarity', 'source_coverage', 'upload_coverage'):
+            assert chunked['matches'][0][key] == whole['matches'][0][key], key
+        assert 0.3 < whole['matches'][0]['upload_coverage'] < 0.7
+        
+        client = Client()
+        client.force_login(User.objects.create_user('reader', password='unused-password'))
+        response = client.post('/plagiarism/', {'document': SimpleUploadedFile('big.txt', upload), 'threshold': '0.3'},
+                               secure=True)
+        check = PlagiarismCheck.objects.get()
+        assert response.status_code == 302 and response['Location'].endswith(f'/plagiarism/{check.id}/')
+        assert check.status == 'completed', check.error
+        assert check.matches[0]['title'] == 'Source' and check.is_plagiarized
+        assert set(check.report) >= {'plagiarism_score', 'ai_score', 'overall_risk', 'ai_markers', 'highlighted_text'}
+        assert check.text.startswith(OTHER)
+        assert client.get(response['Location'], secure=True).status_code == 200
+        
+        response = client.post('/ai-detection/', {'document': SimpleUploadedFile('big.txt', upload)}, secure=True)
+        detection = AIDetection.objects.get()
+        assert response['Location'].endswith(f'/ai-detection/{detection.id}/')
+        assert detection.status == 'completed', detection.error
+        assert detection.report['windows'] and detection.ai_probability == check.report['ai_score']
+        assert client.get(response['Location'], secure=True).status_code == 200
+        assert os.listdir(spool) == []
+        print(f"\n{len(upload)} byte upload: {chunked['chunks']} chunks score like one, "
+              f"task stored plagiarism {check.similarity_score:.1f}% and AI {check.report['ai_score']:.1f}%")
+
+
+if __name__ == '__main__':
+    test_submit_and_poll()
+    test_batch_check()
+    test_streaming_upload()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""Parity test for the UltimatePlagiarismDetector scoring cascade"""
+
+import os
+import sys
+import random
+import tempfile
+import django
+from concurrent.futures.process import BrokenProcessPool
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from analyzer.cross_compare import CrossComparer
+from analyzer.models import Document
+from analyzer.parallel_compare import ParallelComparer
+from analyzer.services import PlagiarismDetector
+from analyzer.ultimate_detector import UltimatePlagiarismDetector
+
+WORDS = ("data set model the of and to learning results method analysis study sample value "
+         "network training error test paper approach system input output").split()
+
+
+def random_corpus(seed, size=30):
+    """A query and documents ranging from near copies of it to unrelated text"""
+    rng = random.Random(seed)
+    query = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(10, 40)))
+    documents = []
+    for pk in range(1, size + 1):
+        words = query.split()
+        kind = rng.random()
+        if kind < 0.3:
+            # Copy with some words replaced
+            words = [rng.choice(WORDS) if rng.random() < kind else word for word in words]
+        elif kind < 0.6:
+            words = words[rng.randint(0, len(words) // 2):] + [rng.choice(WORDS) for _ in range(rng.randint(0, 40))]
+        else:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(1, 120))]
+        documents.append(Document(pk=pk, title=f'doc {pk}', content=' '.join(words)))
+    return query, documents
+
+
+def full_scoring(detector, text, documents):
+    """Every document fully scored: all matches above the threshold, or the best one below it"""
+    scored = []
+    for order, doc in enumerate(documents):
+        if detector._comparable(doc):
+            scored.append((detector._calculate_plagiarism_similarity(text, doc.content), -order, doc))
+    scored.sort(key=lambda entry: entry[:2], reverse=True)
+    matches = [entry for rank, entry in enumerate(scored) if rank == 0 or entry[0] >= detector.plagiarism_threshold]
+    return [(doc.pk, similarity) for similarity, _, doc in matches[:detector.top_k]]
+
+
+def cascade_scoring(detector, text, documents):
+    return [(match['document'].pk, match['similarity']) for match in detector._scan_documents(text, documents)]
+
+
+def make_detector(top_k=None, parallel=False):
+    detector = UltimatePlagiarismDetector()
+    detector.lsh = None
+    detector.top_k = top_k
+    if parallel:
+        detector.parallel_min_candidates = 1
+        detector.comparer = ParallelComparer(shard_size=16)
+    return detector
+
+
+def test_cascade_parity():
+    """The cascade reports the same matches and scores as scoring every document in full"""
+    print("=" * 80)
+    print("SCORING CASCADE PARITY")
+    print("=" * 80)
+    
+    pruned = 0
+    for seed in range(12):
+        query, documents = random_corpus(seed)
+        for top_k in (None, 3):
+            detector = make_detector(top_k)
+            assert cascade_scoring(detector, query, documents) == full_scoring(detector, query, documents), (seed, top_k)
+            pruned += sum(detector.cascade_stats['pruned'].values())
+    print(f"\n12 corpora x (all matches, top 3): identical results, {pruned} documents pruned early")
+    
+    query, documents = random_corpus(99, size=48)
+    for top_k in (None, 3):
+        detector = make_detector(top_k, parallel=True)
+        assert cascade_scoring(detector, query, documents) == full_scoring(detector, query, documents), top_k
+    print("Process-pool shards: identical results")
+
+
+def test_cascade_edge_cases():
+    """Repeated query words keep the fuzzy bound valid, and a sub-threshold best match is still reported"""
+    print("\n" + "=" * 80)
+    print("SCORING CASCADE EDGE CASES")
+    print("=" * 80)
+    
+    # Every leading query word finds a fuzzy match, so document 2 scores above the threshold;
+    # a fuzzy bound of min(head sizes) / word count pruned it
+    detector = make_detector()
+    query = 'sets data sets sets sets sets data data sets data sets data data'
+    documents = [Document(pk=1, title='a', content='model of the sets the of data'),
+                 Document(pk=2, title='b', content='the sets sets')]
+    assert [pk for pk, _ in cascade_scoring(detector, query, documents)] == [1, 2]
+    assert cascade_scoring(detector, query, documents) == full_scoring(detector, query, documents)
+    
+    query = 'completely unrelated words about cooking pasta tonight'
+    documents = [Document(pk=1, title='a', content='network training error on the test sample'),
+                 Document(pk=2, title='b', content='cooking rice for dinner tonight with friends')]
+    result = detector.detect_all(query, documents)
+    best = full_scoring(detector, query, documents)[0]
+    assert 0 < result['plagiarism_score'] < detector.plagiarism_threshold
+    assert result['plagiarism_score'] == best[1]
+    assert result['details']['plagiarism']['matches'] == []
+    print(f"\nFuzzy bound with repeated words: OK; best sub-threshold score {result['plagiarism_score']:.3f} reported")
+
+
+def shard_sizes(query, items):
+    return [len(items)]
+
+
+def crash_once(marker, value):
+    """Kill the worker the first time any worker runs this"""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return value
+
+
+def crash(value):
+    os._exit(1)
+
+
+def test_parallel_comparer():
+    """Shards are pulled lazily and capped by text size; list inputs go through the pool, which survives a dead worker"""
+    print("\n" + "=" * 80)
+    print("PARALLEL COMPARER")
+    print("=" * 80)
+    
+    comparer = ParallelComparer(workers=2, shard_size=4, shard_chars=100)
+    pulled = []
+    
+    def items():
+        for i in range(200):
+            pulled.append(i)
+            yield 'x' * 30
+    
+    results = comparer.imap(shard_sizes, ((None, shard) for shard in comparer.shards(items(), len)), window=2)
+    first = next(results)
+    # Two shards in flight plus the one being filled
+    assert first == [4] and len(pulled) <= 3 * 4
+    assert sum(sizes[0] for sizes in [first] + list(results)) == 200
+    assert comparer.map(shard_sizes, None, ['x' * 60] * 5, size=len) == [[2], [2], [1]]
+    assert comparer.map(shard_sizes, None, ['x'] * 9) == [[4], [4], [1]]
+    print(f"\nFirst shard returned after pulling {len(pulled)} of 200 items; shards closed at 100 characters")
+    
+    query, documents = random_corpus(4, size=40)
+    detector = PlagiarismDetector()
+    detector.lsh = None
+    serial = detector.detect_plagiarism(query, documents, threshold=0.3)
+    detector.parallel_min_candidates = 1
+    detector.comparer = ParallelComparer(shard_size=8)
+    assert detector.detect_plagiarism(query, documents, threshold=0.3) == serial and serial
+    print(f"PlagiarismDetector on a list of {len(documents)} documents: pool and serial agree")
+    
+    marker = os.path.join(tempfile.mkdtemp(), 'crashed')
+    comparer = ParallelComparer(workers=2)
+    assert list(comparer.imap(crash_once, [(marker, i) for i in range(10)])) == list(range(10))
+    try:
+        list(comparer.imap(crash, [(i,) for i in range(4)]))
+        assert False, 'expected BrokenProcessPool'
+    except BrokenProcessPool:
+        pass
+    assert comparer.map(shard_sizes, None, ['x'] * 9) == [[9]]
+    print("A worker killed mid-check: the pool is rebuilt once and the check completes")
+
+
+def test_cross_compare():
+    """A planted cluster is found among unrelated submissions; bad items and big buckets are reported"""
+    print("\n" + "=" * 80)
+    print("CROSS-COMPARISON")
+    print("=" * 80)
+    
+    rng = random.Random(21)
+    vocabulary = [f'w{i}' for i in range(2000)]
+    texts = [' '.join(rng.choice(vocabulary) for _ in range(150)) for _ in range(30)]
+    base = texts[4].split()
+    for i in (11, 20):
+        texts[i] = ' '.join(rng.choice(vocabulary) if rng.random() < 0.05 else word for word in base)
+    texts[7], texts[15], texts[25] = None, 42, '   '
+    
+    result = CrossComparer().compare(texts)
+    assert result['skipped'] == [7, 15, 25]
+    assert result['clusters'] and result['clusters'][0]['members'] == [4, 11, 20]
+    assert len(result['clusters']) == 1
+    assert {(pair['a'], pair['b']) for pair in result['pairs']} == {(4, 11), (4, 20), (11, 20)}
+    assert result['oversized_buckets'] == []
+    print(f"\n{result['candidate_pairs']} candidate pairs of {len(texts) * (len(texts) - 1) // 2}: "
+          f"cluster {result['clusters'][0]['members']} found, items {result['skipped']} skipped")
+    
+    comparer = CrossComparer()
+    comparer.max_bucket_size = 2
+    result = comparer.compare(texts)
+    assert result['oversized_buckets'] == [[4, 11, 20]]
+    # Bands where only two of the copies agree still propose those pairs
+    assert {(pair['a'], pair['b']) for pair in result['pairs']} <= {(4, 11), (4, 20), (11, 20)}
+    print(f"Buckets over max_bucket_size reported: {result['oversized_buckets']}")
+
+
+if __name__ == '__main__':
+    test_cascade_parity()
+    test_cascade_edge_cases()
+    test_parallel_comparer()
+    test_cross_compare()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+"""Tests for the near-duplicate indexes and aligner behind the plagiarism detectors"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import importlib
+import django
+import numpy as np
+from multiprocessing import Pool
+from difflib import SequenceMatcher
+from collections import defaultdict
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from analyzer.aligner import SeedExtendAligner
+from analyzer.embedding_index import EmbeddingIndex
+from analyzer.minhash_lsh import MinHashLSH
+from analyzer.models import Document
+from analyzer.modern_detector import ModernPlagiarismDetector
+from analyzer.passages import PassageDetector
+from analyzer.shingle_index import ShingleIndex
+from analyzer.winnowing import Winnower
+from test_plagiarism_api import throwaway_database
+
+WORDS = [f'w{i}' for i in range(2000)]
+
+
+def random_text(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def edit(rng, text, rate):
+    """Replace a share of the words of a text"""
+    return ' '.join(rng.choice(WORDS) if rng.random() < rate else word for word in text.split())
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def test_lsh_recall():
+    """Planted near-duplicates share a bucket at the estimated rate; unrelated texts do not"""
+    print("=" * 80)
+    print("MINHASH / LSH RECALL")
+    print("=" * 80)
+    
+    rng = random.Random(7)
+    lsh = MinHashLSH()
+    shingler = ShingleIndex()
+    
+    for rate in (0.1, 0.3, 0.55):
+        found = 0
+        expected = 0.0
+        error = 0.0
+        pairs = 100
+        for _ in range(pairs):
+            original = random_text(rng, 200)
+            copy = edit(rng, original, rate)
+            shingles1, shingles2 = shingler.shingles(original), shingler.shingles(copy)
+            signature1, signature2 = lsh.signature(shingles1), lsh.signature(shingles2)
+            similarity = jaccard(shingles1, shingles2)
+            expected += lsh.estimated_recall(similarity)
+            error += abs(lsh.estimated_similarity(signature1, signature2) - similarity)
+            found += bool(set(lsh.band_keys(signature1)) & set(lsh.band_keys(signature2)))
+        print(f"\n{rate:.0%} of words edited: {found}/{pairs} pairs share a bucket "
+              f"(estimated {expected:.1f}), mean Jaccard estimate error {error / pairs:.3f}")
+        # Binomial spread around the estimate
+        assert found >= expected - 3 * max(expected * (1 - expected / pairs), 1) ** 0.5
+        assert error / pairs < 0.05
+    
+    collisions = 0
+    signatures = [lsh.signature(shingler.shingles(random_text(rng, 200))) for _ in range(60)]
+    keys = [set(lsh.band_keys(signature)) for signature in signatures]
+    for i in range(len(keys)):
+        for j in range(i + 1, len(keys)):
+            collisions += bool(keys[i] & keys[j])
+    print(f"Unrelated texts: {collisions} of {len(keys) * (len(keys) - 1) // 2} pairs share a bucket")
+    assert collisions == 0
+    
+    assert lsh.signature(shingler.shingles('too short')) is None
+    assert lsh.signature_for_text(original) == lsh.signature_for_text(original)
+
+
+
+def reference_winnow(hashes, window):
+    """Rightmost minimal hash of every window, by brute force"""
+    selected = []
+    if not hashes:
+        return selected
+    w = min(window, len(hashes))
+    for start in range(len(hashes) - w + 1):
+        values = hashes[start:start + w]
+        position = start + max(i for i, h in enumerate(values) if h == min(values))
+        if not selected or selected[-1] != position:
+            selected.append(position)
+    return selected
+
+
+def test_winnowing_guarantee():
+    """Any shared run of window + k - 1 normalized characters shares a fingerprint"""
+    print("\n" + "=" * 80)
+    print("WINNOWING GUARANTEE")
+    print("=" * 80)
+    
+    rng = random.Random(11)
+    winnower = Winnower(k=8, window=6)
+    guarantee = winnower.window + winnower.k - 1
+    for _ in range(200):
+        hashes = [rng.randrange(20) for _ in range(rng.randint(0, 60))]
+        assert winnower.winnow(hashes) == reference_winnow(hashes, winnower.window)
+    
+    for trial in range(200):
+        shared = ''.join(rng.choice('abcdefgh') for _ in range(guarantee))
+        text = random_text(rng, rng.randint(0, 30)) + ' ' + shared + ' ' + random_text(rng, rng.randint(0, 30))
+        source = random_text(rng, rng.randint(0, 30)) + ', ' + shared.upper() + '. ' + random_text(rng, 10)
+        fingerprints = winnower.fingerprints(text)
+        assert {h for h, _, _ in fingerprints} & {h for h, _, _ in winnower.fingerprints(source)}, trial
+        for h, start, end in fingerprints:
+            # Offsets point at the k alphanumerics the hash was taken over, in the original text
+            assert len(winnower.normalize(text[start:end])[0]) == winnower.k
+    print(f"\n200 planted runs of {guarantee} characters: every one shares a fingerprint")
+    
+    winnower = Winnower()
+    source = random_text(rng, 300)
+    words = source.split()
+    copied = ' '.join(words[100:200])
+    text = random_text(rng, 80) + ' ' + copied + ' ' + random_text(rng, 80)
+    index = defaultdict(list)
+    for h, start, end in winnower.fingerprints(source):
+        index[h].append((start, end))
+    hits = [(start, end, source_start, source_end) for h, start, end in winnower.fingerprints(text)
+            for source_start, source_end in index.get(h, [])]
+    passages = winnower._merge(hits)
+    assert len(passages) == 1
+    passage = passages[0]
+    text_start = text.index(copied)
+    source_start = source.index(copied)
+    # Winnowing may miss at most one window at either end of the copy
+    slack = winnower.window + winnower.k
+    assert text_start <= passage['start'] <= text_start + slack
+    assert text_start + len(copied) - slack <= passage['end'] <= text_start + len(copied)
+    assert source_start <= passage['source_start'] <= source_start + slack
+    print(f"Copied passage at {text_start}-{text_start + len(copied)} found at {passage['start']}-{passage['end']}")
+
+
+
+def test_aligner():
+    """SequenceMatcher below exact_limit, seed-and-extend spans of equal text above it"""
+    print("\n" + "=" * 80)
+    print("SEED-EXTEND ALIGNER")
+    print("=" * 80)
+    
+    rng = random.Random(5)
+    aligner = SeedExtendAligner()
+    for _ in range(100):
+        text1 = random_text(rng, rng.randint(0, 150))
+        text2 = edit(rng, text1, rng.random())[:rng.randint(0, 1500)]
+        assert len(text1) * len(text2) <= aligner.exact_limit
+        assert aligner.similarity(text1, text2) == SequenceMatcher(None, text1, text2).ratio()
+    
+    bounded = SeedExtendAligner(exact_limit=0)
+    print()
+    for rate in (0.0, 0.05, 0.2, 0.5, 1.0):
+        text1 = random_text(rng, 400)
+        text2 = edit(rng, text1, rate)
+        result = bounded.align(text1, text2)
+        assert result['complete']
+        for span in result['spans']:
+            assert text1[span['start']:span['end']] == text2[span['source_start']:span['source_end']]
+        # The metrics differ in between (see SeedExtendAligner); identical texts score 1.0 under both
+        print(f"{rate:.0%} of words edited: SequenceMatcher {SequenceMatcher(None, text1, text2).ratio():.3f}, "
+              f"seed-and-extend {result['similarity']:.3f}")
+        if rate == 0.0:
+            assert result['similarity'] == 1.0
+    
+    text1 = random_text(rng, 200_000)
+    text2 = edit(rng, text1, 0.1)
+    bounded = SeedExtendAligner(exact_limit=0, time_budget=0.05)
+    start = time.perf_counter()
+    result = bounded.align(text1, text2)
+    elapsed = time.perf_counter() - start
+    assert not result['complete'] and elapsed < 5
+    print(f"200,000 words under a 50 ms budget: stopped after {elapsed:.2f} s with {len(result['spans'])} spans")
+    
+    # Characters too rare for autojunk make SequenceMatcher slow even below exact_limit
+    alphabet = [chr(0x4e00 + i) for i in range(300)]
+    words = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 8))) for _ in range(700)]
+    text1 = ' '.join(words)
+    text2 = edit(rng, text1, 0.1)
+    assert len(text1) * len(text2) <= aligner.exact_limit
+    bounded = SeedExtendAligner(time_budget=0.005)
+    start = time.perf_counter()
+    result = bounded.align(text1, text2)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1 and result['similarity'] > 0.5
+    for span in result['spans']:
+        assert text1[span['start']:span['end']] == text2[span['source_start']:span['source_end']]
+    print(f"{len(text1)} x {len(text2)} rare characters under a 5 ms budget: seed-and-extend after {elapsed:.3f} s")
+
+
+def random_sentences(rng, count):
+    return [random_text(rng, rng.randint(6, 14)).capitalize() + '.' for _ in range(count)]
+
+
+def test_passage_spans():
+    """Planted copies come back as spans whose offsets cut the copied sentences from both texts"""
+    print("\n" + "=" * 80)
+    print("PASSAGE SPANS")
+    print("=" * 80)
+    
+    rng = random.Random(13)
+    detector = PassageDetector()
+    for trial in range(20):
+        source = random_sentences(rng, 30)
+        first = rng.randint(0, 10)
+        second = rng.randint(first + 8, 25)
+        copies = [source[first:first + rng.randint(3, 6)], source[second:second + 3]]
+        own = [random_sentences(rng, rng.randint(1, 5)) for _ in range(3)]
+        text = ' '.join(own[0] + copies[0] + own[1] + copies[1] + own[2])
+        documents = [Document(pk=1, title='source', content=' '.join(source)),
+                     Document(pk=2, title='unrelated', content=' '.join(random_sentences(rng, 30)))]
+        
+        matches = detector.detect(text, documents)
+        assert [match['document_id'] for match in matches] == ['1'], trial
+        spans = matches[0]['spans']
+        assert len(spans) == 2, (trial, spans)
+        content = documents[0].content
+        for span, copy in zip(spans, copies):
+            passage = ' '.join(copy)
+            assert span['text'].strip() == passage, trial
+            assert content[span['source_start']:span['source_end']].strip() == passage, trial
+        copied = sum(len(' '.join(copy)) for copy in copies)
+        assert abs(matches[0]['coverage'] - copied / len(text)) < 0.01
+    print("\n20 texts with two planted passages each: both spans cut exactly the copied sentences")
+
+
+def add_embeddings(args):
+    path, worker = args
+    index = EmbeddingIndex(path)
+    rng = np.random.default_rng(worker)
+    for i in range(20):
+        index.add(f'{worker}-{i}', 'v1', rng.normal(size=16))
+    return worker
+
+
+def test_embedding_store():
+    """Removed, concurrently added and partially written rows leave a consistent store"""
+    print("\n" + "=" * 80)
+    print("EMBEDDING STORE")
+    print("=" * 80)
+    
+    path = tempfile.mkdtemp()
+    rng = np.random.default_rng(3)
+    vectors = {str(key): rng.normal(size=16) for key in range(50)}
+    index = EmbeddingIndex(path)
+    index.add_many((key, 'v1', vector) for key, vector in vectors.items())
+    assert index.remove(['3', '10', 'missing']) == 2
+    del vectors['3'], vectors['10']
+    
+    # A second handle on the store picks up the compacted file
+    other = EmbeddingIndex(path)
+    assert sorted(other.keys) == sorted(vectors) and '3' not in other
+    for key in ('0', '25', '49'):
+        assert other.search(vectors[key], k=1)[0][0] == key
+    
+    # Bytes left past the committed rows by an interrupted append are overwritten
+    with open(other._vector_path(), 'ab') as f:
+        f.write(b'\xff' * 40)
+    other.add('50', 'v1', rng.normal(size=16))
+    assert os.path.getsize(other._vector_path()) == len(other) * 16 * 4
+    assert index.search(vectors['7'], k=1)[0][0] == '7'
+    assert len(index) == len(vectors) + 1
+    print(f"\nRemoval, a second handle and an interrupted append: {len(index)} rows, all searchable")
+    
+    with Pool(4) as pool:
+        pool.map(add_embeddings, [(path, worker) for worker in range(4)])
+    index = EmbeddingIndex(path)
+    assert len(index) == len(vectors) + 1 + 4 * 20
+    assert os.path.getsize(index._vector_path()) == len(index) * 16 * 4
+    assert index.search(np.random.default_rng(2).normal(size=16), k=1)[0][0] == '2-0'
+    print(f"4 processes adding 20 rows each: {len(index)} rows, none lost")
+
+
+def test_shingle_backfill():
+    """Documents saved before the shingle index existed are indexed by migration 0016"""
+    print("\n" + "=" * 80)
+    print("SHINGLE POSTINGS BACKFILL")
+    print("=" * 80)
+    
+    from django.apps import apps
+    migration = importlib.import_module('analyzer.migrations.0016_backfill_shingle_postings')
+    rng = random.Random(11)
+    with throwaway_database():
+        indexed = Document.objects.create(title='indexed', content=random_text(rng, 60), fingerprint='a')
+        # bulk_create skips Document.save, like rows written before migration 0008
+        old = Document.objects.bulk_create([Document(title=f'old {i}', content=random_text(rng, 60), fingerprint='b')
+                                            for i in range(3)])
+        index = ShingleIndex()
+        assert not index.candidate_ids(old[1].content)
+        postings = index.shared_counts(index.shingles(indexed.content))[indexed.pk]
+        
+        migration.backfill_shingle_postings(apps, None)
+        for document in old:
+            assert index.candidate_ids(document.content)[0] == document.pk
+        assert index.shared_counts(index.shingles(indexed.content))[indexed.pk] == postings
+    print("\nUnindexed documents get postings; indexed ones are left as they were")
+
+
+class StubEmbedder:
+    """Stands in for the sentence-transformer: a fixed random vector per text, counting what it embeds"""
+    
+    def __init__(self):
+        self.encoded = []
+    
+    def encode(self, texts, convert_to_tensor=False):
+        if isinstance(texts, str):
+            return self.vector(texts)
+        self.encoded += texts
+        return [self.vector(text) for text in texts]
+    
+    def vector(self, text):
+        return np.random.default_rng(sum(map(ord, text))).normal(size=16)
+
+
+def test_embedding_sync():
+    """A check embeds only its candidates; deleted documents never match and are pruned by the command path"""
+    print("\n" + "=" * 80)
+    print("EMBEDDING SYNC")
+    print("=" * 80)
+    
+    rng = random.Random(6)
+    with throwaway_database():
+        documents = [Document.objects.create(title=f'doc {i}', content=random_text(rng, 50), fingerprint=f'f{i}')
+                     for i in range(4)]
+        detector = ModernPlagiarismDetector.__new__(ModernPlagiarismDetector)
+        detector.model = StubEmbedder()
+        detector.embeddings = EmbeddingIndex(tempfile.mkdtemp())
+        detector.top_k = 10
+        
+        candidates = Document.objects.filter(pk__in=[documents[0].pk, documents[1].pk])
+        assert sorted(detector.sync_embeddings(candidates)) == sorted(str(d.pk) for d in documents[:2])
+        assert len(detector.embeddings) == 2 and len(detector.model.encoded) == 2
+        detector.sync_embeddings(Document.objects.all())
+        assert len(detector.embeddings) == 4 and len(detector.model.encoded) == 4
+        
+        deleted = documents[3]
+        deleted_id = str(deleted.pk)
+        deleted.delete()
+        results = detector.detect_plagiarism(deleted.content, Document.objects.all(), threshold=0.5)
+        assert deleted_id in detector.embeddings and len(detector.model.encoded) == 4
+        assert all(r['document_id'] != deleted_id for r in results)
+        results = detector.detect_plagiarism(documents[1].content, Document.objects.all(), threshold=0.5)
+        assert results[0]['document_id'] == str(documents[1].pk)
+        
+        assert detector.prune_embeddings(Document.objects.all()) == 1
+        assert deleted_id not in detector.embeddings and len(detector.embeddings) == 3
+    print("\nCandidates embedded once; a deleted document is ignored by checks and dropped by prune")
+
+
+if __name__ == '__main__':
+    test_lsh_recall()
+    test_winnowing_guarantee()
+    test_aligner()
+    test_passage_spans()
+    test_embedding_store()
+    test_shingle_backfill()
+    test_embedding_sync()
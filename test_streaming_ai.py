@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Tests for the bounded-memory sketches and streaming AI-marker detection (analyzer.streaming_ai)"""
+
+import os
+import sys
+import random
+import django
+import numpy as np
+from collections import Counter
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from analyzer.ai_markers import marker_engine
+from analyzer.streaming_ai import DistinctCounter, HeavyHitters, MarkerStats, StreamingAIDetector
+from test_ai_markers import generate_text
+
+
+def split_pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+
+def assert_markers_close(got, want, context):
+    assert got.keys() == want.keys()
+    for key in want:
+        assert abs(got[key] - want[key]) < 1e-9, (context, key, got[key], want[key])
+
+
+def test_sketches():
+    """DistinctCounter is exact up to its size and close after; HeavyHitters never undercounts"""
+    print("=" * 80)
+    print("STREAMING SKETCHES")
+    print("=" * 80)
+    
+    counter = DistinctCounter(size=1024)
+    for i in range(3000):
+        counter.add(f'word{i % 1000}')
+    assert counter.count() == 1000
+    for i in range(100_000):
+        counter.add(f'word{i}')
+    error = abs(counter.count() - 100_000) / 100_000
+    assert error < 3 / np.sqrt(1024), error
+    print(f"\nDistinctCounter: exact at 1000 distinct, {error:.2%} off at 100000")
+    
+    rng = random.Random(4)
+    stream = [f'w{min(int(rng.paretovariate(1.2)), 5000)}' for _ in range(20_000)]
+    truth = Counter(stream)
+    small = HeavyHitters(capacity=len(truth) + 1)
+    hitters = HeavyHitters(capacity=64)
+    for value in stream:
+        small.add(value)
+        hitters.add(value)
+    assert small.counts == truth
+    assert len(hitters.counts) == 64
+    assert all(count >= truth[value] for value, count in hitters.counts.items())
+    # Space-saving keeps every value seen more than len(stream) / capacity times
+    assert all(value in hitters.counts for value, count in truth.items() if count > len(stream) / 64)
+    assert hitters.max_count() >= max(truth.values())
+    print(f"HeavyHitters: exact below capacity, {len(truth)} distinct values tracked in 64 without undercounting")
+
+
+def test_welford():
+    """MarkerStats sentence-length mean and variance match numpy however the sentences are grouped"""
+    print("\n" + "=" * 80)
+    print("MARKER STATS WELFORD")
+    print("=" * 80)
+    
+    rng = random.Random(8)
+    lengths = [rng.randint(1, 80) for _ in range(5000)]
+    stats = MarkerStats()
+    i = 0
+    while i < len(lengths):
+        group = lengths[i:i + rng.randint(1, 40)]
+        i += len(group)
+        stats.add({'sentences': [(length, 'the') for length in group], 'tokens': sum(group), 'token_chars': 0,
+                   'words': Counter(), 'word_hashes': [], 'lexicons': Counter(), 'passive': 0, 'hedging': 0,
+                   'punctuation': 0})
+    assert stats.sentences == len(lengths)
+    assert abs(stats.mean_length - np.mean(lengths)) < 1e-9
+    assert abs(stats.squared_deviations / stats.sentences - np.var(lengths)) < 1e-6
+    print(f"\n{len(lengths)} sentence lengths: running mean and variance equal numpy's")
+
+
+def test_streaming_parity():
+    """Document markers equal MarkerEngine.analyze of the whole text, however it is split into pieces"""
+    print("\n" + "=" * 80)
+    print("STREAMING AI PARITY")
+    print("=" * 80)
+    
+    texts = ['', 'Thus.', 'Maybe it may be. In short, shortly.']
+    texts += [generate_text(random.Random(seed).randint(0, 30_000), seed) for seed in range(30)]
+    for text in texts:
+        expected = marker_engine.analyze(text)
+        for size in (len(text) or 1, 1000, 37):
+            result = StreamingAIDetector(window_sentences=20).check(split_pieces(text, size))
+            assert_markers_close(result['markers'], expected, (text[:100], size))
+            assert result['characters'] == len(text)
+            assert sum(window['sentences'] for window in result['windows']) == result['sentences']
+    print(f"\n{len(texts)} texts in pieces of 37, 1000 and all characters: markers equal MarkerEngine.analyze")
+
+
+def test_forced_cuts():
+    """A sentence cut at whitespace for being too long still counts as one sentence"""
+    print("\n" + "=" * 80)
+    print("STREAMING AI FORCED CUTS")
+    print("=" * 80)
+    
+    rng = random.Random(12)
+    run_on = ' '.join(rng.choice(['alpha', 'beta', 'gamma', 'delta', 'data']) for _ in range(20_000))
+    texts = ['word ' * 30000, run_on, 'Short one. Another here. ' + run_on + '. Then a tail sentence. Done',
+             ('word ' * 3000 + '. ') * 5]
+    for text in texts:
+        expected = marker_engine.analyze(text)
+        for size in (len(text), 1000, 4999):
+            detector = StreamingAIDetector()
+            detector.max_segment_chars = 2000
+            result = detector.check(split_pieces(text, size))
+            assert_markers_close(result['markers'], expected, (text[:50], size))
+    result = StreamingAIDetector().check(split_pieces('word ' * 30000, 1000))
+    assert result['sentences'] == 1
+    assert result['markers']['repetitive_structure'] == 0 and result['markers']['sentence_length_variance'] == 0
+    print(f"\n{len(texts)} texts with sentences longer than a segment: markers equal MarkerEngine.analyze")
+
+
+if __name__ == '__main__':
+    test_sketches()
+    test_welford()
+    test_streaming_parity()
+    test_forced_cuts()
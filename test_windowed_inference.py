@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""Tests for sliding-window AI classification (analyzer.windowed_inference) with a stub tokenizer and model"""
+
+import os
+import re
+import sys
+import django
+from types import SimpleNamespace
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'textanalyzer.settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from analyzer.model_registry import MODEL_LOADERS, registry
+from analyzer.windowed_inference import TORCH_AVAILABLE, SlidingWindowClassifier, ai_label_index
+from analyzer.services import AIDetector
+
+# roberta-base-openai-detector's labels: the machine-written class is "Fake"
+STUB_CONFIG = SimpleNamespace(id2label={0: 'Fake', 1: 'Real'})
+# Token ids of the stub tokenizer; the stub model's AI probability is the share of "robot" words
+PAD, ROBOT, WORD, SPECIAL = 0, 1, 2, 3
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the overflowing-window output of a fast tokenizer"""
+    
+    def __call__(self, text, max_length, stride, return_tensors=None, **kwargs):
+        import torch
+        spans = [(m.start(), m.end(), m.group()) for m in re.finditer(r'\S+', text)]
+        size = max_length - 2
+        windows = [spans[i:i + size] for i in range(0, max(len(spans) - stride, 1), size - stride)]
+        ids, offsets = [], []
+        for window in windows:
+            padding = size - len(window)
+            ids.append([SPECIAL] + [ROBOT if w == 'robot' else WORD for _, _, w in window] + [SPECIAL] + [PAD] * padding)
+            offsets.append([(0, 0)] + [(s, e) for s, e, _ in window] + [(0, 0)] * (padding + 1))
+        ids = torch.tensor(ids)
+        return {
+            'input_ids': ids,
+            'attention_mask': (ids != PAD).long(),
+            'offset_mapping': torch.tensor(offsets),
+            'overflow_to_sample_mapping': torch.zeros(len(windows), dtype=torch.long)
+        }
+
+
+class StubModel:
+    config = STUB_CONFIG
+    
+    def __init__(self):
+        self.batches = []
+    
+    def __call__(self, input_ids, attention_mask):
+        import torch
+        self.batches.append(len(input_ids))
+        words = ((input_ids == ROBOT) | (input_ids == WORD)).sum(1).clamp(min=1)
+        p = ((input_ids == ROBOT).sum(1).float() / words.float()).clamp(1e-6, 1 - 1e-6)
+        return SimpleNamespace(logits=torch.stack([p.log(), (1 - p).log()], dim=1))
+
+
+class StubPipeline:
+    """A text-classification pipeline that calls every text 'Fake' with score 0.9"""
+    
+    def __init__(self):
+        self.model = StubModel()
+        self.tokenizer = StubTokenizer()
+    
+    def __call__(self, texts, **kwargs):
+        return [{'label': 'Fake', 'score': 0.9} for _ in texts]
+
+
+def test_window_weights():
+    """Windows span their tokens' characters and weigh only the tokens past the overlap"""
+    print("=" * 80)
+    print("SLIDING WINDOW WEIGHTS")
+    print("=" * 80)
+    
+    classifier = SlidingWindowClassifier(stride=2, max_windows=0)
+    offsets = [
+        [(0, 0), (0, 5), (6, 11), (12, 17), (18, 23), (0, 0)],
+        [(0, 0), (12, 17), (18, 23), (24, 29), (0, 0), (0, 0)],
+        [(0, 0), (0, 0), (0, 0), (0, 0), (0, 0), (0, 0)],
+        [(0, 0), (40, 45), (46, 51), (52, 57), (58, 63), (0, 0)],
+    ]
+    windows = classifier.windows([0, 1, 2, 3], offsets, [0.9, 0.5, 0.1, 0.2])
+    assert [(w['index'], w['start'], w['end'], w['tokens'], w['weight']) for w in windows] == [
+        (0, 0, 23, 4, 4), (1, 12, 29, 3, 1), (3, 40, 63, 4, 4)
+    ]
+    # Windows that are not neighbours (select() skipped some) share no tokens
+    windows = classifier.windows([0, 3], offsets, [0.9, 0.2])
+    assert [w['weight'] for w in windows] == [4, 4]
+    
+    assert SlidingWindowClassifier(max_windows=0).select(1000) == list(range(1000))
+    assert SlidingWindowClassifier(max_windows=8).select(5) == [0, 1, 2, 3, 4]
+    assert SlidingWindowClassifier(max_windows=1).select(40) == [0]
+    rows = SlidingWindowClassifier(max_windows=5).select(101)
+    assert rows == [0, 25, 50, 75, 100]
+    print("\nSpans from token offsets, overlap subtracted from neighbours only, evenly spaced selection")
+
+
+def test_ai_label():
+    """Both AI detector paths read the AI class from the model's labels"""
+    print("\n" + "=" * 80)
+    print("AI LABEL")
+    print("=" * 80)
+    
+    assert ai_label_index(STUB_CONFIG) == 0
+    assert ai_label_index(SimpleNamespace(id2label={0: 'Human', 1: 'AI'})) == 1
+    assert ai_label_index(SimpleNamespace(id2label={0: 'LABEL_0', 1: 'LABEL_1'})) == 0
+    
+    registry.unload('ai-detector')
+    registry.register('ai-detector', lambda: StubPipeline())
+    try:
+        detector = AIDetector.__new__(AIDetector)
+        detector.classifier = StubPipeline()
+        result = detector.detect_ai_content('A short text the model reads in one pass.')
+        assert abs(result['ai_probability'] - 0.9) < 1e-9 and result['is_ai_generated'], result
+    finally:
+        registry.unload('ai-detector')
+        registry.register('ai-detector', MODEL_LOADERS['ai-detector'])
+    print("\n'Fake' with score 0.9 is an AI probability of 0.9")
+
+
+def test_sliding_window_classify():
+    """classify() scores every window in batches and weights them by their new tokens"""
+    print("\n" + "=" * 80)
+    print("SLIDING WINDOW CLASSIFY")
+    print("=" * 80)
+    
+    if not TORCH_AVAILABLE:
+        print("\ntorch not installed, skipped")
+        return
+    
+    words = ['robot'] * 8 + ['word'] * 14 + ['robot'] * 8
+    text = ' '.join(words)
+    starts = [m.start() for m in re.finditer(r'\S+', text)]
+    pipeline = StubPipeline()
+    registry.unload('windowed-test')
+    registry.register('windowed-test', lambda: pipeline)
+    try:
+        # Windows of 8 words overlapping by 2: words 0-7, 6-13, 12-19, 18-25, 24-29
+        result = SlidingWindowClassifier(name='windowed-test', max_length=10, stride=2, batch_size=2,
+                                          max_windows=0).classify(text)
+        firsts = [0, 6, 12, 18, 24]
+        expected = []
+        for i, first in enumerate(firsts):
+            last = min(first + 8, len(words))
+            probability = words[first:last].count('robot') / (last - first)
+            weight = (last - first) - (2 if i else 0)
+            expected.append((first, last, weight, probability))
+        assert result['windows_total'] == 5 and pipeline.model.batches == [2, 2, 1]
+        for window, (first, last, weight, probability) in zip(result['windows'], expected):
+            assert window['start'] == starts[first] and window['end'] == starts[last - 1] + len(words[last - 1])
+            assert window['weight'] == weight and abs(window['ai_probability'] - probability) < 1e-4
+        document = sum(p * w for _, _, w, p in expected) / sum(w for _, _, w, _ in expected)
+        assert abs(result['ai_probability'] - document) < 1e-4
+        assert abs(result['max_probability'] - 1.0) < 1e-4
+        
+        result = SlidingWindowClassifier(name='windowed-test', max_length=10, stride=2,
+                                          max_windows=3).classify(text)
+        assert [w['index'] for w in result['windows']] == [0, 2, 4]
+        assert [w['weight'] for w in result['windows']] == [8, 8, 6]
+    finally:
+        registry.unload('windowed-test')
+    print(f"\n5 windows in batches of 2: weighted probability {document:.4f}")
+
+
+if __name__ == '__main__':
+    test_window_weights()
+    test_ai_label()
+    test_sliding_window_classify()
@@ -1 +1,7 @@
-# Django project init
\ No newline at end of file
+# Django project init
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -70,8 +70,39 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 62914560  # 60MB
+# Larger uploads are spooled to a temporary file instead of being held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 62914560  # 60MB
+# Uploaded documents above this size are checked chunk by chunk in a worker (analyzer.streaming_check)
+STREAMING_CHECK_MIN_SIZE = 2097152  # 2MB
+# Such uploads are copied here for the worker to read; must be shared with the Celery workers
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', str(MEDIA_ROOT / 'spool'))
+# Pages read from an uploaded PDF; 0 reads them all
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '0')) or None
+# Text kept by the upload extraction cache (analyzer.extraction_cache) before LRU eviction
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 268435456))  # 256MB
+
+# Semantic embedding store of the Documents (analyzer.embedding_index); the Flask app keeps its own
+EMBEDDING_INDEX_DIR = os.environ.get('EMBEDDING_INDEX_DIR', str(BASE_DIR / 'embedding_index'))
+
+# Per-process model registry (analyzer.model_registry): bytes of model weights kept loaded, 0 for no limit
+MODEL_MEMORY_BUDGET = int(os.environ.get('MODEL_MEMORY_BUDGET', 0))
+# Models loaded when a gunicorn worker boots, e.g. "ai-detector,summarizer"
+MODEL_WARMUP = [name.strip() for name in os.environ.get('MODEL_WARMUP', '').split(',') if name.strip()]
+# Concurrent model calls arriving within this window are run as one batch (analyzer.inference_batcher)
+INFERENCE_MAX_LATENCY_MS = float(os.environ.get('INFERENCE_MAX_LATENCY_MS', 5))
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', 16))
+# Seconds a request waits for its batched model call before giving up
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get('INFERENCE_TIMEOUT_SECONDS', 60))
+# Texts longer than this are classified in overlapping 512-token windows (analyzer.windowed_inference)
+AI_WINDOW_MIN_CHARS = int(os.environ.get('AI_WINDOW_MIN_CHARS', 2000))
+# Windows per forward pass, and windows scored per document (evenly spaced beyond that)
+AI_WINDOW_BATCH = int(os.environ.get('AI_WINDOW_BATCH', 8))
+AI_MAX_WINDOWS = int(os.environ.get('AI_MAX_WINDOWS', 256))
+# CPU backend of the ai-detector and sentiment models (analyzer.optimized_models): pytorch, onnx,
+# onnx-int8 (both need onnxruntime) or torch-int8; artifacts come from `manage.py export_models`
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'pytorch')
+MODEL_ARTIFACT_DIR = os.environ.get('MODEL_ARTIFACT_DIR', str(BASE_DIR / 'model_artifacts'))
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -110,4 +141,9 @@ CSRF_COOKIE_HTTPONLY = True
 SECURE_SSL_REDIRECT = not DEBUG
 SECURE_HSTS_SECONDS = 31536000 if not DEBUG else 0
 SECURE_HSTS_INCLUDE_SUBDOMAINS = not DEBUG
-SECURE_HSTS_PRELOAD = not DEBUG
\ No newline at end of file
+SECURE_HSTS_PRELOAD = not DEBUG
+# Background jobs. Without a broker, tasks run eagerly in the web process.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1